@@ -4,6 +4,7 @@ from sqlalchemy import func
 from typing import List
 from app import database, schemas
 from app.services import auth, search
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -42,10 +43,36 @@ def delete_chatbot(
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
     
+    search.delete_chatbot_content(chatbot.id)
+    
+    db.query(database.ChatbotEmbeddingModel).filter(database.ChatbotEmbeddingModel.chatbot_id == chatbot.id).delete()
+    db.query(database.AnswerCacheGeneration).filter(database.AnswerCacheGeneration.chatbot_id == chatbot.id).delete()
     db.delete(chatbot)
     db.commit()
     return {"message": "Chatbot deleted successfully"}
 
+@router.post("/{chatbot_id}/reindex")
+def reindex_chatbot(
+    chatbot_id: int,
+    current_user: database.User = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    chatbot = db.query(database.Chatbot).filter(
+        database.Chatbot.id == chatbot_id,
+        database.Chatbot.user_id == current_user.id
+    ).first()
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    if settings.SEARCH_BACKEND == "elasticsearch" and settings.SEARCH_INDEX_LAYOUT == "shared":
+        # A shared index holds many chatbots; rebuilding it would reindex all of them
+        raise HTTPException(status_code=400, detail="Per-chatbot reindex needs SEARCH_INDEX_LAYOUT=per_chatbot")
+    
+    # Queries keep using the current index until the rebuilt one is swapped in
+    import threading
+    thread = threading.Thread(target=search.rebuild_chatbot_index, args=(chatbot.id,), daemon=True)
+    thread.start()
+    return {"message": "Reindex started", "chatbot_id": chatbot.id}
+
 @router.get("/{chatbot_id}/stats")
 def get_chatbot_stats(
     chatbot_id: int,
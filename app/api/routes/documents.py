@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 import os
 
 from app import database
-from app.services import auth
+from app.services import auth, search
 
 router = APIRouter()
 
@@ -52,6 +52,8 @@ def delete_document(
         except OSError:
             pass
     
+    search.delete_chatbot_content(document.chatbot_id, {"document_id": document.id})
+    
     db.delete(document)
     db.commit()
     return {"message": "Document deleted successfully"}
@@ -7,7 +7,7 @@ from uuid import uuid4
 import os
 
 from app import database, schemas
-from app.services import auth
+from app.services import auth, search
 from app.core.config import settings
 
 router = APIRouter()
@@ -242,7 +242,6 @@ def process_and_index_document(document_id: int, chatbot_id: int, domain_id: int
             return
 
         from app.services.document_processor import process_document, chunk_text
-        from app.services import search
         
         print(f"📄 Processing document: {original_filename}")
         
@@ -257,19 +256,18 @@ def process_and_index_document(document_id: int, chatbot_id: int, domain_id: int
             # Generate tags
             tags = search.generate_content_tags(content_data['title'], content_data['content'])
             
-            # Index each chunk
-            for idx, chunk in enumerate(chunks):
-                doc = {
-                    'url': f"document://{document.id}",
-                    'title': content_data['title'],
-                    'content': chunk,
-                    'chunk_index': idx,
-                    'chatbot_id': chatbot_id,
-                    'domain_id': domain_id,
-                    'document_id': document.id,
-                    'tags': tags
-                }
-                search.index_chatbot_content(chatbot_id, doc)
+            # Index all chunks in batched bulk requests
+            docs = ({
+                'url': f"document://{document.id}",
+                'title': content_data['title'],
+                'content': chunk,
+                'chunk_index': idx,
+                'chatbot_id': chatbot_id,
+                'domain_id': domain_id,
+                'document_id': document.id,
+                'tags': tags
+            } for idx, chunk in enumerate(chunks))
+            search.bulk_index_chatbot_content(chatbot_id, docs)
             
             # Update document status
             document.status = "indexed"
@@ -305,7 +303,11 @@ def delete_domain(
     if not chatbot:
         raise HTTPException(status_code=404, detail="Not authorized")
     
+    search.delete_chatbot_content(chatbot.id, {"domain_id": domain_id})
+    
     db.query(database.ScrapedPage).filter(database.ScrapedPage.domain_id == domain_id).delete()
+    job_ids = db.query(database.ScrapeJob.id).filter(database.ScrapeJob.domain_id == domain_id)
+    db.query(database.CrawlCheckpoint).filter(database.CrawlCheckpoint.job_id.in_(job_ids)).delete(synchronize_session=False)
     db.query(database.ScrapeJob).filter(database.ScrapeJob.domain_id == domain_id).delete()
     db.query(database.Document).filter(database.Document.domain_id == domain_id).delete()
     
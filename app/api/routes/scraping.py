@@ -1,5 +1,9 @@
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from app import database
+from app.core.config import settings
 
 def run_domain_scraping(job_id: int, domain_id: int, start_url: str):
     print(f"🚀 Starting scraping background task: job_id={job_id}, domain_id={domain_id}, url={start_url}")
@@ -19,7 +23,7 @@ def run_domain_scraping(job_id: int, domain_id: int, start_url: str):
         db.commit()
         
         web_scraper = WebScraper()
-        pages = web_scraper.scrape_domain(start_url, domain_id, db)
+        pages = web_scraper.scrape_domain(start_url, domain_id, db, job_id=job_id)
         
         db.refresh(domain)
         
@@ -32,10 +36,12 @@ def run_domain_scraping(job_id: int, domain_id: int, start_url: str):
         domain.pages_scraped = len(pages)
         domain.last_scraped_at = datetime.utcnow()
         
+        db.query(database.CrawlCheckpoint).filter(database.CrawlCheckpoint.job_id == job_id).delete()
         db.commit()
         print(f"✅ Scraping completed: {len(pages)} pages scraped from {start_url}")
     except Exception as e:
         print(f"Scraping error for domain {domain_id}: {e}")
+        db.rollback()
         if job:
             job.status = "failed"
             job.error = str(e)
@@ -45,3 +51,53 @@ def run_domain_scraping(job_id: int, domain_id: int, start_url: str):
     finally:
         db.close()
 
+
+def _claim_job(db, job: database.ScrapeJob, stale_before: datetime) -> bool:
+    """Take over an unfinished job unless a live crawl is still checkpointing it"""
+    claimed = db.query(database.CrawlCheckpoint).filter(
+        database.CrawlCheckpoint.job_id == job.id,
+        or_(database.CrawlCheckpoint.updated_at == None, database.CrawlCheckpoint.updated_at < stale_before)
+    ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+    if claimed:
+        db.commit()
+        return True
+    if job.created_at and job.created_at >= stale_before:
+        return False
+    # Interrupted before its first checkpoint; whoever inserts one owns the job
+    try:
+        db.add(database.CrawlCheckpoint(job_id=job.id, frontier={}, failed_attempts={}, iterations=0, last_page_id=0))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+def resume_interrupted_scrapes() -> int:
+    """Restart scrape jobs a previous process left pending or running, from their checkpoints.
+
+    A job counts as interrupted once its checkpoint hasn't been touched for
+    SCRAPE_RESUME_STALE_SECONDS (running crawls touch it every SCRAPE_HEARTBEAT_SECONDS),
+    so with several API workers each job is resumed once and live crawls are left alone.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.SCRAPE_RESUME_STALE_SECONDS)
+    resumed = 0
+    db = database.SessionLocal()
+    try:
+        jobs = db.query(database.ScrapeJob).filter(database.ScrapeJob.status.in_(["pending", "running"])).all()
+        for job in jobs:
+            domain = db.query(database.Domain).filter(database.Domain.id == job.domain_id).first()
+            if not domain or not _claim_job(db, job, stale_before):
+                continue
+            print(f"♻️ Resuming interrupted scrape job {job.id} for {domain.url}")
+            thread = threading.Thread(
+                target=run_domain_scraping,
+                args=(job.id, domain.id, domain.url),
+                daemon=True
+            )
+            thread.start()
+            resumed += 1
+    except Exception as e:
+        print(f"❌ Could not resume interrupted scrape jobs: {e}")
+    finally:
+        db.close()
+    return resumed
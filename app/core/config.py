@@ -15,6 +15,90 @@ class Settings(BaseSettings):
     OLLAMA_HOST: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.2:3b"
 
+    SEARCH_BACKEND: str = "elasticsearch"
+    ES_HOST: str = "http://localhost:9200"
+    ES_MAX_CONNECTIONS: int = 32
+    ES_REQUEST_TIMEOUT: float = 10.0
+    ES_MAX_RETRIES: int = 3
+    SEARCH_INDEX_LAYOUT: str = "per_chatbot"
+    SHARED_INDEX_PREFIX: str = "chatbots-shared"
+    SHARED_INDEX_COUNT: int = 4
+    SHARED_INDEX_SHARDS: int = 3
+    INDEX_TEMPLATE_NAME: str = "nexva-chatbot-content"
+    EMBEDDING_STORAGE: str = "float"
+    QUANTIZED_RESCORE_OVERSAMPLE: int = 3
+    VECTOR_STORE_DIR: str = "data/vector_store"
+    VECTOR_STORE_DTYPE: str = "float16"
+
+    INGEST_BATCH_SIZE: int = 256
+    DEDUP_ENABLED: bool = True
+    DEDUP_MAX_DISTANCE: int = 3
+    TAG_MAX_TAGS: int = 10
+    TAG_BATCH_PAGES: int = 25
+    SCRAPE_CONCURRENCY: int = 16
+    SCRAPE_HOST_CONCURRENCY: int = 8
+    SCRAPE_HTTP_TIMEOUT_SECONDS: float = 15.0
+    SCRAPE_RENDER_MODE: str = "auto"
+    SCRAPE_MIN_STATIC_TEXT_CHARS: int = 300
+    SCRAPE_JS_PROBE_PAGES: int = 5
+    SCRAPE_SETTLE_TIMEOUT_SECONDS: float = 10.0
+    SCRAPE_SETTLE_MIN_SECONDS: float = 1.0
+    SCRAPE_SETTLE_MAX_SECONDS: float = 20.0
+    SCRAPE_SETTLE_QUIET_MS: int = 300
+    SCRAPE_FRONTIER_MAX_URLS: int = 50000
+    SCRAPE_RESPECT_ROBOTS: bool = True
+    SCRAPE_MAX_CRAWL_DELAY_SECONDS: float = 10.0
+    SCRAPE_USE_SITEMAPS: bool = True
+    SCRAPE_SKIP_UNCHANGED: bool = True
+    SCRAPE_HEARTBEAT_SECONDS: float = 60.0
+    SCRAPE_RESUME_ON_STARTUP: bool = True
+    SCRAPE_RESUME_STALE_SECONDS: int = 300
+    BROWSER_POOL_SIZE: int = 2
+    BROWSER_POOL_MAX_PAGES: int = 200
+    BROWSER_POOL_MAX_MEMORY_MB: int = 1536
+    BROWSER_POOL_ACQUIRE_TIMEOUT_SECONDS: float = 120.0
+    BROWSER_POOL_WARM_ON_STARTUP: bool = False
+    EMBEDDING_MODEL: str = "BAAI/bge-small-en-v1.5"
+    EMBEDDING_DIMS: int = 384
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_QUANTIZATION: str = "avx512_vnni"
+    EMBEDDING_ONNX_THREADS: int = 0
+    EMBEDDING_ONNX_DIR: str = "data/onnx"
+    EMBEDDING_MODEL_CACHE_SECONDS: int = 30
+    EMBEDDING_MIGRATION_DOCS_PER_SECOND: float = 25.0
+    EMBEDDING_MIGRATION_BATCH_SIZE: int = 32
+    EMBEDDING_MIGRATION_STALE_SECONDS: int = 600
+    EMBEDDING_MIGRATE_ON_STARTUP: bool = False
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_STORE_ENABLED: bool = True
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096
+    QUERY_EMBEDDING_CACHE_TTL: int = 86400
+    QUERY_EMBEDDING_CACHE_REDIS_URL: str = ""
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_TTL: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 256
+
+    SEARCH_KNN_K: int = 20
+    SEARCH_NUM_CANDIDATES: int = 100
+    SEARCH_RRF_RANK_CONSTANT: int = 60
+
+    PASSAGES_ENABLED: bool = True
+    PASSAGE_WINDOW_SENTENCES: int = 3
+    PASSAGE_VECTOR_CACHE_SIZE: int = 8192
+    CONTEXT_TOKEN_BUDGET: int = 700
+
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_TOP_N: int = 3
+    RERANK_BUDGET_MS: float = 250.0
+    RERANK_MAX_LENGTH: int = 256
+    RERANK_WORKERS: int = 2
+
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
     
     CORS_ORIGINS: list = ["*"]
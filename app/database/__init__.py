@@ -9,7 +9,11 @@ from app.database.models import (
     SupportTeamMember,
     SupportTicket,
     ScrapeJob,
-    Document
+    CrawlCheckpoint,
+    Document,
+    ChunkEmbedding,
+    AnswerCacheGeneration,
+    ChatbotEmbeddingModel
 )
 
 __all__ = [
@@ -27,6 +31,10 @@ __all__ = [
     "SupportTeamMember",
     "SupportTicket",
     "ScrapeJob",
-    "Document"
+    "CrawlCheckpoint",
+    "Document",
+    "ChunkEmbedding",
+    "AnswerCacheGeneration",
+    "ChatbotEmbeddingModel"
 ]
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, LargeBinary
 from datetime import datetime
 import secrets
 from app.database.session import Base
@@ -110,6 +110,16 @@ class ScrapeJob(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime)
 
+class CrawlCheckpoint(Base):
+    __tablename__ = "crawl_checkpoints"
+    
+    job_id = Column(Integer, ForeignKey("scrape_jobs.id"), primary_key=True)
+    frontier = Column(JSON, default={})
+    failed_attempts = Column(JSON, default={})
+    iterations = Column(Integer, default=0)
+    last_page_id = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Document(Base):
     __tablename__ = "documents"
     
@@ -123,3 +133,30 @@ class Document(Base):
     status = Column(String(20), default="uploaded")
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class ChunkEmbedding(Base):
+    __tablename__ = "chunk_embeddings"
+    
+    model = Column(String(200), primary_key=True)
+    content_hash = Column(String(64), primary_key=True)
+    dims = Column(Integer, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AnswerCacheGeneration(Base):
+    __tablename__ = "answer_cache_generations"
+    
+    chatbot_id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ChatbotEmbeddingModel(Base):
+    __tablename__ = "chatbot_embedding_models"
+    
+    chatbot_id = Column(Integer, ForeignKey("chatbots.id"), primary_key=True)
+    model = Column(String(200), nullable=False)
+    status = Column(String(20), nullable=False, default="ready")
+    target_model = Column(String(200), nullable=True)
+    target_index = Column(String(500), nullable=True)
+    migrated_chunks = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
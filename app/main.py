@@ -7,14 +7,34 @@ import os
 from app.core.config import settings
 from app.database import init_db
 from app.services.search import init_elasticsearch
+from app.services.reranker import reranker
+from app.services.search_backend import get_search_backend
+from app.services.embedding_migration import EmbeddingMigrator
+from app.services.browser_pool import browser_pool
 from app.api import api_router
+from app.api.routes.scraping import resume_interrupted_scrapes
 from app.api.routes import websockets
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
     init_elasticsearch()
+    if settings.RERANK_ENABLED:
+        reranker.warm_up()
+    migrator = None
+    if settings.EMBEDDING_MIGRATE_ON_STARTUP:
+        # Chatbots keep serving from their current model until each one is cut over
+        migrator = EmbeddingMigrator()
+        migrator.start()
+    if settings.BROWSER_POOL_WARM_ON_STARTUP:
+        browser_pool.warm()
+    if settings.SCRAPE_RESUME_ON_STARTUP:
+        resume_interrupted_scrapes()
     yield
+    if migrator:
+        migrator.stop()
+    browser_pool.close()
+    await get_search_backend().aclose()
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, lifespan=lifespan)
 
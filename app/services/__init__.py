@@ -12,6 +12,8 @@ from app.services.search import (
     init_elasticsearch,
     init_chatbot_index,
     index_chatbot_content,
+    bulk_index_chatbot_content,
+    delete_chatbot_content,
     search_chatbot_content
 )
 
@@ -27,6 +29,8 @@ __all__ = [
     "init_elasticsearch",
     "init_chatbot_index",
     "index_chatbot_content",
+    "bulk_index_chatbot_content",
+    "delete_chatbot_content",
     "search_chatbot_content"
 ]
 
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.database import SessionLocal, AnswerCacheGeneration
+
+class SemanticAnswerCache:
+    """Per-chatbot cache of generated answers, matched by question embedding similarity.
+
+    Each chatbot has an index generation that is bumped whenever new content is written
+    to its index; bumping drops the chatbot's cached answers, and answers generated
+    against an older generation are never stored.
+
+    Generations live in the database, so a write in another worker or in the migration
+    CLI reaches every process: generation() reads the shared value and drops this
+    process's answers if it moved, so callers read it before lookup(). If the database
+    can't be reached, the process falls back to its own count.
+    """
+
+    def __init__(self, similarity_threshold: float = None, ttl_seconds: int = None, max_entries: int = None, session_factory=SessionLocal):
+        self.similarity_threshold = similarity_threshold or settings.ANSWER_CACHE_SIMILARITY
+        self.ttl_seconds = ttl_seconds or settings.ANSWER_CACHE_TTL
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.session_factory = session_factory
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _shared_generation(self, chatbot_id: int, bump: bool = False) -> Optional[int]:
+        try:
+            with self.session_factory() as db:
+                query = db.query(AnswerCacheGeneration).filter(AnswerCacheGeneration.chatbot_id == chatbot_id)
+                if bump:
+                    updated = query.update({
+                        "generation": AnswerCacheGeneration.generation + 1,
+                        "updated_at": datetime.utcnow()
+                    }, synchronize_session=False)
+                    if not updated:
+                        db.add(AnswerCacheGeneration(chatbot_id=chatbot_id, generation=1))
+                    try:
+                        db.commit()
+                    except IntegrityError:
+                        # Another process inserted the row first; bump it instead
+                        db.rollback()
+                        query.update({"generation": AnswerCacheGeneration.generation + 1}, synchronize_session=False)
+                        db.commit()
+                record = query.first()
+                return record.generation if record is not None else 0
+        except Exception as e:
+            print(f"⚠️  Answer cache generation unavailable for chatbot {chatbot_id}: {e}")
+            return None
+
+    def _sync(self, chatbot_id: int, shared: Optional[int]) -> int:
+        with self._lock:
+            local = self._generations.get(chatbot_id, 0)
+            if shared is not None and shared != local:
+                self._generations[chatbot_id] = shared
+                self._entries.pop(chatbot_id, None)
+                return shared
+            return local
+
+    def generation(self, chatbot_id: int) -> int:
+        return self._sync(chatbot_id, self._shared_generation(chatbot_id))
+
+    def invalidate(self, chatbot_id: int):
+        with self._lock:
+            self._generations[chatbot_id] = self._generations.get(chatbot_id, 0) + 1
+            self._entries.pop(chatbot_id, None)
+        self._sync(chatbot_id, self._shared_generation(chatbot_id, bump=True))
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _evict_expired(self, entries: OrderedDict, now: float):
+        expired = [key for key, entry in entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del entries[key]
+
+    def lookup(self, chatbot_id: int, embedding: List[float], variant: tuple = ()) -> Optional[str]:
+        with self._lock:
+            entries = self._entries.get(chatbot_id)
+            if entries:
+                self._evict_expired(entries, time.time())
+            candidates = [(key, entry) for key, entry in (entries or {}).items() if entry["variant"] == variant]
+            if not candidates:
+                self.misses += 1
+                return None
+            
+            matrix = np.stack([entry["embedding"] for _, entry in candidates])
+            similarities = matrix @ self._normalize(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            
+            key, entry = candidates[best]
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry["answer"]
+
+    def store(self, chatbot_id: int, question: str, embedding: List[float], answer: str, generation: int, variant: tuple = ()):
+        # Picks up writes other processes made while this answer was being generated
+        self.generation(chatbot_id)
+        with self._lock:
+            # Content changed while this answer was being generated
+            if generation != self._generations.get(chatbot_id, 0):
+                return
+            entries = self._entries.setdefault(chatbot_id, OrderedDict())
+            key = (" ".join(question.lower().split()), variant)
+            entries[key] = {
+                "embedding": self._normalize(embedding),
+                "answer": answer,
+                "variant": variant,
+                "created_at": time.time()
+            }
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "chatbots": len(self._entries),
+            "entries": sum(len(entries) for entries in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+answer_cache = SemanticAnswerCache()
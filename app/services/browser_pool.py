@@ -0,0 +1,305 @@
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+try:
+    import undetected_chromedriver as uc
+except ImportError:
+    uc = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+from app.core.config import settings
+from app.services.fetcher import USER_AGENTS
+
+# Serializes Chrome launches so undetected_chromedriver doesn't patch the binary twice at once
+_launch_lock = threading.Lock()
+_driver_path = None
+
+class BrowserUnavailableError(RuntimeError):
+    """No browser could be started (Chrome missing or failing to launch)"""
+
+def _chromedriver_path() -> str:
+    global _driver_path
+    if _driver_path is None:
+        print("   - Checking/Installing Chrome driver...")
+        _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+def launch_browser():
+    """A new headless Chrome with images, fonts and media blocked"""
+    user_agent = random.choice(USER_AGENTS)
+
+    content_block_prefs = {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+        "profile.managed_default_content_settings.plugins": 2,
+        "profile.managed_default_content_settings.popups": 2,
+        "profile.managed_default_content_settings.media_stream": 2,
+        "profile.managed_default_content_settings.media_stream_mic": 2,
+        "profile.managed_default_content_settings.media_stream_camera": 2,
+        "profile.managed_default_content_settings.geolocation": 2,
+        "profile.managed_default_content_settings.notifications": 2,
+    }
+
+    blocked_resource_patterns = [
+        "*.css", "*.jpg", "*.jpeg", "*.png", "*.gif", "*.svg",
+        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.ico",
+        "*.mp4", "*.webm", "*.mp3", "*.wav"
+    ]
+
+    def apply_shared_options(opts):
+        opts.add_argument('--headless=new')
+        opts.add_argument('--no-sandbox')
+        opts.add_argument('--disable-dev-shm-usage')
+        opts.add_argument('--disable-gpu')
+        opts.add_argument('--disable-blink-features=AutomationControlled')
+        opts.add_argument('--disable-extensions')
+        opts.add_argument('--disable-infobars')
+        opts.add_argument('--disable-web-security')
+        opts.add_argument('--allow-running-insecure-content')
+        opts.add_argument('--blink-settings=imagesEnabled=false')
+        opts.add_argument(f'--user-agent={user_agent}')
+        # get() returns at DOMContentLoaded; page_settle decides when the page is done
+        opts.page_load_strategy = 'eager'
+        # CDP Network events, read by page_settle to tell when the network is idle
+        opts.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        opts.add_experimental_option("prefs", content_block_prefs)
+
+    # Use lock to ensure sequential initialization
+    with _launch_lock:
+        driver = None
+        
+        if uc:
+            print("   - Using undetected_chromedriver")
+            options = uc.ChromeOptions()
+            apply_shared_options(options)
+            
+            # Try to find Chrome binary in common locations
+            chrome_paths = [
+                '/usr/bin/google-chrome',
+                '/usr/bin/google-chrome-stable',
+                '/usr/bin/chromium-browser',
+                '/usr/bin/chromium'
+            ]
+            chrome_binary = None
+            for path in chrome_paths:
+                if os.path.exists(path):
+                    chrome_binary = path
+                    break
+            
+            if chrome_binary:
+                options.binary_location = chrome_binary
+                print(f"   - Chrome binary: {chrome_binary}")
+            
+            start_time = time.time()
+            print(f"   - 🕒 Starting uc.Chrome at {start_time}")
+            
+            try:
+                driver = uc.Chrome(options=options, use_subprocess=True)
+                print(f"   - ✅ uc.Chrome started in {time.time() - start_time:.2f}s")
+            except Exception as e:
+                print(f"   - ❌ uc.Chrome failed: {e}")
+                print("   - 🔄 Falling back to standard selenium...")
+                driver = None  # Ensure we fall through to standard selenium
+        
+        # Fallback to standard selenium if uc failed or not available
+        if driver is None:
+            print("   - Using standard selenium webdriver")
+            options = Options()
+            apply_shared_options(options)
+            
+            driver_path = _chromedriver_path()
+            print(f"   - Driver path: {driver_path}")
+            
+            service = Service(driver_path)
+            driver = webdriver.Chrome(service=service, options=options)
+
+    driver.set_script_timeout(60)
+    driver.set_page_load_timeout(settings.SCRAPE_SETTLE_MAX_SECONDS)
+    driver.implicitly_wait(10)
+
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setUserAgentOverride', {"userAgent": user_agent})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": blocked_resource_patterns})
+    except Exception:
+        pass
+
+    try:
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    except Exception:
+        pass
+
+    return driver
+
+class _Browser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.started_at = time.time()
+
+    def memory_mb(self) -> Optional[float]:
+        """Resident memory of Chrome and its renderer processes, when psutil is installed"""
+        if psutil is None:
+            return None
+        pid = getattr(self.driver, "browser_pid", None)
+        if pid is None:
+            process = getattr(getattr(self.driver, "service", None), "process", None)
+            pid = getattr(process, "pid", None)
+        if pid is None:
+            return None
+        try:
+            root = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [root] + root.children(recursive=True)) / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+class BrowserPool:
+    """Warm headless Chrome instances shared by every scrape job in the process.
+
+    Each render leases a whole browser, so concurrent crawls never share a page, and
+    cookies are cleared when it comes back. Browsers are started on demand up to size and
+    then kept; one is replaced after max_pages renders, when it grows past max_memory_mb
+    (with psutil installed), or when it fails a health check on checkout.
+    """
+
+    def __init__(self, size: int = None, max_pages: int = None, max_memory_mb: int = None, acquire_timeout: float = None):
+        self.size = max(size or settings.BROWSER_POOL_SIZE, 1)
+        self.max_pages = max_pages or settings.BROWSER_POOL_MAX_PAGES
+        self.max_memory_mb = max_memory_mb or settings.BROWSER_POOL_MAX_MEMORY_MB
+        self.acquire_timeout = acquire_timeout or settings.BROWSER_POOL_ACQUIRE_TIMEOUT_SECONDS
+        # LIFO keeps the most recently used browsers busy and lets the rest sit idle
+        self._idle: "queue.LifoQueue[_Browser]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._launched = 0
+        self._closed = False
+        self.renders = 0
+        self.recycled = 0
+        self.replaced = 0
+
+    def _launch(self) -> _Browser:
+        try:
+            return _Browser(launch_browser())
+        except Exception as e:
+            with self._lock:
+                self._launched -= 1
+            raise BrowserUnavailableError(f"Chrome failed to start: {e}") from e
+
+    def _discard(self, browser: _Browser):
+        with self._lock:
+            self._launched -= 1
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _healthy(browser: _Browser) -> bool:
+        try:
+            browser.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _worn_out(self, browser: _Browser) -> bool:
+        if browser.pages >= self.max_pages:
+            return True
+        memory = browser.memory_mb()
+        return memory is not None and memory > self.max_memory_mb
+
+    @staticmethod
+    def _reset(browser: _Browser):
+        try:
+            browser.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        except Exception:
+            pass
+        try:
+            browser.driver.get("about:blank")
+        except Exception:
+            pass
+
+    def _checkout(self, timeout: float) -> _Browser:
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._closed:
+                raise BrowserUnavailableError("browser pool is closed")
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_launch = self._launched < self.size
+                    if can_launch:
+                        self._launched += 1
+                if can_launch:
+                    return self._launch()
+                try:
+                    browser = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    raise TimeoutError(f"no browser free within {timeout:.0f}s")
+            if self._healthy(browser):
+                return browser
+            print("♻️  Replacing crashed browser")
+            self.replaced += 1
+            self._discard(browser)
+
+    @contextmanager
+    def page(self, timeout: float = None):
+        """Lease a WebDriver for one render"""
+        browser = self._checkout(timeout or self.acquire_timeout)
+        try:
+            yield browser.driver
+        finally:
+            browser.pages += 1
+            self.renders += 1
+            if self._closed or not self._healthy(browser):
+                self._discard(browser)
+            elif self._worn_out(browser):
+                self.recycled += 1
+                self._discard(browser)
+            else:
+                self._reset(browser)
+                self._idle.put(browser)
+
+    def warm(self):
+        """Start browsers up to size in the background"""
+        def start_one():
+            try:
+                self._idle.put(self._launch())
+            except BrowserUnavailableError as e:
+                print(f"⚠️  Could not warm browser pool: {e}")
+
+        with self._lock:
+            missing = self.size - self._launched
+            self._launched += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            threading.Thread(target=start_one, daemon=True, name="browser-warm").start()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "launched": self._launched,
+            "idle": self._idle.qsize(),
+            "renders": self.renders,
+            "recycled": self.recycled,
+            "replaced": self.replaced
+        }
+
+browser_pool = BrowserPool()
@@ -1,32 +1,35 @@
+import asyncio
 import httpx
-from typing import List, Dict, AsyncGenerator
+import re
+from typing import List, Dict, AsyncGenerator, Optional
 from app.services.search import search_chatbot_content
+from app.services.embedding_service import embedding_service
+from app.services.answer_cache import answer_cache
+from app.services.passages import pack_context
 from app.core.config import settings
 
 class ChatService:
     def __init__(self):
         self.client = httpx.AsyncClient(timeout=60.0)
     
-    async def get_context(self, chatbot_id: int, query: str, max_results: int = 5) -> str:
+    async def get_context(self, chatbot_id: int, query: str, max_results: int = 5, search_options: Optional[Dict] = None) -> str:
         print(f"[ChatService] Searching for context with query: '{query}' (top_k={max_results})")
-        results = await search_chatbot_content(chatbot_id, query, max_results=max_results)
+        results = await search_chatbot_content(chatbot_id, query, max_results=max_results, **(search_options or {}))
         
         if not results:
             print(f"[ChatService] No context found for query: '{query}'")
             return ""
         
         print(f"[ChatService] Found {len(results)} context chunks")
-        context_parts = []
         for i, result in enumerate(results):
-            content = result.get('content', '')
             title = result.get('title', 'Untitled')
-            url = result.get('url', '')
             score = result.get('_search_score', 0)
-            
-            print(f"[ChatService] Result {i+1}: '{title}' (score: {score:.2f})")
-            context_parts.append(f"[{title}]\nSource: {url}\n{content}")
+            print(f"[ChatService] Result {i+1}: '{title}' (score: {score:.4f})")
+        
+        def render(i: int, result: dict, text: str) -> str:
+            return f"[{result.get('title', 'Untitled')}]\nSource: {result.get('url', '')}\n{text}"
         
-        return "\n\n---\n\n".join(context_parts)
+        return pack_context(results, settings.CONTEXT_TOKEN_BUDGET, render, separator="\n\n---\n\n")
     
     async def stream_chat(
         self,
@@ -34,9 +37,36 @@ class ChatService:
         message: str,
         history: List[Dict[str, str]],
         top_k: int = 5,
-        short_answer: bool = False
+        short_answer: bool = False,
+        search_options: Optional[Dict] = None
     ) -> AsyncGenerator[str, None]:
-        context = await self.get_context(chatbot_id, message, max_results=top_k)
+        # Answers grounded in a scoped search only serve the same scope
+        filters = (search_options or {}).get("filters") or {}
+        cache_variant = (top_k, short_answer, tuple((field, tuple(values)) for field, values in sorted(filters.items())))
+        cache_generation = 0
+        question_embedding = None
+        # The prompt carries the conversation, so only an opening question's answer is
+        # reusable; a follow-up ("tell me more") depends on, and would leak, earlier turns
+        prior_turns = history[:-1] if history and history[-1] == {"role": "user", "content": message} else history
+        use_cache = settings.ANSWER_CACHE_ENABLED and not prior_turns
+        
+        if use_cache:
+            cached_answer = None
+            try:
+                # Read from the database, dropping answers another worker's writes made stale
+                cache_generation = await asyncio.to_thread(answer_cache.generation, chatbot_id)
+                question_embedding = await embedding_service.embed(message)
+                cached_answer = answer_cache.lookup(chatbot_id, question_embedding, cache_variant)
+            except Exception as e:
+                print(f"[ChatService] Answer cache lookup failed: {e}")
+            
+            if cached_answer:
+                print(f"[ChatService] Answer cache hit for query: '{message}'")
+                for piece in re.findall(r'\S+\s*', cached_answer):
+                    yield piece
+                return
+        
+        context = await self.get_context(chatbot_id, message, max_results=top_k, search_options=search_options)
         
         length_instruction = "Keep your answer very short and concise." if short_answer else "Provide clear, concise answers."
         
@@ -82,15 +112,21 @@ Guidelines:
                     yield f"Error: Ollama API returned {response.status_code}. Response: {error_text.decode()[:200]}"
                     return
                     
+                answer_parts = []
                 async for line in response.aiter_lines():
                     if line:
                         try:
                             import json
                             data = json.loads(line)
                             if 'message' in data and 'content' in data['message']:
+                                answer_parts.append(data['message']['content'])
                                 yield data['message']['content']
                         except json.JSONDecodeError:
                             continue
+                
+                answer = "".join(answer_parts)
+                if question_embedding is not None and answer.strip():
+                    await asyncio.to_thread(answer_cache.store, chatbot_id, message, question_embedding, answer, cache_generation, cache_variant)
         except httpx.ConnectError as e:
             yield f"Error: Cannot connect to Ollama at {settings.OLLAMA_HOST}. Make sure Ollama is running. Details: {str(e)}"
         except httpx.ReadTimeout as e:
@@ -0,0 +1,159 @@
+import hashlib
+import re
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+WORD_PATTERN = re.compile(r"\w+")
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> Optional[int]:
+    """64-bit SimHash over word shingles; None for text without words"""
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return None
+    if len(words) <= shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles),
+        dtype=np.uint8
+    ).reshape(len(shingles), 8)
+    bits = np.unpackbits(hashes, axis=1)
+    # Each shingle votes +1 / -1 per bit; the sign of the tally is the fingerprint bit
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def to_signed(fingerprint: int) -> int:
+    """Fit a fingerprint into a signed 64-bit `long` field"""
+    return fingerprint - (1 << SIMHASH_BITS) if fingerprint >= 1 << (SIMHASH_BITS - 1) else fingerprint
+
+def from_signed(value: int) -> int:
+    return value + (1 << SIMHASH_BITS) if value < 0 else value
+
+def field_values(value) -> list:
+    """A possibly multi-valued source field as a list"""
+    if value is None:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+def merged_values(current, additions: Iterable) -> Optional[list]:
+    """current with the additions it lacks appended, or None if it already has them all"""
+    merged = field_values(current)
+    added = False
+    for value in additions:
+        if value is not None and value not in merged:
+            merged.append(value)
+            added = True
+    return merged if added else None
+
+def fingerprint_scope(document: dict) -> str:
+    """The document or domain a chunk belongs to; chunks are only merged with others of the same owner"""
+    for field in ("document_id", "domain_id"):
+        value = document.get(field)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if value is not None:
+            return f"{field}:{value}"
+    return ""
+
+
+class FingerprintIndex:
+    """Near-duplicate lookup over SimHash fingerprints for one chatbot.
+
+    The 64 bits are split into max_distance + 1 bands; two fingerprints within
+    max_distance bits of each other agree exactly on at least one band, so only
+    fingerprints sharing a band value are compared.
+
+    Fingerprints are bucketed by scope (fingerprint_scope), so a chunk is never merged
+    into one owned by another domain or document, which deleting that owner would remove.
+    """
+
+    def __init__(self, max_distance: int = None):
+        self.max_distance = settings.DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+        self.band_count = self.max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.band_count
+        self._bands: List[Dict[Tuple[str, int], List[Tuple[int, str]]]] = [defaultdict(list) for _ in range(self.band_count)]
+        self._fingerprints: Dict[str, Tuple[str, int]] = {}
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.band_count)]
+
+    def _insert(self, fingerprint: int, doc_id: str, scope: str):
+        # An id is re-registered when its chunk is rewritten with new text or a new owner
+        self._remove(doc_id)
+        for band, value in enumerate(self._band_values(fingerprint)):
+            self._bands[band][(scope, value)].append((fingerprint, doc_id))
+        self._fingerprints[doc_id] = (scope, fingerprint)
+        self.size += 1
+
+    def _remove(self, doc_id: str):
+        entry = self._fingerprints.pop(doc_id, None)
+        if entry is None:
+            return
+        scope, fingerprint = entry
+        for band, value in enumerate(self._band_values(fingerprint)):
+            entries = self._bands[band].get((scope, value))
+            if entries:
+                entries[:] = [entry for entry in entries if entry[1] != doc_id]
+        self.size -= 1
+
+    def add(self, fingerprint: int, doc_id: str, scope: str = ""):
+        with self._lock:
+            self._insert(fingerprint, doc_id, scope)
+
+    def discard(self, doc_ids: Iterable[str]):
+        """Forget deleted chunks so nothing is merged into them"""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def find_or_add(self, fingerprint: int, doc_id: str, scope: str = "") -> Optional[str]:
+        """Id of an existing near-duplicate in scope (doc_id itself if its stored text barely changed), or None after registering doc_id"""
+        with self._lock:
+            own = self._fingerprints.get(doc_id)
+            if own is not None and own[0] == scope and hamming_distance(own[1], fingerprint) <= self.max_distance:
+                return doc_id
+            for band, value in enumerate(self._band_values(fingerprint)):
+                for candidate, existing_id in self._bands[band].get((scope, value), ()):
+                    if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                        return existing_id
+            self._insert(fingerprint, doc_id, scope)
+        return None
+
+
+_indexes: Dict[int, FingerprintIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_fingerprint_index(chatbot_id: int, loader: Callable[[], Iterable[Tuple[str, int, str]]]) -> FingerprintIndex:
+    """The chatbot's fingerprint index, seeded from loader() (doc id, signed simhash, scope) on first use"""
+    index = _indexes.get(chatbot_id)
+    if index is not None:
+        return index
+
+    with _indexes_lock:
+        index = _indexes.get(chatbot_id)
+        if index is None:
+            index = FingerprintIndex()
+            for doc_id, value, scope in loader():
+                index.add(from_signed(value), doc_id, scope)
+            _indexes[chatbot_id] = index
+            if index.size:
+                print(f"🧬 Loaded {index.size} chunk fingerprints for chatbot {chatbot_id}")
+    return index
+
+def forget_fingerprints(chatbot_id: int):
+    """Drop the cached index after deletes; it is reloaded from storage on the next ingest"""
+    with _indexes_lock:
+        _indexes.pop(chatbot_id, None)
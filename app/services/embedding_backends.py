@@ -0,0 +1,146 @@
+"""Load embedding models on PyTorch or ONNX Runtime, and check that the two agree.
+
+EMBEDDING_BACKEND=onnx runs the model's ONNX export; onnx-int8 additionally applies dynamic
+int8 quantization, exported once per model into EMBEDDING_ONNX_DIR. Both need
+sentence-transformers[onnx]; without it the PyTorch model is used, and embedding_variant()
+says so, so cached vectors are never labelled with a backend that did not produce them.
+
+    python -m app.services.embedding_backends [--model NAME] [--backend onnx-int8] [--min-cosine 0.99]
+"""
+import argparse
+import importlib.util
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+from typing import List
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from app.core.config import settings
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+QUANTIZATION_TARGETS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+# A mix of short queries and passage-length text, like the two things we embed
+PARITY_TEXTS = [
+    "How much does the Team plan cost?",
+    "Can I get my money back?",
+    "reset password",
+    "Do you ship internationally and how long does delivery take?",
+    "Refunds are available within 30 days of purchase. Contact support with your order number and we will process it within five business days.",
+    "The Team plan is $12 per user per month, billed annually. It includes shared workspaces, admin controls and priority support.",
+    "Two-factor authentication can be enabled from Settings > Security. We support authenticator apps and hardware keys such as YubiKey.",
+    "Our API is rate limited to 100 requests per minute per key. Responses include X-RateLimit headers so clients can back off."
+]
+
+def _session_options():
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if settings.EMBEDDING_ONNX_THREADS:
+        options.intra_op_num_threads = settings.EMBEDDING_ONNX_THREADS
+        # One query batch at a time per worker, so parallelism within an op is what matters
+        options.inter_op_num_threads = 1
+    return options
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(settings.EMBEDDING_ONNX_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name))
+
+def _load_onnx(model_name: str, quantized: bool) -> SentenceTransformer:
+    model_kwargs = {"provider": "CPUExecutionProvider", "session_options": _session_options()}
+    if not quantized:
+        # Uses the repo's onnx/model.onnx, or exports one on the fly
+        return SentenceTransformer(model_name, backend="onnx", device="cpu", model_kwargs=model_kwargs)
+
+    if settings.EMBEDDING_ONNX_QUANTIZATION not in QUANTIZATION_TARGETS:
+        raise ValueError(f"Unknown EMBEDDING_ONNX_QUANTIZATION '{settings.EMBEDDING_ONNX_QUANTIZATION}'")
+    path = _export_dir(model_name)
+    file_suffix = f"int8_{settings.EMBEDDING_ONNX_QUANTIZATION}"
+    file_name = f"onnx/model_{file_suffix}.onnx"
+    if not os.path.exists(os.path.join(path, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        print(f"📦 Exporting {model_name} to int8 ONNX ({settings.EMBEDDING_ONNX_QUANTIZATION}) in {path}...")
+        model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        model.save(path)
+        export_dynamic_quantized_onnx_model(model, settings.EMBEDDING_ONNX_QUANTIZATION, path, file_suffix=file_suffix)
+    return SentenceTransformer(path, backend="onnx", device="cpu", model_kwargs={**model_kwargs, "file_name": file_name})
+
+@lru_cache(maxsize=None)
+def _onnx_available() -> bool:
+    missing = [name for name in ("onnxruntime", "optimum") if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"⚠️ ONNX embedding backends need sentence-transformers[onnx] (missing {', '.join(missing)}), using PyTorch")
+    return not missing
+
+def active_backend(backend: str = None) -> str:
+    """The backend that will actually run: backend (default EMBEDDING_BACKEND), or torch when ONNX Runtime is missing"""
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'")
+    if backend != "torch" and not _onnx_available():
+        return "torch"
+    return backend
+
+def load_sentence_transformer(model_name: str, backend: str = None) -> SentenceTransformer:
+    backend = active_backend(backend)
+    if backend != "torch":
+        # No fallback past this point: embedding_variant() already reports the ONNX backend
+        return _load_onnx(model_name, quantized=backend == "onnx-int8")
+    return SentenceTransformer(model_name)
+
+def embedding_variant(model_name: str, backend: str = None) -> str:
+    """model_name qualified by the backend running it; int8 vectors differ from fp32 ones and between kernel targets"""
+    backend = active_backend(backend)
+    if backend == "onnx-int8":
+        return f"{model_name}:{backend}:{settings.EMBEDDING_ONNX_QUANTIZATION}"
+    return f"{model_name}:{backend}"
+
+def _ms_per_query(model: SentenceTransformer, texts: List[str], rounds: int = 3) -> float:
+    model.encode(texts[:1], show_progress_bar=False)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            model.encode([text], show_progress_bar=False)
+    return (time.perf_counter() - started) * 1000 / (rounds * len(texts))
+
+def check_parity(model_name: str = None, backend: str = None, texts: List[str] = None, min_cosine: float = 0.99) -> dict:
+    """Compare backend's embeddings with the PyTorch model's on texts.
+
+    Passes when every text's vectors have cosine similarity of at least min_cosine. Also
+    reports single-query latency on both, since that is what the query path pays.
+    """
+    model_name = model_name or settings.EMBEDDING_MODEL
+    backend = active_backend(backend)
+    texts = texts or PARITY_TEXTS
+
+    reference = SentenceTransformer(model_name)
+    candidate = load_sentence_transformer(model_name, backend)
+    expected = reference.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    actual = candidate.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    cosines = np.sum(np.asarray(expected, dtype=np.float32) * np.asarray(actual, dtype=np.float32), axis=1)
+
+    torch_ms = _ms_per_query(reference, texts)
+    backend_ms = _ms_per_query(candidate, texts)
+    return {
+        "model": model_name,
+        "backend": backend,
+        "min_cosine": round(float(cosines.min()), 4),
+        "mean_cosine": round(float(cosines.mean()), 4),
+        "passed": bool(cosines.min() >= min_cosine),
+        "torch_ms_per_query": round(torch_ms, 2),
+        "backend_ms_per_query": round(backend_ms, 2),
+        "speedup": round(torch_ms / backend_ms, 2) if backend_ms > 0 else None
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check an embedding backend against the PyTorch model")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL, help="Embedding model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--backend", default=None, choices=EMBEDDING_BACKENDS, help="Backend to check (default: EMBEDDING_BACKEND)")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Lowest acceptable cosine similarity per text")
+    args = parser.parse_args()
+
+    result = check_parity(args.model, args.backend, min_cosine=args.min_cosine)
+    print(f"{'✅' if result['passed'] else '❌'} {result['backend']} vs torch for {result['model']}: "
+          f"cosine min {result['min_cosine']} / mean {result['mean_cosine']}, "
+          f"{result['backend_ms_per_query']}ms vs {result['torch_ms_per_query']}ms per query ({result['speedup']}x)")
+    sys.exit(0 if result["passed"] else 1)
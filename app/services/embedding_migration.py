@@ -0,0 +1,173 @@
+"""Re-embed chatbots with a new embedding model without taking search down.
+
+Each chatbot is copied into fresh storage beside its live index at a throttled rate while
+queries keep using the live one, then cut over on its own. With EMBEDDING_MIGRATE_ON_STARTUP
+the API runs this in the background onto EMBEDDING_MODEL; with Elasticsearch it can also
+run as a separate process (the embedded backend must migrate inside the serving process):
+
+    python -m app.services.embedding_migration --model BAAI/bge-base-en-v1.5 [--chatbot-id ID ...] [--docs-per-second N]
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.database import SessionLocal, Chatbot
+from app.services.answer_cache import answer_cache
+from app.services.embedding_service import get_embedding_model, LEGACY_EMBEDDING_MODEL
+from app.services.embedding_versions import model_registry
+from app.services.search import _embed_chunks, _embedding_text
+from app.services.search_backend import get_search_backend
+
+def _content_hash(doc: dict) -> str:
+    """Hash of a stored chunk as copied, so chunks rewritten in place under the same id are noticed"""
+    fields = {key: value for key, value in doc.items() if key not in ("_id", "embedding", "embedding_model")}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class EmbeddingMigrator:
+    """Moves chatbots onto target_model one at a time.
+
+    1. Every live chunk is re-embedded into a new index (Elasticsearch) or store directory
+       (embedded backend), at most docs_per_second so queries keep most of the CPU.
+    2. Chunks written, rewritten or deleted during the copy are caught up (copies are tracked
+       by a hash of each chunk's fields, since stable ids are rewritten in place) and the
+       chatbot is cut over.
+    3. Writes that reached the previous index before the swap are copied across, and chunks
+       still embedded with the old model by workers that hadn't seen the cutover are redone
+       once their model cache has expired.
+    """
+
+    def __init__(self, target_model: str = None, docs_per_second: float = None, batch_size: int = None):
+        self.target_model = target_model or settings.EMBEDDING_MODEL
+        self.docs_per_second = docs_per_second or settings.EMBEDDING_MIGRATION_DOCS_PER_SECOND
+        self.batch_size = batch_size or settings.EMBEDDING_MIGRATION_BATCH_SIZE
+        self.backend = get_search_backend()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _copy(self, chatbot_id: int, documents: List[dict], target: Optional[str], copied: Optional[Dict[str, str]] = None) -> int:
+        started = time.perf_counter()
+        if copied is not None:
+            copied.update((doc["_id"], _content_hash(doc)) for doc in documents)
+        embeddings = _embed_chunks([_embedding_text(doc) for doc in documents], batch_size=self.batch_size, model_name=self.target_model)
+        for doc, embedding in zip(documents, embeddings):
+            doc['embedding'] = embedding.tolist()
+            doc['embedding_model'] = self.target_model
+        success, errors = self.backend.bulk_index(chatbot_id, documents, target=target)
+        if errors:
+            raise RuntimeError(f"{errors} re-embedded chunks failed to write")
+
+        pause = len(documents) / self.docs_per_second - (time.perf_counter() - started)
+        if pause > 0:
+            self._stop.wait(pause)
+        return success
+
+    def _catch_up(self, chatbot_id: int, source: Optional[str], dest: Optional[str], copied: Dict[str, str]):
+        """Copy chunks in source that dest lacks or holds an older version of, and drop copies of chunks deleted since"""
+        source_ids = set()
+        for batch in self.backend.scan_documents(chatbot_id, self.batch_size, target=source):
+            source_ids.update(doc["_id"] for doc in batch)
+            changed = [doc for doc in batch if copied.get(doc["_id"]) != _content_hash(doc)]
+            if changed:
+                self._copy(chatbot_id, changed, dest, copied)
+        removed = copied.keys() - source_ids
+        if removed:
+            self.backend.delete_documents(chatbot_id, list(removed), target=dest)
+            for doc_id in removed:
+                del copied[doc_id]
+
+    def _redo_stragglers(self, chatbot_id: int) -> int:
+        redone = 0
+        for batch in self.backend.scan_documents(chatbot_id, self.batch_size):
+            stale = [doc for doc in batch if (doc.get("embedding_model") or LEGACY_EMBEDDING_MODEL) != self.target_model]
+            if stale:
+                redone += self._copy(chatbot_id, stale, None)
+        return redone
+
+    def migrate_chatbot(self, chatbot_id: int) -> dict:
+        current = model_registry.model_for(chatbot_id, self.backend, fresh=True)
+        if current == self.target_model:
+            return {"chatbot_id": chatbot_id, "status": "current", "model": current}
+
+        if not model_registry.claim(chatbot_id, self.target_model):
+            return {"chatbot_id": chatbot_id, "status": "busy", "model": current}
+        record = model_registry.get(chatbot_id)
+        if record is not None and record.target_index:
+            # Left behind by an interrupted run
+            self.backend.drop_reembed(chatbot_id, record.target_index)
+
+        started = time.perf_counter()
+        dims = get_embedding_model(self.target_model).get_sentence_embedding_dimension()
+        target = self.backend.begin_reembed(chatbot_id, dims)
+        model_registry.update(chatbot_id, target_index=target, migrated_chunks=0, error=None)
+        print(f"🧭 Re-embedding chatbot {chatbot_id}: {current} → {self.target_model} ({dims} dims) into {target}")
+
+        copied: Dict[str, str] = {}
+        try:
+            for batch in self.backend.scan_documents(chatbot_id, self.batch_size):
+                if self._stop.is_set():
+                    raise InterruptedError("migration stopped")
+                self._copy(chatbot_id, batch, target, copied)
+                model_registry.update(chatbot_id, migrated_chunks=len(copied))
+            self._catch_up(chatbot_id, None, target, copied)
+            previous = self.backend.cutover_reembed(chatbot_id, target)
+        except Exception as e:
+            self.backend.drop_reembed(chatbot_id, target)
+            model_registry.update(chatbot_id, status="failed", target_model=None, target_index=None, error=str(e))
+            raise
+
+        model_registry.update(chatbot_id, model=self.target_model, status="ready", target_model=None, target_index=None, migrated_chunks=len(copied))
+        answer_cache.invalidate(chatbot_id)
+        print(f"🔀 Chatbot {chatbot_id} now served by {self.target_model}")
+
+        if previous:
+            self._catch_up(chatbot_id, previous, None, copied)
+            self.backend.drop_reembed(chatbot_id, previous)
+        self._stop.wait(model_registry.ttl_seconds)
+        stragglers = self._redo_stragglers(chatbot_id)
+
+        return {
+            "chatbot_id": chatbot_id,
+            "status": "migrated",
+            "model": self.target_model,
+            "chunks": len(copied),
+            "stragglers": stragglers,
+            "seconds": round(time.perf_counter() - started, 1)
+        }
+
+    def run(self, chatbot_ids: Optional[List[int]] = None) -> List[dict]:
+        if chatbot_ids is None:
+            with SessionLocal() as db:
+                chatbot_ids = [chatbot_id for (chatbot_id,) in db.query(Chatbot.id).order_by(Chatbot.id).all()]
+
+        results = []
+        for chatbot_id in chatbot_ids:
+            if self._stop.is_set():
+                break
+            try:
+                result = self.migrate_chatbot(chatbot_id)
+                if result["status"] == "migrated":
+                    print(f"✅ chatbot {chatbot_id}: {result['chunks']} chunks re-embedded in {result['seconds']}s")
+            except Exception as e:
+                result = {"chatbot_id": chatbot_id, "status": "failed", "error": str(e)}
+                print(f"❌ chatbot {chatbot_id}: re-embedding failed: {e}")
+            results.append(result)
+        return results
+
+    def start(self, chatbot_ids: Optional[List[int]] = None) -> threading.Thread:
+        """Run the migration on a daemon thread"""
+        thread = threading.Thread(target=self.run, args=(chatbot_ids,), daemon=True, name="embedding-migration")
+        thread.start()
+        return thread
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed chatbot content with a new embedding model, cutting over per chatbot")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL, help="Target embedding model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--chatbot-id", type=int, action="append", dest="chatbot_ids", help="Only migrate these chatbots")
+    parser.add_argument("--docs-per-second", type=float, help="Re-embedding rate limit (default: EMBEDDING_MIGRATION_DOCS_PER_SECOND)")
+    args = parser.parse_args()
+    EmbeddingMigrator(args.model, docs_per_second=args.docs_per_second).run(args.chatbot_ids)
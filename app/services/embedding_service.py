@@ -0,0 +1,231 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import numpy as np
+from app.core.config import settings
+from app.services.embedding_backends import active_backend, embedding_variant, load_sentence_transformer
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+EMBEDDING_MODEL_NAME = settings.EMBEDDING_MODEL
+# Model every chunk was embedded with before chunks recorded their model
+LEGACY_EMBEDDING_MODEL = 'BAAI/bge-small-en-v1.5'
+LEGACY_EMBEDDING_DIMS = 384
+
+_embedding_models = {}
+_model_lock = threading.Lock()
+
+def get_embedding_model(model_name: str = None):
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    model = _embedding_models.get(model_name)
+    if model is not None:
+        return model
+        
+    with _model_lock:
+        # Double-check pattern
+        model = _embedding_models.get(model_name)
+        if model is None:
+            print(f"📦 Loading embedding model ({model_name}, {active_backend()})... This may take a moment.")
+            try:
+                # Set a specific cache folder if needed, or rely on default
+                model = load_sentence_transformer(model_name)
+                _embedding_models[model_name] = model
+                print("✅ Embedding model loaded successfully")
+            except Exception as e:
+                print(f"❌ Failed to load embedding model: {e}")
+                raise e
+                
+    return model
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query embeddings keyed by (model id, normalized query text).
+
+    When QUERY_EMBEDDING_CACHE_REDIS_URL is set, misses fall through to a shared Redis
+    tier so every worker process benefits from embeddings computed by the others.
+    """
+
+    def __init__(self, max_size: int = None, redis_url: str = None, ttl_seconds: int = None):
+        self.max_size = max_size or settings.QUERY_EMBEDDING_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds or settings.QUERY_EMBEDDING_CACHE_TTL
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        redis_url = redis_url if redis_url is not None else settings.QUERY_EMBEDDING_CACHE_REDIS_URL
+        if redis_url:
+            if aioredis:
+                self._redis = aioredis.from_url(redis_url)
+            else:
+                print("⚠️ QUERY_EMBEDDING_CACHE_REDIS_URL is set but redis is not installed, using local cache only")
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> str:
+        # Keyed by backend as well: workers on torch and onnx-int8 can share the Redis tier
+        return f"qemb:{embedding_variant(model_id)}:{normalize_query(text)}"
+
+    def get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put_local(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        vector = self.get_local(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+        
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(key)
+            except Exception as e:
+                print(f"⚠️ Shared embedding cache read failed: {e}")
+                raw = None
+            if raw:
+                vector = np.frombuffer(raw, dtype=np.float32).tolist()
+                self.put_local(key, vector)
+                self.shared_hits += 1
+                return vector
+        
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, vector: List[float]):
+        self.put_local(key, vector)
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, np.asarray(vector, dtype=np.float32).tobytes(), ex=self.ttl_seconds)
+            except Exception as e:
+                print(f"⚠️ Shared embedding cache write failed: {e}")
+
+    def clear(self):
+        """Drop this worker's cached vectors (the shared Redis tier is left alone)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared_hits) / lookups, 3) if lookups else 0.0
+        }
+
+class EmbeddingService:
+    """Embeds queries off the event loop, coalescing concurrent requests into micro-batches.
+
+    Every coroutine awaiting embed() enqueues its text; a single batcher task collects up to
+    max_batch_size texts (waiting at most max_wait_ms after the first one) and runs one
+    encode call on a dedicated worker thread.
+    """
+
+    def __init__(self, max_batch_size: int = None, max_wait_ms: float = None, cache: QueryEmbeddingCache = None):
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_MAX_WAIT_MS) / 1000
+        self.cache = cache or QueryEmbeddingCache()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._inflight = {}
+        self.batches = 0
+        self.embedded = 0
+
+    async def embed(self, text: str, model_name: str = None) -> List[float]:
+        model_name = model_name or EMBEDDING_MODEL_NAME
+        key = QueryEmbeddingCache.make_key(model_name, text)
+        vector = await self.cache.get(key)
+        if vector is not None:
+            return vector
+        
+        self._ensure_worker()
+        # Identical queries already waiting on a batch share its result
+        future = self._inflight.get(key)
+        if future is None or future.get_loop() is not self._loop:
+            future = self._loop.create_future()
+            self._inflight[key] = future
+            self._queue.put_nowait((text, model_name, future))
+            try:
+                vector = await asyncio.shield(future)
+            finally:
+                self._inflight.pop(key, None)
+            await self.cache.put(key, vector)
+            return vector
+        return await asyncio.shield(future)
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, 0.001))
+        # Callers that were cancelled while queued don't need a forward pass
+        return [item for item in batch if not item[2].done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            # Chatbots mid-migration query with a different model; each model gets its own pass
+            by_model = {}
+            for text, model_name, future in batch:
+                by_model.setdefault(model_name, []).append((text, future))
+            
+            for model_name, items in by_model.items():
+                try:
+                    vectors = await self._loop.run_in_executor(self._executor, self._encode, [text for text, _ in items], model_name)
+                except Exception as e:
+                    for _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                
+                self.batches += 1
+                self.embedded += len(items)
+                for (_, future), vector in zip(items, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+
+    def _encode(self, texts: List[str], model_name: str = None) -> List[List[float]]:
+        model = get_embedding_model(model_name)
+        return model.encode(texts, batch_size=len(texts), show_progress_bar=False).tolist()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "embedded": self.embedded,
+            "avg_batch_size": round(self.embedded / self.batches, 2) if self.batches else 0.0,
+            "cache": self.cache.stats()
+        }
+
+embedding_service = EmbeddingService()
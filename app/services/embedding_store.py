@@ -0,0 +1,106 @@
+import hashlib
+from datetime import datetime
+from typing import Callable, Dict, List
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import SessionLocal, ChunkEmbedding
+from app.services.embedding_backends import embedding_variant
+from app.services.embedding_service import EMBEDDING_MODEL_NAME
+
+LOOKUP_BATCH_SIZE = 500
+
+class EmbeddingStore:
+    """Persistent content-addressed cache of chunk embeddings.
+
+    Rows are keyed by (model id and embedding backend, sha256 of the whitespace-normalized
+    text), so vectors from an int8 model are never served to an fp32 one, and re-scraping
+    or re-uploading unchanged content reuses last run's vectors instead of calling the
+    model. Storage failures never fail an ingest; the chunks are simply embedded.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, session_factory=SessionLocal):
+        self.model_name = model_name
+        self.session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+    def get_many(self, hashes: List[str], model_name: str = None) -> Dict[str, np.ndarray]:
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        variant = embedding_variant(model_name or self.model_name)
+        with self.session_factory() as db:
+            for start in range(0, len(unique), LOOKUP_BATCH_SIZE):
+                rows = db.query(ChunkEmbedding.content_hash, ChunkEmbedding.embedding).filter(
+                    ChunkEmbedding.model == variant,
+                    ChunkEmbedding.content_hash.in_(unique[start:start + LOOKUP_BATCH_SIZE])
+                ).all()
+                for content_hash, embedding in rows:
+                    found[content_hash] = np.frombuffer(embedding, dtype=np.float32)
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray], model_name: str = None):
+        if not vectors:
+            return
+        now = datetime.utcnow()
+        variant = embedding_variant(model_name or self.model_name)
+        rows = [
+            {
+                "model": variant,
+                "content_hash": content_hash,
+                "dims": len(vector),
+                "embedding": np.asarray(vector, dtype=np.float32).tobytes(),
+                "created_at": now
+            }
+            for content_hash, vector in vectors.items()
+        ]
+        with self.session_factory() as db:
+            dialect = db.get_bind().dialect.name
+            # Concurrent ingests may store the same chunk; the first writer wins
+            if dialect == "postgresql":
+                db.execute(postgresql.insert(ChunkEmbedding).on_conflict_do_nothing(), rows)
+            elif dialect == "sqlite":
+                db.execute(sqlite.insert(ChunkEmbedding).on_conflict_do_nothing(), rows)
+            else:
+                for row in rows:
+                    db.merge(ChunkEmbedding(**row))
+            db.commit()
+
+    def embed(self, texts: List[str], encode: Callable[[List[str]], np.ndarray], model_name: str = None) -> List[np.ndarray]:
+        """Embeddings for texts under model_name, calling encode() only for texts not stored yet"""
+        hashes = [self.content_hash(text) for text in texts]
+        try:
+            stored = self.get_many(hashes, model_name)
+        except Exception as e:
+            print(f"⚠️  Embedding store lookup failed: {e}")
+            stored = {}
+
+        missing = {}
+        for text, content_hash in zip(texts, hashes):
+            if content_hash not in stored and content_hash not in missing:
+                missing[content_hash] = text
+        self.hits += sum(1 for content_hash in hashes if content_hash in stored)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = encode(list(missing.values()))
+            fresh = {content_hash: np.asarray(vector, dtype=np.float32) for content_hash, vector in zip(missing.keys(), vectors)}
+            try:
+                self.put_many(fresh, model_name)
+            except Exception as e:
+                print(f"⚠️  Embedding store write failed: {e}")
+            stored.update(fresh)
+        return [stored[content_hash] for content_hash in hashes]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+embedding_store = EmbeddingStore()
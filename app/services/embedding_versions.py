@@ -0,0 +1,114 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import or_
+from app.core.config import settings
+from app.database import SessionLocal, ChatbotEmbeddingModel
+from app.services.embedding_service import EMBEDDING_MODEL_NAME, LEGACY_EMBEDDING_MODEL
+
+def _record(db, chatbot_id: int) -> Optional[ChatbotEmbeddingModel]:
+    return db.query(ChatbotEmbeddingModel).filter(ChatbotEmbeddingModel.chatbot_id == chatbot_id).first()
+
+class ChatbotModelRegistry:
+    """Which embedding model each chatbot's live index was built with.
+
+    Queries and ingest both embed with the chatbot's model, so changing EMBEDDING_MODEL
+    only affects new chatbots until the migrator re-embeds existing ones. Lookups are
+    cached for EMBEDDING_MODEL_CACHE_SECONDS; other workers pick up a cutover when their
+    entry expires (searches also notice hits from a newer model and refresh early).
+    """
+
+    def __init__(self, session_factory=SessionLocal, ttl_seconds: int = None):
+        self.session_factory = session_factory
+        self.ttl_seconds = settings.EMBEDDING_MODEL_CACHE_SECONDS if ttl_seconds is None else ttl_seconds
+        self._entries: Dict[int, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, chatbot_id: int) -> Optional[str]:
+        """The chatbot's model if known without a database round trip"""
+        entry = self._entries.get(chatbot_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def model_for(self, chatbot_id: int, backend=None, fresh: bool = False) -> str:
+        """The chatbot's model; fresh skips the cache (ingest batches, where a stale answer writes wrong vectors)"""
+        model_name = None if fresh else self.cached(chatbot_id)
+        if model_name is not None:
+            return model_name
+
+        with self.session_factory() as db:
+            record = _record(db, chatbot_id)
+            if record is not None:
+                model_name = record.model
+            else:
+                model_name = self._initial_model(chatbot_id, backend)
+                if model_name is None:
+                    return LEGACY_EMBEDDING_MODEL
+                db.add(ChatbotEmbeddingModel(chatbot_id=chatbot_id, model=model_name))
+                try:
+                    db.commit()
+                except Exception:
+                    # Another worker recorded it first
+                    db.rollback()
+                    model_name = _record(db, chatbot_id).model
+
+        with self._lock:
+            self._entries[chatbot_id] = (model_name, time.monotonic() + self.ttl_seconds)
+        return model_name
+
+    @staticmethod
+    def _initial_model(chatbot_id: int, backend) -> Optional[str]:
+        """EMBEDDING_MODEL for empty chatbots; existing content predates versioning"""
+        if backend is None:
+            from app.services.search_backend import get_search_backend
+            backend = get_search_backend()
+        try:
+            backend.ensure_index(chatbot_id)
+            has_content = backend.count(chatbot_id) > 0
+        except Exception as e:
+            print(f"⚠️  Could not check content of chatbot {chatbot_id}: {e}")
+            return None
+        return LEGACY_EMBEDDING_MODEL if has_content else EMBEDDING_MODEL_NAME
+
+    def get(self, chatbot_id: int) -> Optional[ChatbotEmbeddingModel]:
+        with self.session_factory() as db:
+            return _record(db, chatbot_id)
+
+    def update(self, chatbot_id: int, **fields):
+        model_changed = "model" in fields
+        with self.session_factory() as db:
+            record = _record(db, chatbot_id)
+            if record is None:
+                record = ChatbotEmbeddingModel(chatbot_id=chatbot_id, model=fields.pop("model", LEGACY_EMBEDDING_MODEL))
+                db.add(record)
+            for field, value in fields.items():
+                setattr(record, field, value)
+            db.commit()
+        if model_changed:
+            self.invalidate(chatbot_id)
+
+    def claim(self, chatbot_id: int, target_model: str) -> bool:
+        """Mark the chatbot as migrating unless another live migrator holds it.
+
+        A migration whose record hasn't been touched for EMBEDDING_MIGRATION_STALE_SECONDS
+        is assumed dead and can be taken over.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.EMBEDDING_MIGRATION_STALE_SECONDS)
+        with self.session_factory() as db:
+            claimed = db.query(ChatbotEmbeddingModel).filter(
+                ChatbotEmbeddingModel.chatbot_id == chatbot_id,
+                or_(ChatbotEmbeddingModel.status != "migrating", ChatbotEmbeddingModel.updated_at < stale_before)
+            ).update(
+                {"status": "migrating", "target_model": target_model, "updated_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        return claimed == 1
+
+    def invalidate(self, chatbot_id: int):
+        with self._lock:
+            self._entries.pop(chatbot_id, None)
+
+model_registry = ChatbotModelRegistry()
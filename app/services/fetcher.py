@@ -0,0 +1,174 @@
+import asyncio
+import random
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from app.core.config import settings
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+]
+
+RENDER_MODES = ("auto", "always", "never")
+# Anti-bot challenges are served to plain HTTP clients; a real browser often gets through
+RENDER_STATUSES = {403, 429, 503}
+JS_REQUIRED_PATTERN = re.compile(
+    r"enable javascript|javascript is (?:required|disabled)|requires javascript"
+    r"|<div[^>]+id=[\"'](?:root|app|__next|__nuxt)[\"'][^>]*>\s*</div>"
+    r"|ng-app|data-reactroot",
+    re.IGNORECASE
+)
+# A render-only site still gets a static attempt every so often, in case only its first pages were apps
+STATIC_RETRY_EVERY = 20
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    html: str
+    content_type: str
+
+    @property
+    def is_html(self) -> bool:
+        return not self.content_type or "html" in self.content_type
+
+def needs_rendering(html: str, text: str, min_chars: int = None) -> bool:
+    """Whether statically fetched html probably only has its content after JavaScript runs"""
+    min_chars = settings.SCRAPE_MIN_STATIC_TEXT_CHARS if min_chars is None else min_chars
+    if len(text) < min_chars:
+        return True
+    # App shells often carry some boilerplate text; a JS marker plus thin text still counts
+    return len(text) < min_chars * 4 and JS_REQUIRED_PATTERN.search(html) is not None
+
+class RenderPolicy:
+    """Per-host record of whether static HTML is good enough.
+
+    The first SCRAPE_JS_PROBE_PAGES pages of a host are fetched statically and checked;
+    once most of them needed a browser, the host's later pages go straight to rendering
+    and skip the wasted HTTP round trip.
+    """
+
+    def __init__(self, mode: str = None, probe_pages: int = None):
+        self.mode = mode or settings.SCRAPE_RENDER_MODE
+        if self.mode not in RENDER_MODES:
+            raise ValueError(f"Unknown SCRAPE_RENDER_MODE '{self.mode}'")
+        self.probe_pages = probe_pages or settings.SCRAPE_JS_PROBE_PAGES
+        self._static: Dict[str, int] = defaultdict(int)
+        self._rendered: Dict[str, int] = defaultdict(int)
+        self._skipped: Dict[str, int] = defaultdict(int)
+        self._announced = set()
+
+    def render_first(self, host: str) -> bool:
+        if self.mode != "auto":
+            return self.mode == "always"
+        if not self.needs_js(host):
+            return False
+        self._skipped[host] += 1
+        return self._skipped[host] % STATIC_RETRY_EVERY != 0
+
+    def needs_js(self, host: str) -> bool:
+        checked = self._static[host] + self._rendered[host]
+        return checked >= self.probe_pages and self._rendered[host] * 2 > checked
+
+    @property
+    def rendered_pages(self) -> int:
+        return sum(self._rendered.values())
+
+    def record(self, host: str, rendered: bool):
+        if rendered:
+            self._rendered[host] += 1
+        else:
+            self._static[host] += 1
+        if host not in self._announced and self.needs_js(host):
+            self._announced.add(host)
+            print(f"🧩 {host} needs JavaScript; rendering its pages directly")
+
+class AsyncFetcher:
+    """Concurrent static page fetches over one pooled httpx client.
+
+    At most SCRAPE_HOST_CONCURRENCY requests are in flight per host, so a crawl is fast
+    without hammering the site; a host given a crawl delay (from robots.txt) gets its
+    requests started that far apart. Use as an async context manager.
+    """
+
+    def __init__(self, host_concurrency: int = None, timeout: float = None):
+        self.host_concurrency = host_concurrency or settings.SCRAPE_HOST_CONCURRENCY
+        self.timeout = timeout or settings.SCRAPE_HTTP_TIMEOUT_SECONDS
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._crawl_delays: Dict[str, float] = {}
+        self._next_request_at: Dict[str, float] = {}
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={
+                "User-Agent": random.choice(USER_AGENTS),
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9"
+            },
+            limits=httpx.Limits(max_connections=max(self.host_concurrency * 4, 20), max_keepalive_connections=self.host_concurrency * 2)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.aclose()
+        return False
+
+    def _slots(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.host_concurrency)
+        return self._host_slots[host]
+
+    def set_crawl_delay(self, host: str, seconds: float):
+        self._crawl_delays[host] = seconds
+    
+    async def throttle(self, host: str):
+        """Wait for host's next request slot under its crawl delay; renders call this too"""
+        delay = self._crawl_delays.get(host)
+        if not delay:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # Reserve the slot before sleeping, so concurrent callers queue up one delay apart
+        start = max(now, self._next_request_at.get(host, now))
+        self._next_request_at[host] = start + delay
+        await asyncio.sleep(start - now)
+
+    async def fetch_bytes(self, url: str, max_bytes: int) -> Tuple[int, bytes]:
+        """(status, body) for non-page resources such as robots.txt and sitemaps"""
+        host = urlparse(url).netloc
+        async with self._slots(host):
+            await self.throttle(host)
+            try:
+                async with self.client.stream("GET", url) as response:
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) > max_bytes:
+                            raise ValueError(f"{url} is larger than {max_bytes} bytes")
+                    return response.status_code, bytes(body)
+            except httpx.TimeoutException as e:
+                raise TimeoutError(f"timeout fetching {url}") from e
+
+    async def fetch(self, url: str) -> FetchResult:
+        host = urlparse(url).netloc
+        async with self._slots(host):
+            await self.throttle(host)
+            try:
+                async with self.client.stream("GET", url) as response:
+                    content_type = response.headers.get("content-type", "")
+                    html = ""
+                    # Links to PDFs, images and downloads aren't pages; don't pull their bodies
+                    if not content_type or "html" in content_type:
+                        await response.aread()
+                        html = response.text
+                    return FetchResult(url=str(response.url), status=response.status_code, html=html, content_type=content_type)
+            except httpx.TimeoutException as e:
+                raise TimeoutError(f"timeout fetching {url}") from e
@@ -0,0 +1,106 @@
+import heapq
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+
+# Each crawled page linking to a queued URL moves it up by a fraction of a level, never a whole one
+INLINK_BOOST = 0.1
+MAX_INLINK_BOOST = 0.9
+# Listed in the sitemap: up to half a level, scaled by the sitemap's <priority>
+SITEMAP_BOOST = 0.5
+
+class CrawlFrontier:
+    """URLs a crawl still has to fetch, shallowest and best-linked first.
+
+    URLs are keyed by their normalized form, so checking whether one is already queued,
+    in flight or done is a set lookup. Priority is link depth from the start page, less a
+    boost for URLs many crawled pages link to and for URLs listed in the sitemap; a boost
+    re-pushes the URL and the outdated heap entry is skipped when it surfaces.
+
+    snapshot() is JSON for crawl checkpoints; URLs in flight go back in the queue, so a
+    restored frontier fetches them again.
+    """
+
+    def __init__(self, max_urls: int = None):
+        self.max_urls = max_urls or settings.SCRAPE_FRONTIER_MAX_URLS
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        # key -> {url, depth, inlinks, sitemap, seq}
+        self._queued: Dict[str, dict] = {}
+        self._in_flight: Dict[str, dict] = {}
+        self.done: Set[str] = set()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._queued or key in self._in_flight or key in self.done
+
+    @staticmethod
+    def _priority(entry: dict) -> float:
+        boost = min(entry['inlinks'] * INLINK_BOOST, MAX_INLINK_BOOST) + entry['sitemap'] * SITEMAP_BOOST
+        return entry['depth'] - boost
+
+    def _push(self, key: str, entry: dict):
+        entry['seq'] = next(self._counter)
+        heapq.heappush(self._heap, (self._priority(entry), entry['seq'], key))
+
+    def add(self, url: str, depth: int, key: str = None, sitemap_priority: float = None) -> bool:
+        """Queue url unless its key has been seen; True if it was newly queued.
+
+        Adding a URL that is already queued counts as one more inlink, or records its
+        sitemap priority, and moves it up accordingly.
+        """
+        key = key or url
+        entry = self._queued.get(key)
+        if entry is not None:
+            if sitemap_priority is not None:
+                entry['sitemap'] = max(entry['sitemap'], sitemap_priority)
+            else:
+                entry['inlinks'] += 1
+            entry['depth'] = min(entry['depth'], depth)
+            self._push(key, entry)
+            return False
+        if key in self._in_flight or key in self.done:
+            return False
+        if len(self._queued) >= self.max_urls:
+            self.dropped += 1
+            return False
+        entry = {'url': url, 'depth': depth, 'inlinks': 0, 'sitemap': sitemap_priority or 0.0}
+        self._queued[key] = entry
+        self._push(key, entry)
+        return True
+
+    def pop(self) -> Optional[Tuple[str, str, int]]:
+        """(key, url, depth) of the next URL to fetch, or None if nothing is queued"""
+        while self._heap:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._queued.get(key)
+            if entry is None or entry['seq'] != seq:
+                continue
+            del self._queued[key]
+            self._in_flight[key] = entry
+            return key, entry['url'], entry['depth']
+        return None
+
+    def complete(self, key: str):
+        self._in_flight.pop(key, None)
+        self.done.add(key)
+
+    def snapshot(self) -> dict:
+        queued = list(self._queued.items()) + list(self._in_flight.items())
+        return {
+            'queued': [[key, e['url'], e['depth'], e['inlinks'], e['sitemap']] for key, e in queued],
+            'done': sorted(self.done)
+        }
+
+    @classmethod
+    def restore(cls, snapshot: dict, max_urls: int = None) -> 'CrawlFrontier':
+        frontier = cls(max_urls)
+        frontier.done = set(snapshot.get('done', []))
+        for key, url, depth, inlinks, sitemap in snapshot.get('queued', []):
+            entry = {'url': url, 'depth': depth, 'inlinks': inlinks, 'sitemap': sitemap}
+            frontier._queued[key] = entry
+            frontier._push(key, entry)
+        return frontier
@@ -0,0 +1,228 @@
+import threading
+import time
+from typing import Optional, Set
+from elasticsearch import Elasticsearch, NotFoundError, BadRequestError, helpers
+from app.core.config import settings
+
+EMBEDDING_DIMS = settings.EMBEDDING_DIMS
+# Keyword fields searches can be scoped by
+SEARCH_FILTER_FIELDS = ("domain_id", "document_id", "tags")
+
+INDEX_SETTINGS = {
+    "analysis": {
+        "analyzer": {
+            "english_light": {
+                "type": "custom",
+                "tokenizer": "standard",
+                "filter": ["lowercase", "english_possessive_stemmer", "light_english_stemmer"]
+            }
+        },
+        "filter": {
+            "english_possessive_stemmer": {
+                "type": "stemmer",
+                "name": "possessive_english"
+            },
+            "light_english_stemmer": {
+                "type": "stemmer",
+                "name": "light_english"
+            }
+        }
+    }
+}
+
+# EMBEDDING_STORAGE -> HNSW index_options type; ES keeps the raw float vectors on disk
+# for these, so scripts can still rescore candidates at full precision
+QUANTIZED_INDEX_TYPES = {
+    "int8": "int8_hnsw",
+    "int4": "int4_hnsw",
+    "binary": "bbq_hnsw"
+}
+
+def build_index_mappings(dims: int = None) -> dict:
+    embedding = {
+        "type": "dense_vector",
+        "dims": dims or EMBEDDING_DIMS,
+        "index": True,
+        "similarity": "cosine"
+    }
+    index_type = QUANTIZED_INDEX_TYPES.get(settings.EMBEDDING_STORAGE)
+    if index_type:
+        embedding["index_options"] = {"type": index_type}
+    
+    return {
+        "properties": {
+            "url": {"type": "keyword"},
+            "title": {
+                "type": "text",
+                "analyzer": "english_light"
+            },
+            "content": {
+                "type": "text",
+                "analyzer": "english_light"
+            },
+            "chunk_index": {"type": "integer"},
+            "chatbot_id": {"type": "integer"},
+            # Only ever matched exactly (search scoping, deletes), where keyword terms beat numeric ranges
+            "domain_id": {"type": "keyword"},
+            "document_id": {"type": "keyword"},
+            "tags": {"type": "keyword"},
+            "source_urls": {"type": "keyword"},
+            "simhash": {"type": "long", "index": False},
+            "embedding_model": {"type": "keyword"},
+            "embedding": embedding
+        }
+    }
+
+
+class IndexManager:
+    """Alias-based index lifecycle for chatbot content.
+
+    Callers only ever use logical names (e.g. `chatbot-42`), which are aliases over
+    versioned concrete indices (`chatbot-42-v1718000000000`). Existence is cached in
+    process, so writes after the first one skip the round trip, and a rebuild can fill
+    a fresh index in the background and swap the alias atomically.
+
+    Indices created before aliases existed are concrete indices under the logical name;
+    they keep serving until their first rebuild replaces them with an alias.
+    """
+
+    def __init__(self, client: Elasticsearch):
+        self.client = client
+        self._known = set()
+        self._template_installed = False
+        self._lock = threading.Lock()
+
+    def install_template(self):
+        if self._template_installed:
+            return
+        self.client.indices.put_index_template(
+            name=settings.INDEX_TEMPLATE_NAME,
+            index_patterns=["chatbot-*", f"{settings.SHARED_INDEX_PREFIX}-*"],
+            template={"settings": INDEX_SETTINGS, "mappings": build_index_mappings()},
+            priority=100
+        )
+        self._template_installed = True
+
+    def versioned_name(self, alias: str) -> str:
+        return f"{alias}-v{int(time.time() * 1000)}"
+
+    def ensure(self, alias: str, index_settings: Optional[dict] = None):
+        if alias in self._known:
+            return
+        with self._lock:
+            if alias in self._known:
+                return
+            self.install_template()
+            if not self.client.indices.exists(index=alias):
+                try:
+                    self.client.indices.create(
+                        index=self.versioned_name(alias),
+                        settings=index_settings,
+                        aliases={alias: {"is_write_index": True}}
+                    )
+                except BadRequestError:
+                    # Another worker created it first
+                    if not self.client.indices.exists(index=alias):
+                        raise
+            self._known.add(alias)
+
+    def forget(self, alias: str):
+        self._known.discard(alias)
+
+    def resolve(self, alias: str) -> Optional[str]:
+        """Concrete index currently behind alias (the name itself for legacy indices)"""
+        try:
+            return next(iter(self.client.indices.get_alias(name=alias).keys()))
+        except NotFoundError:
+            pass
+        return alias if self.client.indices.exists(index=alias) else None
+
+    def create_next(self, alias: str, index_settings: Optional[dict] = None, mappings: Optional[dict] = None) -> str:
+        """Create an empty versioned index for alias without pointing the alias at it"""
+        self.install_template()
+        new_index = self.versioned_name(alias)
+        self.client.indices.create(index=new_index, settings=index_settings, mappings=mappings)
+        return new_index
+
+    def copy(self, source: str, dest: str, script: Optional[dict] = None) -> dict:
+        """Reindex source into dest, keeping source versions.
+
+        With external versioning a repeat copy creates missing documents and overwrites
+        only those updated in source since (a higher _version); the rest are version
+        conflicts, which are skipped.
+        """
+        return self.client.options(request_timeout=3600).reindex(
+            source={"index": source},
+            dest={"index": dest, "version_type": "external"},
+            script=script,
+            conflicts="proceed",
+            refresh=True,
+            wait_for_completion=True
+        )
+
+    def swap(self, alias: str, new_index: str, delete_old: bool = True):
+        """Atomically point alias at new_index, dropping whatever served it before"""
+        old_index = self.resolve(alias)
+        actions = [{"add": {"index": new_index, "alias": alias, "is_write_index": True}}]
+        if old_index == alias:
+            # Legacy concrete index: it has to go in the same request to free the name
+            actions.append({"remove_index": {"index": old_index}})
+        elif old_index:
+            actions.append({"remove": {"index": old_index, "alias": alias}})
+        self.client.indices.update_aliases(actions=actions)
+        self._known.add(alias)
+
+        if delete_old and old_index and old_index != alias:
+            self.client.indices.delete(index=old_index, ignore_unavailable=True)
+        return old_index
+
+    def _ids(self, index_name: str) -> Set[str]:
+        self.client.indices.refresh(index=index_name)
+        hits = helpers.scan(self.client, index=index_name, query={"query": {"match_all": {}}, "_source": False}, size=5000)
+        return {hit["_id"] for hit in hits}
+
+    def _catch_up(self, source: str, dest: str, script: Optional[dict] = None):
+        """Copy writes made to source since the last copy, and replay its deletes by id"""
+        self.copy(source, dest, script=script)
+        removed = self._ids(dest) - self._ids(source)
+        if removed:
+            helpers.bulk(
+                self.client,
+                ({"_op_type": "delete", "_index": dest, "_id": doc_id} for doc_id in removed),
+                raise_on_error=False,
+                refresh=True
+            )
+
+    def _block_writes(self, index_name: str, blocked: bool):
+        self.client.indices.put_settings(index=index_name, settings={"index": {"blocks": {"write": True if blocked else None}}})
+
+    def rebuild(self, alias: str, index_settings: Optional[dict] = None, mappings: Optional[dict] = None, script: Optional[dict] = None) -> str:
+        """Reindex alias into a fresh index (new settings/mappings from the template) and swap it in.
+
+        Queries keep hitting the old index until the swap. Writes and deletes made during the
+        bulk copy are caught up by a second pass; the last, short pass runs with writes to
+        the old index blocked, so nothing changes between it and the swap. A write in that
+        window fails rather than being lost.
+        """
+        source = self.resolve(alias)
+        if source is None:
+            self.ensure(alias, index_settings)
+            return self.resolve(alias)
+
+        started = time.perf_counter()
+        new_index = self.create_next(alias, index_settings=index_settings, mappings=mappings)
+        blocked = False
+        try:
+            self.copy(source, new_index, script=script)
+            self._catch_up(source, new_index, script=script)
+            self._block_writes(source, True)
+            blocked = True
+            self._catch_up(source, new_index, script=script)
+            self.swap(alias, new_index)
+        except Exception:
+            if blocked:
+                self._block_writes(source, False)
+            self.client.indices.delete(index=new_index, ignore_unavailable=True)
+            raise
+        print(f"🔁 Rebuilt '{alias}': {source} → {new_index} in {time.perf_counter() - started:.1f}s")
+        return new_index
@@ -0,0 +1,83 @@
+"""Move per-chatbot `chatbot-{id}` indices into the shared, chatbot_id-routed layout.
+
+Run with SEARCH_INDEX_LAYOUT=shared:
+
+    python -m app.services.index_migration [--chatbot-id ID ...] [--delete-source]
+"""
+import argparse
+import re
+from typing import List, Optional
+from app.services.search_backend import ElasticsearchBackend, get_search_backend, legacy_index_name
+
+LEGACY_INDEX_PATTERN = re.compile(r"^chatbot-(\d+)$")
+
+def list_legacy_indices(backend: ElasticsearchBackend) -> List[int]:
+    # Per-chatbot names are either legacy concrete indices or aliases over versioned ones
+    indices = backend.client.indices.get_alias(index="chatbot-*", ignore_unavailable=True, allow_no_indices=True)
+    names = set(indices.keys())
+    for index in indices.values():
+        names.update(index.get("aliases", {}).keys())
+    chatbot_ids = set()
+    for name in names:
+        match = LEGACY_INDEX_PATTERN.match(name)
+        if match:
+            chatbot_ids.add(int(match.group(1)))
+    return sorted(chatbot_ids)
+
+def migrate_chatbot(backend: ElasticsearchBackend, chatbot_id: int, delete_source: bool = False) -> dict:
+    source_index = legacy_index_name(chatbot_id)
+    target_index = backend.index_name(chatbot_id)
+    backend.ensure_index(chatbot_id)
+
+    source_count = backend.client.count(index=source_index)["count"]
+    # Source _ids are kept, so re-running the migration overwrites instead of duplicating
+    response = backend.client.options(request_timeout=3600).reindex(
+        source={"index": source_index},
+        dest={"index": target_index, "routing": f"={chatbot_id}"},
+        script={"source": "ctx._source.chatbot_id = params.chatbot_id", "params": {"chatbot_id": chatbot_id}},
+        conflicts="proceed",
+        refresh=True,
+        wait_for_completion=True
+    )
+    migrated_count = backend.count(chatbot_id)
+
+    result = {
+        "chatbot_id": chatbot_id,
+        "source": source_index,
+        "target": target_index,
+        "source_docs": source_count,
+        "target_docs": migrated_count,
+        "failures": len(response.get("failures", [])),
+        "source_deleted": False
+    }
+
+    if delete_source and not result["failures"] and migrated_count >= source_count:
+        concrete_indices = list(backend.client.indices.get(index=source_index).keys())
+        backend.client.indices.delete(index=",".join(concrete_indices))
+        result["source_deleted"] = True
+
+    return result
+
+def migrate_to_shared_layout(chatbot_ids: Optional[List[int]] = None, delete_source: bool = False) -> List[dict]:
+    backend = get_search_backend()
+    if not isinstance(backend, ElasticsearchBackend) or not backend.shared:
+        raise ValueError("Set SEARCH_BACKEND=elasticsearch and SEARCH_INDEX_LAYOUT=shared before migrating")
+
+    results = []
+    for chatbot_id in chatbot_ids or list_legacy_indices(backend):
+        try:
+            result = migrate_chatbot(backend, chatbot_id, delete_source=delete_source)
+            print(f"✅ chatbot {chatbot_id}: {result['source_docs']} → {result['target_docs']} docs in {result['target']}"
+                  f"{' (source deleted)' if result['source_deleted'] else ''}")
+        except Exception as e:
+            result = {"chatbot_id": chatbot_id, "error": str(e)}
+            print(f"❌ chatbot {chatbot_id}: migration failed: {e}")
+        results.append(result)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate per-chatbot indices into the shared index layout")
+    parser.add_argument("--chatbot-id", type=int, action="append", dest="chatbot_ids", help="Only migrate these chatbots")
+    parser.add_argument("--delete-source", action="store_true", help="Delete each per-chatbot index after a verified copy")
+    args = parser.parse_args()
+    migrate_to_shared_layout(args.chatbot_ids, delete_source=args.delete_source)
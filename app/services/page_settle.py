@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+from typing import Dict, Set, Tuple
+from selenium.common.exceptions import TimeoutException
+from app.core.config import settings
+
+POLL_SECONDS = 0.05
+# Like networkidle2: analytics beacons and long-polling connections never finish
+MAX_IDLE_INFLIGHT = 2
+PAGE_STATE_SCRIPT = "return [document.readyState, document.body ? document.body.textContent.length : 0]"
+
+def _drain_network(driver, inflight: Set[str]) -> bool:
+    """Apply pending CDP Network events to inflight; True if any request started or finished"""
+    active = False
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        method = message.get("method", "")
+        if method == "Network.requestWillBeSent":
+            inflight.add(message["params"]["requestId"])
+            active = True
+        elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+            inflight.discard(message["params"]["requestId"])
+            active = True
+    return active
+
+def load_and_settle(driver, url: str, timeout: float, quiet_seconds: float = None) -> Tuple[bool, float]:
+    """Navigate to url and wait until the page has settled or timeout passes.
+
+    Settled means the document is complete, the network has been idle (Network events
+    from the browser's performance log) and the page text has stopped changing, all for
+    quiet_seconds. Returns (settled, seconds since navigation started).
+    """
+    quiet_seconds = settings.SCRAPE_SETTLE_QUIET_MS / 1000 if quiet_seconds is None else quiet_seconds
+    inflight: Set[str] = set()
+    track_network = True
+    try:
+        # Events from the previous page (or the pool's about:blank reset)
+        driver.get_log("performance")
+    except Exception:
+        track_network = False
+
+    started = time.monotonic()
+    deadline = started + timeout
+    try:
+        driver.get(url)
+    except TimeoutException:
+        # Still loading subresources; whatever rendered so far is checked below
+        pass
+
+    last_change = time.monotonic()
+    last_length = -1
+    while True:
+        now = time.monotonic()
+        ready_state, length = driver.execute_script(PAGE_STATE_SCRIPT)
+        if length != last_length:
+            last_length = length
+            last_change = now
+        if track_network:
+            try:
+                if _drain_network(driver, inflight):
+                    last_change = now
+            except Exception:
+                track_network = False
+        network_idle = not track_network or len(inflight) <= MAX_IDLE_INFLIGHT
+        if ready_state == "complete" and network_idle and now - last_change >= quiet_seconds:
+            return True, now - started
+        if now >= deadline:
+            return False, now - started
+        time.sleep(POLL_SECONDS)
+
+class SettleTimeouts:
+    """Per-domain settle timeouts learned from previous page loads.
+
+    Starts at SCRAPE_SETTLE_TIMEOUT_SECONDS and tracks a moving average of how long the
+    domain's pages took, allowing a few times that; loads that time out push it up so
+    slow single-page apps get longer. Bounded by the MIN and MAX settings.
+    """
+
+    def __init__(self, default: float = None, minimum: float = None, maximum: float = None, smoothing: float = 0.3):
+        self.default = default or settings.SCRAPE_SETTLE_TIMEOUT_SECONDS
+        self.minimum = minimum or settings.SCRAPE_SETTLE_MIN_SECONDS
+        self.maximum = maximum or settings.SCRAPE_SETTLE_MAX_SECONDS
+        self.smoothing = smoothing
+        self._average: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def timeout_for(self, host: str) -> float:
+        average = self._average.get(host)
+        if average is None:
+            return self.default
+        return min(max(average * 3, self.minimum), self.maximum)
+
+    def record(self, host: str, seconds: float, settled: bool):
+        with self._lock:
+            if not settled:
+                seconds = min(max(seconds, self._average.get(host, 0.0)) * 1.5, self.maximum)
+            average = self._average.get(host)
+            self._average[host] = seconds if average is None else average + self.smoothing * (seconds - average)
+
+settle_timeouts = SettleTimeouts()
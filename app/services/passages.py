@@ -0,0 +1,161 @@
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+import numpy as np
+from app.core.config import settings
+from app.services.embedding_backends import embedding_variant
+from app.services.embedding_service import get_embedding_model, EMBEDDING_MODEL_NAME
+from app.services.embedding_store import EmbeddingStore
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+MAX_SENTENCE_CHARS = 400
+# Rough token estimate for budgeting; close enough for English prose with Llama tokenizers
+CHARS_PER_TOKEN = 4
+
+# Window embedding gets its own thread so it never queues ahead of query embeddings
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="passages")
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for piece in SENTENCE_BOUNDARY.split(text or ""):
+        piece = piece.strip()
+        # Scraped text often has no punctuation at all, so long runs are cut on word boundaries
+        while len(piece) > MAX_SENTENCE_CHARS:
+            cut = piece.rfind(" ", 0, MAX_SENTENCE_CHARS)
+            if cut <= 0:
+                cut = MAX_SENTENCE_CHARS
+            sentences.append(piece[:cut])
+            piece = piece[cut:].strip()
+        if piece:
+            sentences.append(piece)
+    return sentences
+
+def _windows(sentences: List[str], size: int) -> List[str]:
+    if len(sentences) <= size:
+        return [" ".join(sentences)]
+    return [" ".join(sentences[i:i + size]) for i in range(len(sentences) - size + 1)]
+
+class WindowVectorCache:
+    """Bounded LRU of window embeddings keyed by (model id and backend, content hash).
+
+    Windows are cut from query results, so most of them are never seen again; keeping
+    them in memory rather than in the embedding store stops the query path from growing
+    chunk_embeddings without bound.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or settings.PASSAGE_VECTOR_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts: List[str], encode: Callable[[List[str]], np.ndarray], model_name: str = None) -> List[np.ndarray]:
+        variant = embedding_variant(model_name or EMBEDDING_MODEL_NAME)
+        keys = [(variant, EmbeddingStore.content_hash(text)) for text in texts]
+        found = {}
+        missing = {}
+        with self._lock:
+            for text, key in zip(texts, keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+                elif key not in missing:
+                    missing[key] = text
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = encode(list(missing.values()))
+            fresh = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing.keys(), vectors)}
+            found.update(fresh)
+            with self._lock:
+                self._entries.update(fresh)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return [found[key] for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+window_vector_cache = WindowVectorCache()
+
+def _embed_windows(texts: List[str], model_name: str = None) -> List[np.ndarray]:
+    """Window embeddings, reusing vectors of windows seen by recent queries"""
+    model = get_embedding_model(model_name)
+
+    def encode(missing: List[str]):
+        return model.encode(missing, batch_size=len(missing), show_progress_bar=False)
+
+    return window_vector_cache.embed(texts, encode, model_name)
+
+async def attach_passages(query_embedding: List[float], results: List[dict], window_sentences: int = None, model_name: str = None) -> List[dict]:
+    """Set result['passage'] to the window of consecutive sentences closest to the query.
+
+    Windows from every result are embedded in one batch on the passage thread, with the
+    model that produced query_embedding; windows seen recently come from window_vector_cache.
+    """
+    window_sentences = window_sentences or settings.PASSAGE_WINDOW_SENTENCES
+    spans = []
+    texts = []
+    for result in results:
+        content = result.get('content') or ''
+        windows = _windows(split_sentences(content), window_sentences)
+        if len(windows) <= 1:
+            result['passage'] = content
+            continue
+        spans.append((result, len(texts), len(windows)))
+        texts.extend(windows)
+    if not texts:
+        return results
+
+    vectors = np.asarray(await asyncio.get_running_loop().run_in_executor(_executor, _embed_windows, texts, model_name), dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+    scores = vectors @ query / np.where(norms > 0, norms, 1.0)
+    for result, start, count in spans:
+        best = start + int(np.argmax(scores[start:start + count]))
+        result['passage'] = texts[best]
+        result['_passage_score'] = float(scores[best])
+    return results
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def pack_context(results: List[dict], token_budget: int, render: Callable[[int, dict, str], str], separator: str = "\n\n", use_passages: bool = True) -> str:
+    """Render results in rank order until token_budget is spent.
+
+    Each result contributes its passage (or its whole content when use_passages is off or
+    no passage was extracted). Blocks that don't fit are skipped so a later, shorter one
+    can still go in; the top result is truncated rather than dropped.
+    """
+    blocks = []
+    used = 0
+    for result in results:
+        text = (result.get('passage') if use_passages else None) or result.get('content', '')
+        block = render(len(blocks), result, text)
+        cost = estimate_tokens(block) + (estimate_tokens(separator) if blocks else 0)
+        if used + cost > token_budget:
+            if blocks:
+                continue
+            overflow_chars = (cost - token_budget) * CHARS_PER_TOKEN
+            block = render(0, result, text[:max(len(text) - overflow_chars, 0)])
+            cost = estimate_tokens(block)
+        blocks.append(block)
+        used += cost
+    return separator.join(blocks)
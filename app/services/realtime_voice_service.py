@@ -7,6 +7,7 @@ import re
 from io import BytesIO
 from pydub import AudioSegment
 from app.services import search
+from app.services.passages import pack_context
 from app import database
 import httpx
 from app.services.neural_tts_service import neural_tts
@@ -19,8 +20,8 @@ CODE_KEYWORDS = ['code', 'example', 'how to', 'tutorial', 'syntax', 'implement']
 
 VOICE_SEARCH_RESULT_LIMIT = 3
 VOICE_CONTEXT_RESULT_LIMIT = 5
-STANDARD_CONTEXT_CHARS = 4000
-CODE_CONTEXT_CHARS = 5000
+STANDARD_CONTEXT_TOKENS = 400
+CODE_CONTEXT_TOKENS = 1250
 TTS_SENTENCE_TRIGGER = 1
 TTS_CHAR_TRIGGER = 140
 MIN_TTS_TEXT_LENGTH = 40
@@ -62,11 +63,6 @@ def clean_text_for_tts(text: str) -> str:
         cleaned = cleaned.replace(char, ' ')
     return cleaned.strip()
 
-def _limit_text(text: str, limit: int) -> str:
-    if limit and len(text) > limit:
-        return text[:limit]
-    return text
-
 def _should_send_tts(buffer: str) -> bool:
     if not buffer:
         return False
@@ -99,15 +95,14 @@ async def generate_and_send_audio(ws: WebSocket, text: str, voice_id: str):
 def build_context(results: list, query: str) -> str:
     if not results:
         return ""
-    limit = CODE_CONTEXT_CHARS if is_code_related(query, results) else STANDARD_CONTEXT_CHARS
-    parts = []
-    for i, result in enumerate(results[:VOICE_CONTEXT_RESULT_LIMIT]):
-        content = result.get('content', '')
-        title = result.get('title', 'Untitled')
-        url = result.get('url', '')
-        content = _limit_text(content, limit)
-        parts.append(f"Source {i+1} ({title}):\n{content}")
-    return "\n\n".join(parts)
+    # Code answers need whole chunks; sentence windows would cut examples apart
+    code_mode = is_code_related(query, results)
+    return pack_context(
+        results[:VOICE_CONTEXT_RESULT_LIMIT],
+        CODE_CONTEXT_TOKENS if code_mode else STANDARD_CONTEXT_TOKENS,
+        lambda i, result, text: f"Source {i+1} ({result.get('title', 'Untitled')}):\n{text}",
+        use_passages=not code_mode
+    )
 
 def create_system_prompt(chatbot_name: str, context: str, short_answer: bool = True) -> str:
     length_instruction = "Keep responses conversational, very short, and under 50 words." if short_answer else "Keep responses conversational and under 100 words."
@@ -162,6 +157,7 @@ async def handle_voice_chat(websocket: WebSocket, api_key: str):
                 query = data.get("text", "").strip()
                 top_k = data.get("top_k", 3)
                 short_answer = data.get("short_answer", True)
+                filters = search.parse_search_filters(data.get("filters"))
                 
                 if query:
                     if current_task and not current_task.done():
@@ -174,7 +170,7 @@ async def handle_voice_chat(websocket: WebSocket, api_key: str):
                     
                     interrupt_flag["interrupted"] = False
                     current_task = asyncio.create_task(
-                        process_query(websocket, query, chatbot, domain_ids, db, interrupt_flag, top_k, short_answer)
+                        process_query(websocket, query, chatbot, domain_ids, db, interrupt_flag, top_k, short_answer, filters)
                     )
             elif data.get("type") == "interrupt":
                 print("🛑 Interrupt received from frontend")
@@ -196,14 +192,14 @@ async def handle_voice_chat(websocket: WebSocket, api_key: str):
             except:
                 pass
 
-async def process_query(websocket: WebSocket, text_query: str, chatbot, domain_ids: list, db, interrupt_flag: dict, top_k: int = 3, short_answer: bool = True):
+async def process_query(websocket: WebSocket, text_query: str, chatbot, domain_ids: list, db, interrupt_flag: dict, top_k: int = 3, short_answer: bool = True, filters: dict = None):
     if websocket.client_state != WebSocketState.CONNECTED:
         return
     
     try:
         print(f"💬 Query: '{text_query}' (top_k={top_k}, short={short_answer})")
         # Use the original query directly - our semantic search handles it well
-        results = await search.search_chatbot_content(chatbot.id, text_query, max_results=top_k)
+        results = await search.search_chatbot_content(chatbot.id, text_query, max_results=top_k, filters=filters, **search.get_search_options(chatbot.config))
         print(f"🔍 Found {len(results) if results else 0} results")
         
         context = build_context(results or [], text_query)
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from app.core.config import settings
+
+class CrossEncoderReranker:
+    """Rescores retrieved chunks against the query with a small CPU cross-encoder.
+
+    Scoring runs on a dedicated thread pool under a per-request latency budget. Whenever
+    the budget can't be met (model still loading, all workers busy, predicted or actual
+    scoring time over what's left) the candidates are returned in retrieval order.
+    """
+
+    def __init__(self, model_name: str = None, max_workers: int = None):
+        self.model_name = model_name or settings.RERANK_MODEL
+        self.max_workers = max_workers or settings.RERANK_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rerank")
+        self._model = None
+        self._loading = False
+        self._lock = threading.Lock()
+        self._busy = 0
+        # Moving average of scoring time per candidate, used to predict whether a request fits
+        self._ms_per_candidate = None
+        self.reranked = 0
+        self.skipped = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self):
+        """Load the model in the background; requests skip reranking until it is ready"""
+        with self._lock:
+            if self._model is not None or self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self._load, daemon=True).start()
+
+    def _load(self):
+        print(f"📦 Loading rerank model ({self.model_name})...")
+        try:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name, max_length=settings.RERANK_MAX_LENGTH, device="cpu")
+            print("✅ Rerank model loaded successfully")
+        except Exception as e:
+            print(f"❌ Failed to load rerank model: {e}")
+        finally:
+            self._loading = False
+
+    def _predict(self, query: str, passages: List[str]) -> List[float]:
+        started = time.perf_counter()
+        scores = self._model.predict([(query, passage) for passage in passages], show_progress_bar=False)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        per_candidate = elapsed_ms / max(len(passages), 1)
+        with self._lock:
+            if self._ms_per_candidate is None:
+                self._ms_per_candidate = per_candidate
+            else:
+                self._ms_per_candidate = 0.8 * self._ms_per_candidate + 0.2 * per_candidate
+        return [float(score) for score in scores]
+
+    def _skip(self, reason: str, results: List[dict], keep: int) -> List[dict]:
+        self.skipped += 1
+        print(f"⏭️  Rerank skipped ({reason}), keeping retrieval order")
+        return results[:keep]
+
+    async def rerank(self, query: str, results: List[dict], top_n: int, deadline: Optional[float] = None, fallback_n: int = None) -> List[dict]:
+        """Reorder results by cross-encoder score and keep top_n.
+
+        deadline is a time.perf_counter() value; it defaults to RERANK_BUDGET_MS from now.
+        When reranking is skipped the first fallback_n results (default top_n) are kept.
+        """
+        fallback_n = fallback_n or top_n
+        if len(results) <= 1:
+            return results[:top_n]
+        if not self.ready:
+            self.warm_up()
+            return self._skip("model loading", results, fallback_n)
+
+        deadline = deadline or time.perf_counter() + settings.RERANK_BUDGET_MS / 1000
+        remaining_ms = (deadline - time.perf_counter()) * 1000
+        if remaining_ms <= 0:
+            return self._skip("budget exhausted by retrieval", results, fallback_n)
+        if self._ms_per_candidate is not None and self._ms_per_candidate * len(results) > remaining_ms:
+            return self._skip(f"~{self._ms_per_candidate * len(results):.0f}ms predicted, {remaining_ms:.0f}ms left", results, fallback_n)
+
+        with self._lock:
+            if self._busy >= self.max_workers:
+                busy = True
+            else:
+                busy = False
+                self._busy += 1
+        if busy:
+            return self._skip("all workers busy", results, fallback_n)
+
+        passages = [f"{result.get('title', '')}\n{result.get('content', '')}" for result in results]
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._predict, query, passages)
+        future.add_done_callback(self._release)
+        try:
+            # A timed-out prediction keeps its worker until it finishes, so it still counts as busy
+            scores = await asyncio.wait_for(asyncio.shield(future), timeout=remaining_ms / 1000)
+        except asyncio.TimeoutError:
+            return self._skip(f"over the {remaining_ms:.0f}ms left", results, fallback_n)
+        except Exception as e:
+            return self._skip(f"error: {e}", results, fallback_n)
+
+        for result, score in zip(results, scores):
+            result['_rerank_score'] = score
+        self.reranked += 1
+        ranked = sorted(results, key=lambda result: result['_rerank_score'], reverse=True)
+        return ranked[:top_n]
+
+    def _release(self, _future):
+        with self._lock:
+            self._busy -= 1
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "reranked": self.reranked,
+            "skipped": self.skipped,
+            "ms_per_candidate": round(self._ms_per_candidate, 2) if self._ms_per_candidate is not None else None
+        }
+
+reranker = CrossEncoderReranker()
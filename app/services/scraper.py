@@ -1,23 +1,19 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import random
-import threading
-try:
-    import undetected_chromedriver as uc
-except ImportError:
-    uc = None
-# uc = None # Force standard selenium for speed
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, parse_qs
 import time
-from typing import List, Dict, Optional
+import asyncio
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 from app.services import search
+from app.services.browser_pool import browser_pool, BrowserUnavailableError
+from app.services.page_settle import load_and_settle, settle_timeouts
+from app.services.fetcher import AsyncFetcher, RenderPolicy, needs_rendering, RENDER_STATUSES
+from app.services.tagging import CorpusTagger
+from app.services.frontier import CrawlFrontier
+from app.services.sitemaps import RobotsRules, fetch_robots, fetch_sitemap_entries, DEFAULT_PRIORITY
+from app.core.config import settings
 from app import database
 import tempfile
-import os
 import re
 from pydub import AudioSegment
 from app.services.transcription_service import transcribe_audio_file
@@ -29,118 +25,6 @@ class WebScraper:
         self.visited = set()
         self.failed_attempts = {}
         self.max_retries = 3
-        
-    # Global lock for driver initialization to prevent parallel patching/downloads
-    _driver_lock = threading.Lock()
-
-    def _get_driver(self):
-        user_agent = random.choice([
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
-        ])
-
-        content_block_prefs = {
-            "profile.managed_default_content_settings.images": 2,
-            "profile.managed_default_content_settings.stylesheets": 2,
-            "profile.managed_default_content_settings.fonts": 2,
-            "profile.managed_default_content_settings.plugins": 2,
-            "profile.managed_default_content_settings.popups": 2,
-            "profile.managed_default_content_settings.media_stream": 2,
-            "profile.managed_default_content_settings.media_stream_mic": 2,
-            "profile.managed_default_content_settings.media_stream_camera": 2,
-            "profile.managed_default_content_settings.geolocation": 2,
-            "profile.managed_default_content_settings.notifications": 2,
-        }
-
-        blocked_resource_patterns = [
-            "*.css", "*.jpg", "*.jpeg", "*.png", "*.gif", "*.svg",
-            "*.woff", "*.woff2", "*.ttf", "*.otf", "*.ico",
-            "*.mp4", "*.webm", "*.mp3", "*.wav"
-        ]
-
-        def apply_shared_options(opts):
-            opts.add_argument('--headless=new')
-            opts.add_argument('--no-sandbox')
-            opts.add_argument('--disable-dev-shm-usage')
-            opts.add_argument('--disable-gpu')
-            opts.add_argument('--disable-blink-features=AutomationControlled')
-            opts.add_argument('--disable-extensions')
-            opts.add_argument('--disable-infobars')
-            opts.add_argument('--disable-web-security')
-            opts.add_argument('--allow-running-insecure-content')
-            opts.add_argument('--blink-settings=imagesEnabled=false')
-            opts.add_argument(f'--user-agent={user_agent}')
-            opts.page_load_strategy = 'normal'
-            opts.add_experimental_option("prefs", content_block_prefs)
-
-        # Use lock to ensure sequential initialization
-        with self._driver_lock:
-            driver = None
-            
-            if uc:
-                print("   - Using undetected_chromedriver")
-                options = uc.ChromeOptions()
-                apply_shared_options(options)
-                
-                # Try to find Chrome binary in common locations
-                chrome_paths = [
-                    '/usr/bin/google-chrome',
-                    '/usr/bin/google-chrome-stable',
-                    '/usr/bin/chromium-browser',
-                    '/usr/bin/chromium'
-                ]
-                chrome_binary = None
-                for path in chrome_paths:
-                    if os.path.exists(path):
-                        chrome_binary = path
-                        break
-                
-                if chrome_binary:
-                    options.binary_location = chrome_binary
-                    print(f"   - Chrome binary: {chrome_binary}")
-                
-                import time
-                start_time = time.time()
-                print(f"   - 🕒 Starting uc.Chrome at {start_time}")
-                
-                try:
-                    driver = uc.Chrome(options=options, use_subprocess=True)
-                    print(f"   - ✅ uc.Chrome started in {time.time() - start_time:.2f}s")
-                except Exception as e:
-                    print(f"   - ❌ uc.Chrome failed: {e}")
-                    print("   - 🔄 Falling back to standard selenium...")
-                    driver = None  # Ensure we fall through to standard selenium
-            
-            # Fallback to standard selenium if uc failed or not available
-            if driver is None:
-                print("   - Using standard selenium webdriver")
-                options = Options()
-                apply_shared_options(options)
-                
-                print("   - Checking/Installing Chrome driver...")
-                driver_path = ChromeDriverManager().install()
-                print(f"   - Driver path: {driver_path}")
-                
-                service = Service(driver_path)
-                driver = webdriver.Chrome(service=service, options=options)
-
-        driver.set_script_timeout(60)
-        driver.implicitly_wait(10)
-
-        try:
-            driver.execute_cdp_cmd('Network.enable', {})
-            driver.execute_cdp_cmd('Network.setUserAgentOverride', {"userAgent": user_agent})
-            driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": blocked_resource_patterns})
-        except Exception:
-            pass
-
-        try:
-            driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        except Exception:
-            pass
-
-        return driver
     
     def _normalize_url(self, url: str) -> str:
         parsed = urlparse(url)
@@ -184,162 +68,427 @@ class WebScraper:
         
         return chunks
     
-    def scrape_domain(self, start_url: str, domain_id: int, db) -> List[database.ScrapedPage]:
+    def _queue_tagged_pages(self, pending: list, tagger: CorpusTagger, ingester, chatbot_id: int, domain_id: int) -> List[list]:
+        """Tag a batch of scraped pages against the crawl so far, then queue their chunks for indexing.
+
+        Returns each page's tags. Doesn't touch the database session, so crawls run it on a
+        worker thread.
+        """
+        if not pending:
+            return []
+        tags_per_page = tagger.tag([(content_data['title'], content_data['content']) for _, _, content_data, _ in pending])
+        for (_, url, content_data, chunks), tags in zip(pending, tags_per_page):
+            for idx, chunk in enumerate(chunks):
+                ingester.add({
+                    'url': url,
+                    'title': content_data['title'],
+                    'content': chunk,
+                    'chunk_index': idx,
+                    'chatbot_id': chatbot_id,
+                    'domain_id': domain_id,
+                    'tags': tags
+                })
+        return tags_per_page
+    
+    def _parse_page(self, html: str) -> dict:
+        """Extract content and links from a page; CPU-bound, so crawls run it on a worker thread"""
+        sample = html.lower()[:2000]
+        # Only flag as blocked if we see clear blocking indicators
+        blocking_patterns = [
+            ('access denied', 'forbidden'),
+            ('cloudflare', 'checking your browser'),
+            ('please complete the security check', 'captcha'),
+            ('blocked', 'firewall'),
+            ('attention required', 'cloudflare'),
+        ]
+        soup = BeautifulSoup(html, 'lxml')
+        return {
+            'blocked': any(all(keyword in sample for keyword in pattern) for pattern in blocking_patterns),
+            'content_data': self._extract_content(soup),
+            'hrefs': [link['href'] for link in soup.find_all('a', href=True)[:100]]
+        }
+    
+    def _render_sync(self, url: str) -> str:
+        host = urlparse(url).netloc
+        with browser_pool.page() as driver:
+            print(f"🌐 Rendering: {url}")
+            settled, seconds = load_and_settle(driver, url, settle_timeouts.timeout_for(host))
+            settle_timeouts.record(host, seconds, settled)
+            print(f"📄 Page {'settled' if settled else 'still changing'} after {seconds:.2f}s: {driver.title}")
+            return driver.page_source
+    
+    async def _render(self, url: str) -> Optional[str]:
+        """Page source after JavaScript has run, or None when no browser can be started"""
+        # At most one pool's worth of renders wait on worker threads per crawl
+        async with self._render_slots:
+            if self._browser_unavailable:
+                return None
+            try:
+                return await asyncio.to_thread(self._render_sync, url)
+            except BrowserUnavailableError as e:
+                print(f"❌ {e}; continuing with static HTML only")
+                self._browser_unavailable = True
+                return None
+    
+    async def _load_page(self, url: str, fetcher: AsyncFetcher, policy: RenderPolicy) -> Optional[dict]:
+        """Fetch url over HTTP and parse it, rendering it in Chrome only when static HTML isn't enough"""
+        host = urlparse(url).netloc
+        can_render = policy.mode != "never"
+        page = None
+        status = None
+        if not policy.render_first(host):
+            result = await fetcher.fetch(url)
+            if not result.is_html:
+                print(f"⏭️  Skipping non-HTML {url} ({result.content_type})")
+                return None
+            if result.status >= 400 and not (can_render and result.status in RENDER_STATUSES):
+                raise RuntimeError(f"HTTP {result.status} fetching {url}")
+            status = result.status
+            if result.status < 400:
+                page = await asyncio.to_thread(self._parse_page, result.html)
+                if not can_render or not (page['blocked'] or needs_rendering(result.html, page['content_data']['content'])):
+                    policy.record(host, rendered=False)
+                    return page
+            print(f"🧩 Static HTML insufficient for {url} (HTTP {result.status}), rendering")
+        
+        await fetcher.throttle(host)
+        html = await self._render(url)
+        if html is None:
+            if page is None and status is not None:
+                raise RuntimeError(f"HTTP {status} fetching {url}")
+            return page
+        policy.record(host, rendered=True)
+        return await asyncio.to_thread(self._parse_page, html)
+    
+    async def _seed_frontier(self, start_url: str, frontier: CrawlFrontier, fetcher: AsyncFetcher, lastmods: Dict[str, datetime], heartbeat: Callable[[], None]) -> Optional[RobotsRules]:
+        """Read the site's robots.txt and sitemaps: apply its crawl delay and queue every page they list.
+
+        heartbeat is called after each file fetched. Returns the robots.txt rules links must
+        pass, or None when there are none to honour.
+        """
+        host = urlparse(start_url).netloc
+        robots = await fetch_robots(fetcher, start_url)
+        heartbeat()
+        rules = robots if settings.SCRAPE_RESPECT_ROBOTS else None
+        if rules is not None and rules.crawl_delay:
+            delay = min(rules.crawl_delay, settings.SCRAPE_MAX_CRAWL_DELAY_SECONDS)
+            fetcher.set_crawl_delay(host, delay)
+            capped = f" (asks for {rules.crawl_delay:g}s)" if delay < rules.crawl_delay else ""
+            print(f"🐢 Crawl delay for {host}: {delay:g}s between requests{capped}")
+        if not settings.SCRAPE_USE_SITEMAPS:
+            return rules
+        
+        sitemap_urls = (robots.sitemaps if robots is not None else []) or [urljoin(start_url, '/sitemap.xml')]
+        entries = await fetch_sitemap_entries(fetcher, sitemap_urls, frontier.max_urls, on_progress=heartbeat)
+        queued = 0
+        for entry in entries:
+            if not self._is_same_domain(entry.url, start_url) or (rules is not None and not rules.allowed(entry.url)):
+                continue
+            key = self._normalize_url(entry.url)
+            if entry.lastmod:
+                lastmods[key] = entry.lastmod
+            # Listed pages are treated as one hop from the start page, ordered by their <priority>
+            priority = DEFAULT_PRIORITY if entry.priority is None else entry.priority
+            queued += frontier.add(entry.url, 1, key=key, sitemap_priority=priority)
+        if entries:
+            print(f"🗺️ Sitemaps list {len(entries)} pages for {host}, {queued} newly queued")
+        return rules
+    
+    def _previous_pages(self, chatbot_id: int, domain_id: int, db) -> Dict[str, tuple]:
+        """url -> (page id, last_updated) of the newest copy the chatbot's other domains hold of each page"""
+        rows = db.query(database.ScrapedPage.url, database.ScrapedPage.id, database.ScrapedPage.last_updated).join(
+            database.Domain, database.Domain.id == database.ScrapedPage.domain_id
+        ).filter(
+            database.Domain.chatbot_id == chatbot_id,
+            database.ScrapedPage.domain_id != domain_id
+        )
+        previous = {}
+        for url, page_id, last_updated in rows:
+            if last_updated and (url not in previous or last_updated > previous[url][1]):
+                previous[url] = (page_id, last_updated)
+        return previous
+    
+    def scrape_domain(self, start_url: str, domain_id: int, db, job_id: int = None) -> List[database.ScrapedPage]:
+        return asyncio.run(self._crawl(start_url, domain_id, db, job_id))
+    
+    def _load_checkpoint(self, job_id: int, domain_id: int, db) -> database.CrawlCheckpoint:
+        """The job's checkpoint, created if missing; pages scraped after it was taken are removed to be crawled again"""
+        checkpoint = db.query(database.CrawlCheckpoint).filter(database.CrawlCheckpoint.job_id == job_id).first()
+        if checkpoint is None:
+            checkpoint = database.CrawlCheckpoint(job_id=job_id, frontier={}, failed_attempts={}, iterations=0, last_page_id=0)
+            db.add(checkpoint)
+        db.query(database.ScrapedPage).filter(
+            database.ScrapedPage.domain_id == domain_id,
+            database.ScrapedPage.id > (checkpoint.last_page_id or 0)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return checkpoint
+    
+    async def _crawl(self, start_url: str, domain_id: int, db, job_id: int = None) -> List[database.ScrapedPage]:
         # Initialize variables
-        to_visit = [start_url]
         scraped_pages = []
         base_domain = urlparse(start_url).netloc
-        driver = None  # Initialize driver to None
         
         domain = db.query(database.Domain).filter(database.Domain.id == domain_id).first()
         chatbot_id = domain.chatbot_id
         
         max_iterations = self.max_pages * 3
-        iteration_count = 0
-        consecutive_failures = 0
         max_consecutive_failures = 10
-
-        try:
-            print("🚗 Initializing Chrome driver...")
-            driver = self._get_driver()
-            print("✅ Driver initialized")
-            
-            while to_visit and len(scraped_pages) < self.max_pages and iteration_count < max_iterations:
-                iteration_count += 1
+        state = {'iterations': 0, 'consecutive_failures': 0, 'in_flight': 0, 'stopped': False,
+                 'last_page_id': 0, 'heartbeat': time.monotonic(), 'unchanged': 0}
+        
+        # With a job, progress is checkpointed so an interrupted crawl resumes where it stopped
+        checkpoint = self._load_checkpoint(job_id, domain_id, db) if job_id else None
+        if checkpoint is not None and checkpoint.frontier:
+            frontier = CrawlFrontier.restore(checkpoint.frontier)
+            self.failed_attempts = dict(checkpoint.failed_attempts or {})
+            state['iterations'] = checkpoint.iterations or 0
+            state['last_page_id'] = checkpoint.last_page_id or 0
+            scraped_pages = db.query(database.ScrapedPage).filter(
+                database.ScrapedPage.domain_id == domain_id
+            ).order_by(database.ScrapedPage.id).all()
+            print(f"♻️ Resuming scrape job {job_id}: {len(scraped_pages)} pages done, {len(frontier)} URLs queued")
+        else:
+            frontier = CrawlFrontier()
+            frontier.add(start_url, 0, key=self._normalize_url(start_url))
+        self.visited = frontier.done
+        
+        frontier_changed = asyncio.Event()
+        ingester = search.BulkIngester(chatbot_id)
+        # Pages wait here until a batch can be tagged against the crawl's term statistics
+        tagger = CorpusTagger()
+        pending_pages = []
+        policy = RenderPolicy()
+        self._browser_unavailable = False
+        self._render_slots = asyncio.Semaphore(browser_pool.size)
+        robots = None
+        # Sitemap lastmod per URL; pages not modified since the chatbot last scraped them aren't fetched again
+        lastmods: Dict[str, datetime] = {}
+        previous = self._previous_pages(chatbot_id, domain_id, db) if settings.SCRAPE_SKIP_UNCHANGED else {}
+        
+        # One batch is embedded and written at a time, on a worker thread; crawling carries on meanwhile
+        index_lock = asyncio.Lock()
+        
+        def heartbeat(force: bool = False):
+            # Only the timestamp: a startup resume takes over jobs that stop beating
+            if checkpoint is None or (not force and time.monotonic() - state['heartbeat'] < settings.SCRAPE_HEARTBEAT_SECONDS):
+                return
+            try:
+                checkpoint.updated_at = datetime.utcnow()
+                db.commit()
+                state['heartbeat'] = time.monotonic()
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Could not checkpoint scrape job {job_id}: {e}")
+        
+        def crawl_progress() -> dict:
+            return {
+                'frontier': frontier.snapshot(),
+                'failed_attempts': dict(self.failed_attempts),
+                'iterations': state['iterations'],
+                'last_page_id': state['last_page_id']
+            }
+        
+        def save_checkpoint(progress: dict):
+            try:
+                for field, value in progress.items():
+                    setattr(checkpoint, field, value)
+                checkpoint.updated_at = datetime.utcnow()
+                db.commit()
+                state['heartbeat'] = time.monotonic()
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Could not checkpoint scrape job {job_id}: {e}")
+        
+        async def index_pending(final: bool = False):
+            async with index_lock:
+                batch = pending_pages[:]
+                pending_pages.clear()
+                # Taken with the batch: every page scraped so far is in it or already indexed, and
+                # pages scraped while it is written aren't in the checkpoint
+                progress = crawl_progress() if checkpoint is not None and not final else None
                 
-                if consecutive_failures >= max_consecutive_failures:
-                    print(f"Too many consecutive failures ({consecutive_failures}), stopping scraping")
-                    break
+                def write() -> List[list]:
+                    tags_per_page = self._queue_tagged_pages(batch, tagger, ingester, chatbot_id, domain_id)
+                    if final:
+                        ingester.close()
+                    elif progress is not None:
+                        # Everything up to last_page_id must be indexed, and searchable, before the
+                        # checkpoint says so; the crawl's bulk load would otherwise hide it until the end
+                        ingester.flush(refresh=True)
+                    return tags_per_page
                 
-                if len(to_visit) > 1000:
-                    print(f"Too many URLs in queue ({len(to_visit)}), limiting to 1000")
-                    to_visit = to_visit[:1000]
+                try:
+                    tags_per_page = await asyncio.to_thread(write)
+                except Exception:
+                    pending_pages[:0] = batch
+                    raise
+                for (scraped_page, _, _, _), tags in zip(batch, tags_per_page):
+                    scraped_page.tags = tags
+                db.commit()
+                if progress is not None:
+                    save_checkpoint(progress)
+        
+        def next_url() -> Optional[tuple]:
+            # Pages in flight count toward max_pages, so the crawl doesn't fetch pages it will drop
+            while len(scraped_pages) + state['in_flight'] < self.max_pages and state['iterations'] < max_iterations:
+                if state['consecutive_failures'] >= max_consecutive_failures:
+                    if not state['stopped']:
+                        print(f"Too many consecutive failures ({state['consecutive_failures']}), stopping scraping")
+                        state['stopped'] = True
+                    return None
                 
-                url = to_visit.pop(0)
-                normalized_url = self._normalize_url(url)
+                item = frontier.pop()
+                if item is None:
+                    return None
+                state['iterations'] += 1
                 
-                if normalized_url in self.visited:
+                if self.failed_attempts.get(item[0], 0) >= self.max_retries:
+                    frontier.complete(item[0])
                     continue
                 
-                if self.failed_attempts.get(normalized_url, 0) >= self.max_retries:
-                    continue
+                return item
+            return None
+        
+        def add_page(normalized_url: str, content_data: dict, last_updated: datetime):
+            word_count = len(content_data['content'].split())
+            content_preview = content_data['content'][:200] + "..." if len(content_data['content']) > 200 else content_data['content']
+            
+            scraped_page = database.ScrapedPage(
+                domain_id=domain_id,
+                url=normalized_url,
+                title=content_data['title'],
+                content=content_data['content'],
+                content_preview=content_preview,
+                word_count=word_count,
+                last_updated=last_updated
+            )
+            db.add(scraped_page)
+            db.flush()
+            state['last_page_id'] = max(state['last_page_id'], scraped_page.id)
+            db.commit()
+            scraped_pages.append(scraped_page)
+            
+            # Update domain pages count in real-time
+            domain.pages_scraped = len(scraped_pages)
+            db.commit()
+            
+            pending_pages.append((scraped_page, normalized_url, content_data, self._chunk_text(content_data['content'])))
+        
+        def reuse_unchanged(normalized_url: str) -> bool:
+            """Copy the chatbot's stored page instead of fetching it, if the sitemap says it hasn't changed since"""
+            known = previous.get(normalized_url)
+            lastmod = lastmods.get(normalized_url)
+            if known is None or lastmod is None or lastmod > known[1]:
+                return False
+            stored = db.query(database.ScrapedPage).filter(database.ScrapedPage.id == known[0]).first()
+            if stored is None or not stored.content:
+                return False
+            add_page(normalized_url, {'title': stored.title or "", 'content': stored.content}, stored.last_updated)
+            state['unchanged'] += 1
+            print(f"⏭️  Unchanged since {stored.last_updated:%Y-%m-%d}: {normalized_url} ({len(scraped_pages)}/{self.max_pages})")
+            return True
+        
+        async def visit(normalized_url: str, url: str, depth: int, fetcher: AsyncFetcher):
+            try:
+                # Reused pages aren't parsed, so their links are only found via the sitemap or other
+                # pages; the start page is always fetched to keep link discovery going
+                if depth > 0 and reuse_unchanged(normalized_url):
+                    return
                 
-                self.visited.add(normalized_url)
+                print(f"🌐 Fetching: {url}")
+                page = await self._load_page(url, fetcher, policy)
+                if page is None:
+                    return
                 
-                try:
-                    print(f"🌐 Navigating to: {url}")
-                    driver.get(url)
-                    print(f"⏳ Waiting for page load: {url}")
-                    time.sleep(2)
-                    print(f"📄 Page loaded: {driver.title}")
-                    
-                    # Check if blocked by anti-bot (more specific detection)
-                    page_title = driver.title.lower()
-                    page_source_sample = driver.page_source.lower()[:2000]
-                    
-                    # Only flag as blocked if we see clear blocking indicators
-                    blocking_patterns = [
-                        ('access denied', 'forbidden'),
-                        ('cloudflare', 'checking your browser'),
-                        ('please complete the security check', 'captcha'),
-                        ('blocked', 'firewall'),
-                        ('attention required', 'cloudflare'),
-                    ]
-                    
-                    is_blocked = any(
-                        all(keyword in page_source_sample for keyword in pattern)
-                        for pattern in blocking_patterns
-                    )
-                    
-                    if is_blocked:
-                        print(f"⚠️ Site blocking detected at {url} - skipping")
-                        consecutive_failures += 1
-                        self.failed_attempts[normalized_url] = self.max_retries
-                        continue
-                    
-                    soup = BeautifulSoup(driver.page_source, 'lxml')
-                    content_data = self._extract_content(soup)
-                    
-                    if content_data['content']:
-                        word_count = len(content_data['content'].split())
-                        content_preview = content_data['content'][:200] + "..." if len(content_data['content']) > 200 else content_data['content']
-                        
-                        tags = search.generate_content_tags(content_data['title'], content_data['content'])
-                        
-                        scraped_page = database.ScrapedPage(
-                            domain_id=domain_id,
-                            url=normalized_url,
-                            title=content_data['title'],
-                            content=content_data['content'],
-                            content_preview=content_preview,
-                            word_count=word_count,
-                            tags=tags,
-                            last_updated=datetime.utcnow()
-                        )
-                        db.add(scraped_page)
-                        db.commit()
-                        scraped_pages.append(scraped_page)
-                        
-                        # Update domain pages count in real-time
-                        domain.pages_scraped = len(scraped_pages)
-                        db.commit()
-                        
-                        consecutive_failures = 0
-                        print(f"✅ Scraped: {normalized_url} ({len(scraped_pages)}/{self.max_pages})")
-                        
-                        chunks = self._chunk_text(content_data['content'])
-                        tags = search.generate_content_tags(content_data['title'], content_data['content'])
-                        
-                        for idx, chunk in enumerate(chunks):
-                            doc = {
-                                'url': normalized_url,
-                                'title': content_data['title'],
-                                'content': chunk,
-                                'chunk_index': idx,
-                                'chatbot_id': chatbot_id,
-                                'domain_id': domain_id,
-                                'tags': tags
-                            }
-                            search.index_chatbot_content(chatbot_id, doc)
-                    
-                    links = soup.find_all('a', href=True)
-                    unique_links = set()
-                    
-                    for link in links[:100]:
-                        href = link['href']
-                        full_url = urljoin(url, href)
-                        
-                        if self._is_same_domain(full_url, start_url):
-                            normalized_link = self._normalize_url(full_url)
-                            if (normalized_link not in self.visited and 
-                                normalized_link not in unique_links and
-                                normalized_link not in to_visit):
-                                unique_links.add(normalized_link)
-                    
-                    to_visit.extend(list(unique_links)[:50])
+                if page['blocked']:
+                    print(f"⚠️ Site blocking detected at {url} - skipping")
+                    state['consecutive_failures'] += 1
+                    self.failed_attempts[normalized_url] = self.max_retries
+                    return
                 
-                except Exception as e:
-                    error_msg = str(e).lower()
-                    print(f"❌ Error scraping {url}: {e}")
-                    
-                    # Check if it's a blocking/timeout error
-                    if any(keyword in error_msg for keyword in ['timeout', 'refused', 'unreachable', '403', '429']):
-                        print(f"⚠️ Site appears to be blocking requests")
-                        consecutive_failures += 1
+                content_data = page['content_data']
+                if content_data['content'] and len(scraped_pages) < self.max_pages:
+                    add_page(normalized_url, content_data, datetime.utcnow())
+                    state['consecutive_failures'] = 0
+                    print(f"✅ Scraped: {normalized_url} ({len(scraped_pages)}/{self.max_pages})")
+                
+                unique_links = set()
+                
+                for href in page['hrefs']:
+                    full_url = urljoin(url, href)
                     
-                    self.failed_attempts[normalized_url] = self.failed_attempts.get(normalized_url, 0) + 1
-                    consecutive_failures += 1
+                    if self._is_same_domain(full_url, start_url) and (robots is None or robots.allowed(full_url)):
+                        normalized_link = self._normalize_url(full_url)
+                        # Once per linking page, so repeat adds count distinct inlinks
+                        if normalized_link not in unique_links:
+                            unique_links.add(normalized_link)
+                            frontier.add(normalized_link, depth + 1)
+            
+            except Exception as e:
+                error_msg = str(e).lower()
+                print(f"❌ Error scraping {url}: {e}")
+                
+                # Check if it's a blocking/timeout error
+                if any(keyword in error_msg for keyword in ['timeout', 'refused', 'unreachable', '403', '429']):
+                    print(f"⚠️ Site appears to be blocking requests")
+                    state['consecutive_failures'] += 1
+                
+                self.failed_attempts[normalized_url] = self.failed_attempts.get(normalized_url, 0) + 1
+                state['consecutive_failures'] += 1
+        
+        async def worker(fetcher: AsyncFetcher):
+            while True:
+                item = next_url()
+                if item is None:
+                    if state['in_flight'] == 0:
+                        # Nothing left and nobody can add more; wake the other idle workers to exit
+                        frontier_changed.set()
+                        return
+                    frontier_changed.clear()
+                    await frontier_changed.wait()
                     continue
+                key, url, depth = item
+                state['in_flight'] += 1
+                try:
+                    await visit(key, url, depth, fetcher)
+                finally:
+                    frontier.complete(key)
+                    state['in_flight'] -= 1
+                    frontier_changed.set()
+                # Checkpoints go here, between pages: every scraped page is indexed and no
+                # page is half done, so a restored frontier neither skips nor repeats one
+                try:
+                    if len(pending_pages) >= settings.TAG_BATCH_PAGES and not index_lock.locked():
+                        await index_pending()
+                    else:
+                        heartbeat()
+                except Exception as e:
+                    db.rollback()
+                    print(f"❌ Failed to index scraped pages: {e}")
+        
+        try:
+            ingester.start()
+            started = time.perf_counter()
+            async with AsyncFetcher() as fetcher:
+                # Resumed crawls read them again too, for the crawl delay and lastmods. Seeding can
+                # outlast SCRAPE_RESUME_STALE_SECONDS, so it beats too, starting now
+                heartbeat(force=True)
+                robots = await self._seed_frontier(start_url, frontier, fetcher, lastmods, heartbeat)
+                await asyncio.gather(*(worker(fetcher) for _ in range(max(settings.SCRAPE_CONCURRENCY, 1))))
+            print(f"🏁 Crawled {base_domain}: {len(scraped_pages)} pages in {time.perf_counter() - started:.1f}s, "
+                  f"{policy.rendered_pages} rendered in Chrome, {state['unchanged']} unchanged, {len(frontier)} URLs left in the frontier")
+            if frontier.dropped:
+                print(f"Frontier was full ({frontier.max_urls} URLs), {frontier.dropped} links not queued")
         
         except Exception as e:
-            print(f"❌ Driver initialization failed: {e}")
+            print(f"❌ Crawl failed: {e}")
         
         finally:
-            if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
+            try:
+                await index_pending(final=True)
+            except Exception as e:
+                print(f"❌ Failed to flush indexed content: {e}")
         
         return scraped_pages
 
@@ -1,140 +1,302 @@
-from elasticsearch import Elasticsearch
-from sentence_transformers import SentenceTransformer
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
 import httpx
+import time
+import uuid
 from app.core.config import settings
+from app.services.embedding_service import get_embedding_model, embedding_service, LEGACY_EMBEDDING_MODEL
+from app.services.answer_cache import answer_cache
+from app.services.embedding_store import embedding_store
+from app.services.embedding_versions import model_registry
+from app.services.search_backend import get_search_backend, SEARCH_FILTER_FIELDS
+from app.services.reranker import reranker
+from app.services.passages import attach_passages
+from app.services.tagging import tag_document
+from app.services.dedup import simhash, to_signed, fingerprint_scope, field_values, merged_values, get_fingerprint_index, forget_fingerprints
 
-ES_HOST = "http://localhost:9200"
-es = Elasticsearch([ES_HOST], headers={"accept": "application/json", "content-type": "application/json"})
-
-import threading
-
-_embedding_model = None
-_model_lock = threading.Lock()
-
-def get_embedding_model():
-    global _embedding_model
-    
-    if _embedding_model is not None:
-        return _embedding_model
-        
-    with _model_lock:
-        # Double-check pattern
-        if _embedding_model is None:
-            print("📦 Loading embedding model (BAAI/bge-small-en-v1.5)... This may take a moment.")
-            try:
-                # Set a specific cache folder if needed, or rely on default
-                _embedding_model = SentenceTransformer('BAAI/bge-small-en-v1.5')
-                print("✅ Embedding model loaded successfully")
-            except Exception as e:
-                print(f"❌ Failed to load embedding model: {e}")
-                raise e
-                
-    return _embedding_model
 def init_elasticsearch():
+    backend = get_search_backend()
     try:
-        if es.ping():
-            print(f"✅ Connected to Elasticsearch at {ES_HOST}")
+        if backend.ping():
+            print(f"✅ Connected to {backend.describe()}")
+            restored = backend.reset_paused_refresh()
+            if restored:
+                print(f"🔄 Restored refresh on {restored} indices left paused by an interrupted bulk load")
         else:
-            print(f"⚠️  Could not connect to Elasticsearch at {ES_HOST}")
+            print(f"⚠️  Could not connect to {backend.describe()}")
     except Exception as e:
-        print(f"❌ Elasticsearch connection error: {e}")
-
+        print(f"❌ Search backend connection error: {e}")
 
-def get_chatbot_index(chatbot_id: int) -> str:
-    return f"chatbot-{chatbot_id}"
 
 def init_chatbot_index(chatbot_id: int):
-    index_name = get_chatbot_index(chatbot_id)
-    try:
-        es.indices.get(index=index_name)
-    except:
-        es.indices.create(
-            index=index_name,
-            settings={
-                "analysis": {
-                    "analyzer": {
-                        "english_light": {
-                            "type": "custom",
-                            "tokenizer": "standard",
-                            "filter": ["lowercase", "english_possessive_stemmer", "light_english_stemmer"]
-                        }
-                    },
-                    "filter": {
-                        "english_possessive_stemmer": {
-                            "type": "stemmer",
-                            "name": "possessive_english"
-                        },
-                        "light_english_stemmer": {
-                            "type": "stemmer",
-                            "name": "light_english"
-                        }
-                    }
-                }
-            },
-            mappings={
-                "properties": {
-                    "url": {"type": "keyword"},
-                    "title": {
-                        "type": "text",
-                        "analyzer": "english_light"
-                    },
-                    "content": {
-                        "type": "text",
-                        "analyzer": "english_light"
-                    },
-                    "chunk_index": {"type": "integer"},
-                    "chatbot_id": {"type": "integer"},
-                    "tags": {"type": "keyword"},
-                    "embedding": {
-                        "type": "dense_vector",
-                        "dims": 384,
-                        "index": True,
-                        "similarity": "cosine"
-                    }
-                }
-            }
-        )
+    get_search_backend().ensure_index(chatbot_id)
 
-def index_chatbot_content(chatbot_id: int, content_data: dict):
-    index_name = get_chatbot_index(chatbot_id)
-    init_chatbot_index(chatbot_id)
+def _embedding_text(content_data: dict) -> str:
+    return f"{content_data.get('title', '')} {content_data.get('content', '')}"
+
+def _embed_chunks(texts: List[str], batch_size: int = None, model_name: str = None) -> list:
+    """Chunk embeddings, reusing stored vectors for text that was embedded before"""
+    model = get_embedding_model(model_name)
     
-    model = get_embedding_model()
-    text_to_embed = f"{content_data.get('title', '')} {content_data.get('content', '')}"
-    embedding = model.encode(text_to_embed, show_progress_bar=False).tolist()
+    def encode(missing: List[str]):
+        return model.encode(missing, batch_size=batch_size or settings.EMBEDDING_BATCH_SIZE, show_progress_bar=False)
+    
+    if settings.EMBEDDING_STORE_ENABLED:
+        return embedding_store.embed(texts, encode, model_name)
+    return list(encode(texts))
+
+def chunk_id(chatbot_id: int, content_data: dict) -> Optional[str]:
+    """Stable document id for a chunk of a page or uploaded document.
+
+    Re-ingesting the same source overwrites its chunks in place instead of adding copies.
+    """
+    source = f"document:{content_data['document_id']}" if content_data.get('document_id') else content_data.get('url')
+    if not source or content_data.get('chunk_index') is None:
+        return None
+    return hashlib.sha256(f"{chatbot_id}:{source}:{content_data['chunk_index']}".encode("utf-8")).hexdigest()[:32]
+
+def index_chatbot_content(chatbot_id: int, content_data: dict):
+    backend = get_search_backend()
+    backend.ensure_index(chatbot_id)
     
-    content_data['embedding'] = embedding
-    es.index(index=index_name, document=content_data)
+    doc_id = chunk_id(chatbot_id, content_data)
+    if doc_id:
+        content_data.setdefault('_id', doc_id)
+    model_name = model_registry.model_for(chatbot_id, backend)
+    content_data['embedding'] = _embed_chunks([_embedding_text(content_data)], model_name=model_name)[0].tolist()
+    content_data['embedding_model'] = model_name
+    backend.index(chatbot_id, content_data)
+    answer_cache.invalidate(chatbot_id)
     # print(f"✅ Indexed: {content_data.get('title', 'Untitled')} (chatbot {chatbot_id})")
 
+def delete_chatbot_content(chatbot_id: int, filters: Dict[str, object] = None) -> int:
+    """Remove indexed chunks matching filters (all of the chatbot's chunks by default)"""
+    try:
+        deleted = get_search_backend().delete_by_filter(chatbot_id, filters or {"chatbot_id": chatbot_id})
+    except Exception as e:
+        print(f"⚠️  Could not delete indexed content for chatbot {chatbot_id}: {e}")
+        return 0
+    answer_cache.invalidate(chatbot_id)
+    forget_fingerprints(chatbot_id)
+    return deleted
+
+def rebuild_chatbot_index(chatbot_id: int):
+    """Rebuild a chatbot's index with the current settings and mappings, swapping it in atomically"""
+    try:
+        get_search_backend().rebuild_index(chatbot_id)
+        answer_cache.invalidate(chatbot_id)
+        print(f"✅ Rebuilt index for chatbot {chatbot_id}")
+    except Exception as e:
+        print(f"❌ Index rebuild failed for chatbot {chatbot_id}: {e}")
+
+# List fields a kept chunk collects from the near-duplicates merged into it, so filters still match them
+MERGED_FIELDS = ("source_urls",) + SEARCH_FILTER_FIELDS
+
+class BulkIngester:
+    """Buffers chunk documents and writes them with batched embeddings and backend bulk writes.
+
+    Use as a context manager; once the ingest grows beyond a single batch the backend is
+    told a bulk load is running (Elasticsearch pauses the refresh interval) until close.
+    flush(refresh=True) makes what was written so far searchable, for long crawls that
+    checkpoint part way through; a pause left by a crashed process is undone at startup.
+
+    With dedup on, each chunk's SimHash is checked against the chatbot's fingerprint index;
+    a near-duplicate of a chunk from the same domain or document is not embedded or stored
+    again, its URL (and any tags or ids the kept chunk lacks) is added to the chunk already
+    kept, whose fields become lists.
+
+    Chunks get stable ids (chunk_id), so re-ingesting a page overwrites it. Chunks of one
+    URL are expected to be added consecutively; once the next URL starts, any chunk still
+    stored under the finished URL that this ingest didn't write or keep (the tail of a page
+    that got shorter, copies from before stable ids) is deleted in the next bulk request.
+    """
+
+    def __init__(self, chatbot_id: int, batch_size: int = None, embedding_batch_size: int = None, dedup: bool = None):
+        self.chatbot_id = chatbot_id
+        self.backend = get_search_backend()
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.embedding_batch_size = embedding_batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.dedup = settings.DEDUP_ENABLED if dedup is None else dedup
+        self.buffer: List[dict] = []
+        self.indexed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.stale_deleted = 0
+        self.elapsed = 0.0
+        self._fingerprints = None
+        self._buffered_ids: Dict[str, dict] = {}
+        self._pending_merges: Dict[str, Dict[str, list]] = defaultdict(dict)
+        # Ids written or kept per URL during this ingest, and URLs whose chunks are all in
+        self._kept_ids: Dict[str, Set[str]] = defaultdict(set)
+        self._current_url = None
+        self._finished_urls: List[str] = []
+        self._bulk_started = False
+        self._started_at = None
+
+    def __enter__(self):
+        return self.start()
+
+    def start(self):
+        self.backend.ensure_index(self.chatbot_id)
+        if self.dedup:
+            self._fingerprints = get_fingerprint_index(self.chatbot_id, lambda: self.backend.fingerprints(self.chatbot_id))
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _merge_duplicate(self, content_data: dict) -> Optional[str]:
+        """Id of the stored chunk content_data is a near-duplicate of, recording its URL and filter values there"""
+        fingerprint = simhash(content_data.get('content') or '')
+        if fingerprint is None:
+            return None
+        url = content_data.get('url')
+        content_data['simhash'] = to_signed(fingerprint)
+        content_data['source_urls'] = [url] if url else []
+        content_data.setdefault('_id', uuid.uuid4().hex)
+
+        existing_id = self._fingerprints.find_or_add(fingerprint, content_data['_id'], fingerprint_scope(content_data))
+        if existing_id is None or existing_id == content_data['_id']:
+            # Unchanged chunks are still rewritten, picking up the crawl's domain and tags;
+            # their vectors come from the embedding store
+            return None
+
+        self.duplicates += 1
+        # Still buffered: merge into the document itself, otherwise into the stored one at flush
+        target = self._buffered_ids.get(existing_id)
+        if target is None:
+            target = self._pending_merges[existing_id]
+        for field in MERGED_FIELDS:
+            merged = merged_values(target.get(field), field_values(content_data.get(field)))
+            if merged is not None:
+                target[field] = merged
+        return existing_id
+
+    def _track_url(self, url: Optional[str]):
+        if url != self._current_url:
+            if self._current_url is not None:
+                self._finished_urls.append(self._current_url)
+            self._current_url = url
+
+    def add(self, content_data: dict):
+        doc_id = chunk_id(self.chatbot_id, content_data)
+        if doc_id:
+            content_data.setdefault('_id', doc_id)
+        url = content_data.get('url')
+        self._track_url(url)
+        if self._fingerprints is not None:
+            existing_id = self._merge_duplicate(content_data)
+            if existing_id is not None:
+                if url:
+                    self._kept_ids[url].add(existing_id)
+                return
+            self._buffered_ids[content_data['_id']] = content_data
+        if url and content_data.get('_id'):
+            self._kept_ids[url].add(content_data['_id'])
+        self.buffer.append(content_data)
+        if len(self.buffer) >= self.batch_size:
+            if not self._bulk_started:
+                self.backend.begin_bulk(self.chatbot_id)
+                self._bulk_started = True
+            self.flush()
+
+    def add_many(self, documents: Iterable[dict]):
+        for content_data in documents:
+            self.add(content_data)
+
+    def _stale_ids(self) -> List[str]:
+        """Stored chunks of finished URLs that this ingest neither wrote nor kept"""
+        if not self._finished_urls:
+            return []
+        urls, self._finished_urls = self._finished_urls, []
+        try:
+            return [
+                doc_id for doc_id, url in self.backend.ids_by_url(self.chatbot_id, urls)
+                if doc_id not in self._kept_ids.get(url, ())
+            ]
+        except Exception as e:
+            print(f"⚠️  Could not look up stale chunks for chatbot {self.chatbot_id}: {e}")
+            return []
+
+    def flush(self, refresh: bool = False):
+        """Write buffered chunks; refresh makes them searchable now even while a bulk load has refresh paused"""
+        if self._pending_merges:
+            pending, self._pending_merges = self._pending_merges, defaultdict(dict)
+            self.backend.merge_fields(self.chatbot_id, {doc_id: fields for doc_id, fields in pending.items() if fields})
+        stale = self._stale_ids()
+        if self.buffer or stale:
+            self._write_batch(stale)
+        if refresh and self._bulk_started:
+            self.backend.refresh(self.chatbot_id)
+
+    def _write_batch(self, stale: List[str]):
+        batch, self.buffer = self.buffer, []
+        self._buffered_ids = {}
+        
+        if batch:
+            # Resolved per batch so a long crawl follows a model cutover part way through
+            model_name = model_registry.model_for(self.chatbot_id, self.backend, fresh=True)
+            embeddings = _embed_chunks([_embedding_text(doc) for doc in batch], batch_size=self.embedding_batch_size, model_name=model_name)
+            
+            for doc, embedding in zip(batch, embeddings):
+                doc['embedding'] = embedding.tolist()
+                doc['embedding_model'] = model_name
+        
+        success, errors = self.backend.bulk_index(self.chatbot_id, batch, deletes=stale)
+        answer_cache.invalidate(self.chatbot_id)
+        self.indexed += success
+        self.failed += errors
+        if stale:
+            self.stale_deleted += len(stale)
+            if self._fingerprints is not None:
+                self._fingerprints.discard(stale)
+        if errors:
+            print(f"⚠️  Bulk ingest: {errors} documents failed for chatbot {self.chatbot_id}")
+            if self._fingerprints is not None:
+                # Fingerprints of failed chunks would swallow later copies; reload from storage
+                forget_fingerprints(self.chatbot_id)
+                self._fingerprints = get_fingerprint_index(self.chatbot_id, lambda: self.backend.fingerprints(self.chatbot_id))
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.indexed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "stale_deleted": self.stale_deleted,
+            "seconds": round(self.elapsed, 2),
+            "docs_per_second": round(self.docs_per_second, 1)
+        }
+
+    def close(self):
+        try:
+            self._track_url(None)
+            self.flush()
+        finally:
+            if self._bulk_started:
+                self._bulk_started = False
+                self.backend.end_bulk(self.chatbot_id)
+            if self._started_at is not None:
+                self.elapsed = time.perf_counter() - self._started_at
+            if self.indexed or self.failed or self.duplicates or self.stale_deleted:
+                print(f"📥 Bulk ingest chatbot {self.chatbot_id}: {self.indexed} docs in {self.elapsed:.2f}s ({self.docs_per_second:.1f} docs/sec), "
+                      f"{self.duplicates} near-duplicates merged, {self.stale_deleted} stale chunks deleted")
+
+def bulk_index_chatbot_content(chatbot_id: int, documents: Iterable[dict], batch_size: int = None) -> dict:
+    with BulkIngester(chatbot_id, batch_size=batch_size) as ingester:
+        ingester.add_many(documents)
+    return ingester.stats()
+
 def generate_content_tags(title: str, content: str) -> list:
-    """Generate simple keyword tags from title and content"""
-    # Simple keyword extraction - just get important words
-    import re
-    
-    # Combine title and content
-    text = f"{title} {content}".lower()
-    
-    # Remove special characters
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    
-    # Common words to filter out
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'from', 'is', 'was', 'are', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'what', 'which', 'who', 'when', 'where', 'why', 'how'}
-    
-    # Get words
-    words = text.split()
-    
-    # Filter and count
-    word_freq = {}
-    for word in words:
-        if word and len(word) > 2 and word not in stop_words:
-            word_freq[word] = word_freq.get(word, 0) + 1
-    
-    # Sort by frequency and get top 10
-    sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-    tags = [word for word, freq in sorted_words[:10]]
-    
-    return tags
+    """Keyword tags for a single document; crawls tag pages in batches with CorpusTagger"""
+    return tag_document(title, content)
 
 async def extract_search_keywords(query: str) -> str:
     try:
@@ -177,87 +339,134 @@ Keywords (2-3 words max):"""
 
 
 
-async def search_chatbot_content(chatbot_id: int, query: str, max_results: int = 5):
-    index_name = get_chatbot_index(chatbot_id)
+def get_search_options(chatbot_config: dict) -> dict:
+    """Per-chatbot retrieval tuning, read from chatbot.config["search"]"""
+    search_config = (chatbot_config or {}).get("search") or {}
+    options = {}
+    if search_config.get("knn_k"):
+        options["knn_k"] = int(search_config["knn_k"])
+    if search_config.get("num_candidates"):
+        options["num_candidates"] = int(search_config["num_candidates"])
+    if "rerank" in search_config:
+        options["rerank"] = bool(search_config["rerank"])
+    return options
+
+MAX_FILTER_VALUES = 100
+
+def parse_search_filters(raw) -> Dict[str, list]:
+    """Clean a client-supplied filter object into {field: [values]}.
+
+    Only SEARCH_FILTER_FIELDS are kept; ids must be integers and tags strings. Anything
+    else is dropped rather than rejected, so a bad filter never breaks a chat.
+    """
+    if not isinstance(raw, dict):
+        return {}
+    filters = {}
+    for field in SEARCH_FILTER_FIELDS:
+        values = raw.get(field)
+        if values is None:
+            continue
+        cleaned = []
+        for value in (values if isinstance(values, list) else [values])[:MAX_FILTER_VALUES]:
+            if field == "tags":
+                if isinstance(value, str) and value.strip():
+                    cleaned.append(value.strip().lower())
+            else:
+                try:
+                    cleaned.append(int(value))
+                except (TypeError, ValueError):
+                    continue
+        if cleaned:
+            filters[field] = sorted(set(cleaned))
+    return filters
+
+def reciprocal_rank_fusion(result_lists: List[list], rank_constant: int = None) -> list:
+    """Merge ranked hit lists by summing 1 / (rank_constant + rank) per document"""
+    rank_constant = rank_constant or settings.SEARCH_RRF_RANK_CONSTANT
+    fused = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit["_id"], {"hit": hit, "score": 0.0})
+            entry["score"] += 1.0 / (rank_constant + rank)
+    ranked = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+    return [(entry["hit"], entry["score"]) for entry in ranked]
+
+async def chatbot_embedding_model(chatbot_id: int, backend=None) -> str:
+    """Model to embed queries for chatbot_id with, resolved off the event loop on a cache miss"""
+    return model_registry.cached(chatbot_id) or await asyncio.to_thread(model_registry.model_for, chatbot_id, backend)
+
+def _served_models(result_lists: List[list]) -> set:
+    return {hit["_source"].get("embedding_model") or LEGACY_EMBEDDING_MODEL for hits in result_lists for hit in hits}
+
+async def search_chatbot_content(chatbot_id: int, query: str, max_results: int = 5, knn_k: int = None, num_candidates: int = None, rerank: bool = None, passages: bool = None, filters: Dict[str, list] = None):
+    backend = get_search_backend()
+    started = time.perf_counter()
+    rerank = settings.RERANK_ENABLED if rerank is None else rerank
+    passages = settings.PASSAGES_ENABLED if passages is None else passages
+    # With reranking, fuse a wider candidate pool and let the cross-encoder keep the best few
+    fetch_results = max(max_results, settings.RERANK_CANDIDATES) if rerank else max_results
     
     try:
-        model = get_embedding_model()
-        query_embedding = model.encode(query, show_progress_bar=False).tolist()
+        model_name = await chatbot_embedding_model(chatbot_id, backend)
+        query_embedding = await embedding_service.embed(query, model_name)
         
-        # Generic multi-strategy search that works for ALL queries
-        search_clauses = [
-            # 1. Semantic vector search - understands meaning regardless of exact words
-            {
-                "script_score": {
-                    "query": {"match_all": {}},
-                    "script": {
-                        "source": "cosineSimilarity(params.query_vector, 'embedding') + 1.0",
-                        "params": {"query_vector": query_embedding}
-                    },
-                    "boost": 0.7  # Primary search method
-                }
-            },
-            # 2. Best fields match - finds documents where query terms appear together
-            {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title^3", "content"],
-                    "type": "best_fields",
-                    "fuzziness": "AUTO",
-                    "boost": 0.2
-                }
-            },
-            # 3. Cross fields match - finds query terms across title and content
-            {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title", "content"],
-                    "type": "cross_fields",
-                    "operator": "or",
-                    "boost": 0.1
-                }
-            }
-        ]
+        # Over-fetch each leg so duplicates can be dropped after fusion
+        k = knn_k or max(settings.SEARCH_KNN_K, fetch_results * 3)
+        num_candidates = max(num_candidates or settings.SEARCH_NUM_CANDIDATES, k)
         
-        results = es.search(
-            index=index_name,
-            query={
-                "bool": {
-                    "should": search_clauses,
-                    "minimum_should_match": 1
-                }
-            },
-            size=max_results * 3  # Get more to filter duplicates
-        )
+        result_lists = await backend.async_search(chatbot_id, query, query_embedding, k, num_candidates, filters)
+        
+        served = _served_models(result_lists)
+        if served and model_name not in served:
+            # Another worker cut this chatbot over to a new model; refresh before the cache would
+            model_registry.invalidate(chatbot_id)
+            current = await chatbot_embedding_model(chatbot_id, backend)
+            if current != model_name:
+                model_name = current
+                query_embedding = await embedding_service.embed(query, model_name)
+                result_lists = await backend.async_search(chatbot_id, query, query_embedding, k, num_candidates, filters)
         
         # Remove duplicates and prepare results
         seen = set()
         unique_results = []
         
-        for hit in results["hits"]["hits"]:
+        for hit, score in reciprocal_rank_fusion(result_lists):
             source = hit["_source"]
             source.pop('embedding', None)
             
             # Add score for debugging
-            source['_search_score'] = hit['_score']
+            source['_search_score'] = score
             
             key = (source.get("url"), source.get("chunk_index"))
             if key not in seen:
                 seen.add(key)
                 unique_results.append(source)
-                if len(unique_results) >= max_results:
+                if len(unique_results) >= fetch_results:
                     break
         
+        if rerank:
+            deadline = started + settings.RERANK_BUDGET_MS / 1000
+            unique_results = await reranker.rerank(
+                query, unique_results, min(max_results, settings.RERANK_TOP_N), deadline, fallback_n=max_results
+            )
+        
+        if passages and unique_results:
+            # Best-matching sentence window per hit, so prompts can carry passages instead of whole chunks
+            try:
+                await attach_passages(query_embedding, unique_results, model_name=model_name)
+            except Exception as e:
+                print(f"⚠️  Passage extraction failed: {e}")
+        
         # Log search results for debugging
         if unique_results:
-            scores = [round(r.get('_search_score', 0), 2) for r in unique_results[:3]]
+            scores = [round(r.get('_search_score', 0), 4) for r in unique_results[:3]]
             print(f"🔍 Search '{query}' → Found {len(unique_results)} results (scores: {scores})")
         else:
-            print(f"⚠️  Search '{query}' → No results found in index '{index_name}'")
+            print(f"⚠️  Search '{query}' → No results found for chatbot {chatbot_id}")
             # Check if index has any data
             try:
-                count = es.count(index=index_name)
-                print(f"📊 Index '{index_name}' has {count['count']} total documents")
+                count = await backend.async_count(chatbot_id)
+                print(f"📊 Chatbot {chatbot_id} has {count} indexed documents")
             except:
                 pass
         
@@ -268,10 +477,32 @@ async def search_chatbot_content(chatbot_id: int, query: str, max_results: int =
         traceback.print_exc()
         return []
 
+async def measure_vector_recall(chatbot_id: int, queries: List[str], k: int = 5) -> float:
+    """Mean recall@k of the vector leg against exact full-precision cosine search.
+
+    Used to check a quantized EMBEDDING_STORAGE stays within tolerance of float vectors.
+    """
+    backend = get_search_backend()
+    num_candidates = max(settings.SEARCH_NUM_CANDIDATES, k)
+    model_name = await chatbot_embedding_model(chatbot_id, backend)
+    recalls = []
+    for query in queries:
+        query_embedding = await embedding_service.embed(query, model_name)
+        exact_ids = {hit["_id"] for hit in backend.exact_vector_search(chatbot_id, query_embedding, k)}
+        if not exact_ids:
+            continue
+        vector_hits = (await backend.async_search(chatbot_id, query, query_embedding, k, num_candidates))[0]
+        recalls.append(len(exact_ids & {hit["_id"] for hit in vector_hits}) / len(exact_ids))
+    recall = sum(recalls) / len(recalls) if recalls else 0.0
+    print(f"📏 Chatbot {chatbot_id} vector recall@{k}: {recall:.3f} over {len(recalls)} queries")
+    return recall
+
 def cleanup_demo_data():
+    backend = get_search_backend()
+    if not hasattr(backend, "client"):
+        return
     try:
-        es.indices.delete(index="products", ignore=[404])
+        backend.client.indices.delete(index="products", ignore=[404])
         print("✅ Removed products index")
     except Exception as e:
         print(f"⚠️  Could not remove products index: {e}")
-
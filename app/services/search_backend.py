@@ -0,0 +1,573 @@
+import asyncio
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from elasticsearch import AsyncElasticsearch, Elasticsearch, NotFoundError, helpers
+from app.core.config import settings
+from app.services.dedup import fingerprint_scope
+from app.services.index_manager import IndexManager, EMBEDDING_DIMS, QUANTIZED_INDEX_TYPES, SEARCH_FILTER_FIELDS, build_index_mappings
+
+# Keyword and numeric fields take arrays, and a term filter matches any element
+MERGE_FIELDS_SCRIPT = (
+    "boolean changed = false; "
+    "for (entry in params.fields.entrySet()) { "
+    "  def current = ctx._source[entry.getKey()]; "
+    "  if (current == null) { current = entry.getKey() == 'source_urls' && ctx._source.url != null ? [ctx._source.url] : []; } "
+    "  else if (!(current instanceof List)) { current = [current]; } "
+    "  boolean added = false; "
+    "  for (v in entry.getValue()) { if (!current.contains(v)) { current.add(v); added = true; } } "
+    "  if (added) { ctx._source[entry.getKey()] = current; changed = true; } "
+    "} "
+    "if (!changed) { ctx.op = 'noop'; }"
+)
+
+class SearchBackend:
+    """Storage and retrieval for chatbot content chunks.
+
+    Documents are plain dicts carrying an 'embedding' list; hits are returned in
+    Elasticsearch shape ({"_id", "_score", "_source"}) whatever the backend.
+    """
+
+    name = "base"
+
+    def ping(self) -> bool:
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        return self.name
+
+    def ensure_index(self, chatbot_id: int):
+        raise NotImplementedError
+
+    def index(self, chatbot_id: int, document: dict):
+        raise NotImplementedError
+
+    def bulk_index(self, chatbot_id: int, documents: List[dict], target: Optional[str] = None, deletes: Optional[List[str]] = None) -> Tuple[int, int]:
+        """Write documents and delete the deletes ids in one batch, returning (succeeded, failed) writes.
+
+        Documents with an _id replace the stored document with that id. target writes to
+        re-embed storage.
+        """
+        raise NotImplementedError
+
+    def merge_fields(self, chatbot_id: int, values_by_id: Dict[str, Dict[str, list]]):
+        """Add values to list fields of stored documents (near-duplicates found at ingest).
+
+        A scalar field becomes a list holding its old value; source_urls starts from url.
+        """
+        raise NotImplementedError
+
+    def fingerprints(self, chatbot_id: int) -> Iterable[Tuple[str, int, str]]:
+        """(doc id, simhash, fingerprint scope) for every stored document that has a fingerprint"""
+        raise NotImplementedError
+
+    def ids_by_url(self, chatbot_id: int, urls: List[str]) -> Iterable[Tuple[str, str]]:
+        """(doc id, url) for every stored chunk whose url is one of urls"""
+        raise NotImplementedError
+
+    def search(self, chatbot_id: int, query: str, query_vector: List[float], size: int, num_candidates: int, filters: Optional[Dict[str, object]] = None) -> List[List[dict]]:
+        """Run the vector and lexical legs, returning one ranked hit list per leg.
+
+        filters restricts both legs to documents whose fields match every value (scalar or
+        list), applied before ranking rather than to the ranked hits.
+        """
+        raise NotImplementedError
+
+    async def async_search(self, chatbot_id: int, query: str, query_vector: List[float], size: int, num_candidates: int, filters: Optional[Dict[str, object]] = None) -> List[List[dict]]:
+        """search() for the event loop; runs the sync version on a worker thread unless overridden"""
+        return await asyncio.to_thread(self.search, chatbot_id, query, query_vector, size, num_candidates, filters)
+
+    def exact_vector_search(self, chatbot_id: int, query_vector: List[float], size: int) -> List[dict]:
+        """Brute-force full-precision cosine search, the reference for measuring ANN recall"""
+        raise NotImplementedError
+
+    def count(self, chatbot_id: int) -> int:
+        raise NotImplementedError
+
+    async def async_count(self, chatbot_id: int) -> int:
+        return await asyncio.to_thread(self.count, chatbot_id)
+
+    def delete_by_filter(self, chatbot_id: int, filters: Dict[str, object]) -> int:
+        """Delete documents whose fields match every filter value (scalar or list)"""
+        raise NotImplementedError
+
+    def rebuild_index(self, chatbot_id: int):
+        """Rewrite the chatbot's storage from scratch without interrupting queries"""
+        raise NotImplementedError
+
+    def scan_documents(self, chatbot_id: int, batch_size: int, target: Optional[str] = None) -> Iterable[List[dict]]:
+        """Stored documents without their embeddings ('_id' included), in batches"""
+        raise NotImplementedError
+
+    def delete_documents(self, chatbot_id: int, doc_ids: List[str], target: Optional[str] = None):
+        raise NotImplementedError
+
+    def begin_reembed(self, chatbot_id: int, dims: int) -> str:
+        """Create empty storage beside the live one for re-embedded documents, returning its handle"""
+        raise NotImplementedError
+
+    def cutover_reembed(self, chatbot_id: int, target: str) -> Optional[str]:
+        """Serve the chatbot from target; returns a handle to the previous storage, None if it is already gone"""
+        raise NotImplementedError
+
+    def drop_reembed(self, chatbot_id: int, handle: str):
+        """Delete an abandoned re-embed target or a previous storage that has been caught up"""
+        raise NotImplementedError
+
+    def begin_bulk(self, chatbot_id: int):
+        pass
+
+    def end_bulk(self, chatbot_id: int):
+        pass
+
+    def refresh(self, chatbot_id: int):
+        """Make writes so far searchable, also while a bulk load has refresh paused"""
+        pass
+
+    def reset_paused_refresh(self) -> int:
+        """Undo refresh pauses left by bulk loads of a process that died; returns the indices fixed"""
+        return 0
+
+    async def aclose(self):
+        pass
+
+
+def legacy_index_name(chatbot_id: int) -> str:
+    return f"chatbot-{chatbot_id}"
+
+
+class ElasticsearchBackend(SearchBackend):
+    """Elasticsearch storage in one of two layouts.
+
+    per_chatbot: one `chatbot-{id}` index per chatbot.
+    shared: SHARED_INDEX_COUNT `chatbots-shared-{n}` indices; every document is routed by
+    chatbot_id and every query carries a chatbot_id filter.
+
+    Query paths used from the event loop (async_search, async_count) go through a pooled
+    AsyncElasticsearch client; ingest, index management and scraper threads keep the
+    sync client, configured with the same pool size, timeouts and retries.
+    """
+
+    name = "elasticsearch"
+
+    def __init__(self, host: str, layout: str = "per_chatbot", shared_index_count: int = 1):
+        if layout not in ("per_chatbot", "shared"):
+            raise ValueError(f"Unknown SEARCH_INDEX_LAYOUT '{layout}'")
+        self.host = host
+        self.layout = layout
+        self.shared_index_count = max(shared_index_count, 1)
+        self.client = Elasticsearch([host], **self._client_options())
+        self._async_client = None
+        self.indices = IndexManager(self.client)
+        self.quantized = settings.EMBEDDING_STORAGE in QUANTIZED_INDEX_TYPES
+        # Refresh is paused per index while any ingester is writing a large batch to it
+        self._refresh_pauses = {}
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def _client_options() -> dict:
+        return {
+            "headers": {"accept": "application/json", "content-type": "application/json"},
+            "connections_per_node": settings.ES_MAX_CONNECTIONS,
+            "request_timeout": settings.ES_REQUEST_TIMEOUT,
+            "max_retries": settings.ES_MAX_RETRIES,
+            "retry_on_timeout": True
+        }
+
+    @property
+    def async_client(self) -> AsyncElasticsearch:
+        # Created on first use so its connection pool belongs to the serving event loop
+        if self._async_client is None:
+            self._async_client = AsyncElasticsearch([self.host], **self._client_options())
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    @property
+    def shared(self) -> bool:
+        return self.layout == "shared"
+
+    def ping(self) -> bool:
+        return self.client.ping()
+
+    def describe(self) -> str:
+        return f"Elasticsearch at {self.host} ({self.layout} layout)"
+
+    def index_name(self, chatbot_id: int) -> str:
+        if self.shared:
+            return f"{settings.SHARED_INDEX_PREFIX}-{chatbot_id % self.shared_index_count}"
+        return legacy_index_name(chatbot_id)
+
+    def routing(self, chatbot_id: int):
+        return str(chatbot_id) if self.shared else None
+
+    def tenant_filter(self, chatbot_id: int) -> List[dict]:
+        return [{"term": {"chatbot_id": chatbot_id}}] if self.shared else []
+
+    def filter_clauses(self, chatbot_id: int, filters: Optional[Dict[str, object]] = None) -> List[dict]:
+        return self.tenant_filter(chatbot_id) + [
+            {"terms": {field: list(value) if isinstance(value, (list, tuple, set)) else [value]}}
+            for field, value in (filters or {}).items()
+        ]
+
+    def _index_settings(self) -> dict:
+        return {"number_of_shards": settings.SHARED_INDEX_SHARDS} if self.shared else None
+
+    def ensure_index(self, chatbot_id: int):
+        # index_name() is an alias; reads and writes never touch concrete indices directly
+        self.indices.ensure(self.index_name(chatbot_id), self._index_settings())
+
+    def rebuild_index(self, chatbot_id: int):
+        if self.shared:
+            raise ValueError("Per-chatbot reindex needs SEARCH_INDEX_LAYOUT=per_chatbot")
+        return self.indices.rebuild(self.index_name(chatbot_id), index_settings=self._index_settings())
+
+    def index(self, chatbot_id: int, document: dict):
+        document = dict(document)
+        doc_id = document.pop("_id", None)
+        self.client.index(index=self.index_name(chatbot_id), id=doc_id, document=document, routing=self.routing(chatbot_id))
+
+    def bulk_index(self, chatbot_id: int, documents: List[dict], target: Optional[str] = None, deletes: Optional[List[str]] = None) -> Tuple[int, int]:
+        index_name = target or self.index_name(chatbot_id)
+        routing = self.routing(chatbot_id)
+        actions = []
+        for doc in documents:
+            action = {"_index": index_name, "_source": {key: value for key, value in doc.items() if key != "_id"}}
+            if doc.get("_id"):
+                action["_id"] = doc["_id"]
+            if routing:
+                action["_routing"] = routing
+            actions.append(action)
+        for doc_id in deletes or []:
+            action = {"_op_type": "delete", "_index": index_name, "_id": doc_id}
+            if routing:
+                action["_routing"] = routing
+            actions.append(action)
+        if not actions:
+            return 0, 0
+        _, errors = helpers.bulk(self.client, actions, chunk_size=len(actions), raise_on_error=False, stats_only=False)
+        # A delete that finds nothing (removed concurrently) is not a failed write
+        failed = sum(1 for error in errors if "delete" not in error)
+        return len(documents) - failed, failed
+
+    def merge_fields(self, chatbot_id: int, values_by_id: Dict[str, Dict[str, list]]):
+        index_name = self.index_name(chatbot_id)
+        routing = self.routing(chatbot_id)
+        actions = []
+        for doc_id, fields in values_by_id.items():
+            action = {
+                "_op_type": "update",
+                "_index": index_name,
+                "_id": doc_id,
+                "script": {
+                    "source": MERGE_FIELDS_SCRIPT,
+                    "params": {"fields": fields}
+                },
+                "retry_on_conflict": 3
+            }
+            if routing:
+                action["_routing"] = routing
+            actions.append(action)
+        if actions:
+            # A missing document (deleted since it was fingerprinted) just drops its update
+            helpers.bulk(self.client, actions, raise_on_error=False, stats_only=True)
+
+    def fingerprints(self, chatbot_id: int) -> Iterable[Tuple[str, int, str]]:
+        try:
+            hits = helpers.scan(
+                self.client,
+                index=self.index_name(chatbot_id),
+                query={
+                    "query": {"bool": {"filter": self.tenant_filter(chatbot_id) + [{"exists": {"field": "simhash"}}]}},
+                    "_source": ["simhash", "domain_id", "document_id"]
+                },
+                routing=self.routing(chatbot_id),
+                size=5000
+            )
+            for hit in hits:
+                yield hit["_id"], hit["_source"]["simhash"], fingerprint_scope(hit["_source"])
+        except NotFoundError:
+            return
+
+    def ids_by_url(self, chatbot_id: int, urls: List[str]) -> Iterable[Tuple[str, str]]:
+        try:
+            hits = helpers.scan(
+                self.client,
+                index=self.index_name(chatbot_id),
+                query={
+                    "query": {"bool": {"filter": self.filter_clauses(chatbot_id, {"url": urls})}},
+                    "_source": ["url"]
+                },
+                routing=self.routing(chatbot_id),
+                size=5000
+            )
+            for hit in hits:
+                yield hit["_id"], hit["_source"].get("url")
+        except NotFoundError:
+            return
+
+    def scan_documents(self, chatbot_id: int, batch_size: int, target: Optional[str] = None) -> Iterable[List[dict]]:
+        index_name = target or self.index_name(chatbot_id)
+        # Bulk loads pause refresh; their writes so far have to be visible to the scan
+        self.client.indices.refresh(index=index_name, ignore_unavailable=True)
+        hits = helpers.scan(
+            self.client,
+            index=index_name,
+            query={
+                "query": {"bool": {"filter": self.tenant_filter(chatbot_id)}},
+                "_source": {"excludes": ["embedding"]}
+            },
+            routing=self.routing(chatbot_id),
+            size=batch_size
+        )
+        batch = []
+        for hit in hits:
+            batch.append({"_id": hit["_id"], **hit["_source"]})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def delete_documents(self, chatbot_id: int, doc_ids: List[str], target: Optional[str] = None):
+        index_name = target or self.index_name(chatbot_id)
+        routing = self.routing(chatbot_id)
+        actions = []
+        for doc_id in doc_ids:
+            action = {"_op_type": "delete", "_index": index_name, "_id": doc_id}
+            if routing:
+                action["_routing"] = routing
+            actions.append(action)
+        if actions:
+            helpers.bulk(self.client, actions, raise_on_error=False, stats_only=True)
+
+    def begin_reembed(self, chatbot_id: int, dims: int) -> str:
+        if self.shared:
+            # Shared indices hold many chatbots, so there is no per-chatbot alias to swap
+            raise ValueError("Re-embedding with per-chatbot cutover needs SEARCH_INDEX_LAYOUT=per_chatbot")
+        alias = self.index_name(chatbot_id)
+        self.indices.ensure(alias, self._index_settings())
+        return self.indices.create_next(alias, index_settings=self._index_settings(), mappings=build_index_mappings(dims))
+
+    def cutover_reembed(self, chatbot_id: int, target: str) -> Optional[str]:
+        alias = self.index_name(chatbot_id)
+        self.client.indices.refresh(index=target)
+        previous = self.indices.swap(alias, target, delete_old=False)
+        # A legacy concrete index is removed by the swap itself
+        return previous if previous and previous != alias else None
+
+    def drop_reembed(self, chatbot_id: int, handle: str):
+        self.client.indices.delete(index=handle, ignore_unavailable=True)
+
+    def _msearch_body(self, chatbot_id: int, query: str, query_vector: List[float], size: int, num_candidates: int, filters: Optional[Dict[str, object]] = None) -> List[dict]:
+        index_name = self.index_name(chatbot_id)
+        # Filters inside kNN prune the graph walk itself, so scoped queries still get k hits
+        filters = self.filter_clauses(chatbot_id, filters)
+        # 1. Semantic leg - approximate kNN over the HNSW graph of the embedding field
+        if self.quantized:
+            vector_search = self._quantized_vector_search(query_vector, size, num_candidates, filters)
+        else:
+            knn = {
+                "field": "embedding",
+                "query_vector": query_vector,
+                "k": size,
+                "num_candidates": num_candidates
+            }
+            if filters:
+                knn["filter"] = filters
+            vector_search = {
+                "knn": knn,
+                "size": size,
+                "_source": {"excludes": ["embedding"]}
+            }
+        # 2. Lexical leg - BM25 over title and content
+        text_search = {
+            "query": {
+                "bool": {
+                    "must": {
+                        "multi_match": {
+                            "query": query,
+                            "fields": ["title^3", "content"],
+                            "type": "best_fields",
+                            "fuzziness": "AUTO"
+                        }
+                    },
+                    "filter": filters
+                }
+            },
+            "size": size,
+            "_source": {"excludes": ["embedding"]}
+        }
+
+        # Both legs go out in a single msearch round trip
+        header = {"index": index_name}
+        if self.shared:
+            header["routing"] = self.routing(chatbot_id)
+        return [header, vector_search, header, text_search]
+
+    def _parse_msearch(self, chatbot_id: int, responses: List[dict], size: int) -> List[List[dict]]:
+        result_lists = []
+        for response in responses:
+            if "error" in response:
+                print(f"⚠️  Search leg failed on '{self.index_name(chatbot_id)}': {response['error']}")
+                continue
+            # The quantized leg over-fetches for rescoring
+            result_lists.append(response["hits"]["hits"][:size])
+        return result_lists
+
+    def search(self, chatbot_id: int, query: str, query_vector: List[float], size: int, num_candidates: int, filters: Optional[Dict[str, object]] = None) -> List[List[dict]]:
+        searches = self._msearch_body(chatbot_id, query, query_vector, size, num_candidates, filters)
+        return self._parse_msearch(chatbot_id, self.client.msearch(searches=searches)["responses"], size)
+
+    async def async_search(self, chatbot_id: int, query: str, query_vector: List[float], size: int, num_candidates: int, filters: Optional[Dict[str, object]] = None) -> List[List[dict]]:
+        searches = self._msearch_body(chatbot_id, query, query_vector, size, num_candidates, filters)
+        response = await self.async_client.msearch(searches=searches)
+        return self._parse_msearch(chatbot_id, response["responses"], size)
+
+    def _cosine_script(self, query_vector: List[float]) -> dict:
+        # Same 0..1 scale as the kNN score for cosine similarity
+        return {
+            "source": "(cosineSimilarity(params.query_vector, 'embedding') + 1.0) / 2.0",
+            "params": {"query_vector": query_vector}
+        }
+
+    def _quantized_vector_search(self, query_vector: List[float], size: int, num_candidates: int, filters: List[dict]) -> dict:
+        """kNN over the quantized HNSW graph, then rescore the top window with the raw float vectors"""
+        window = size * settings.QUANTIZED_RESCORE_OVERSAMPLE
+        knn = {
+            "field": "embedding",
+            "query_vector": query_vector,
+            "num_candidates": max(num_candidates, window)
+        }
+        if filters:
+            knn["filter"] = filters
+        return {
+            "query": {"knn": knn},
+            "rescore": {
+                "window_size": window,
+                "query": {
+                    "rescore_query": {
+                        "script_score": {
+                            "query": {"match_all": {}},
+                            "script": self._cosine_script(query_vector)
+                        }
+                    },
+                    "query_weight": 0.0,
+                    "rescore_query_weight": 1.0
+                }
+            },
+            "size": window,
+            "_source": {"excludes": ["embedding"]}
+        }
+
+    def exact_vector_search(self, chatbot_id: int, query_vector: List[float], size: int) -> List[dict]:
+        response = self.client.search(
+            index=self.index_name(chatbot_id),
+            query={
+                "script_score": {
+                    "query": {"bool": {"filter": self.tenant_filter(chatbot_id)}},
+                    "script": self._cosine_script(query_vector)
+                }
+            },
+            routing=self.routing(chatbot_id),
+            size=size,
+            source_excludes=["embedding"]
+        )
+        return response["hits"]["hits"]
+
+    def count(self, chatbot_id: int) -> int:
+        return self.client.count(
+            index=self.index_name(chatbot_id),
+            query={"bool": {"filter": self.tenant_filter(chatbot_id)}},
+            routing=self.routing(chatbot_id)
+        )["count"]
+
+    async def async_count(self, chatbot_id: int) -> int:
+        response = await self.async_client.count(
+            index=self.index_name(chatbot_id),
+            query={"bool": {"filter": self.tenant_filter(chatbot_id)}},
+            routing=self.routing(chatbot_id)
+        )
+        return response["count"]
+
+    def delete_by_filter(self, chatbot_id: int, filters: Dict[str, object]) -> int:
+        response = self.client.delete_by_query(
+            index=self.index_name(chatbot_id),
+            query={"bool": {"filter": self.filter_clauses(chatbot_id, filters)}},
+            routing=self.routing(chatbot_id),
+            conflicts="proceed",
+            refresh=True,
+            ignore_unavailable=True
+        )
+        return response.get("deleted", 0)
+
+    def begin_bulk(self, chatbot_id: int):
+        # A shared index serves other tenants' fresh writes, so it keeps refreshing
+        if self.shared:
+            return
+        index_name = self.index_name(chatbot_id)
+        with self._refresh_lock:
+            self._refresh_pauses[index_name] = self._refresh_pauses.get(index_name, 0) + 1
+            if self._refresh_pauses[index_name] == 1:
+                self.client.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": "-1"}})
+
+    def end_bulk(self, chatbot_id: int):
+        if self.shared:
+            return
+        index_name = self.index_name(chatbot_id)
+        with self._refresh_lock:
+            self._refresh_pauses[index_name] = self._refresh_pauses.get(index_name, 1) - 1
+            if self._refresh_pauses[index_name] <= 0:
+                self._refresh_pauses.pop(index_name, None)
+                self.client.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": None}})
+        self.client.indices.refresh(index=index_name)
+
+    def refresh(self, chatbot_id: int):
+        self.client.indices.refresh(index=self.index_name(chatbot_id), ignore_unavailable=True)
+
+    def reset_paused_refresh(self) -> int:
+        # Pauses are only ever set on per-chatbot indices. Another worker's bulk load that is
+        # running right now just loses its pause, which costs speed, not data
+        response = self.client.indices.get_settings(
+            index=legacy_index_name("*"), name="index.refresh_interval",
+            ignore_unavailable=True, allow_no_indices=True
+        )
+        paused = [
+            index_name for index_name, body in response.items()
+            if body.get("settings", {}).get("index", {}).get("refresh_interval") == "-1"
+        ]
+        if paused:
+            self.client.indices.put_settings(index=",".join(paused), settings={"index": {"refresh_interval": None}})
+        return len(paused)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_search_backend() -> SearchBackend:
+    global _backend
+
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None:
+            if settings.SEARCH_BACKEND == "embedded":
+                from app.services.vector_store import EmbeddedVectorStore
+                _backend = EmbeddedVectorStore(
+                    settings.VECTOR_STORE_DIR,
+                    dtype=settings.VECTOR_STORE_DTYPE,
+                    rescore_oversample=settings.QUANTIZED_RESCORE_OVERSAMPLE
+                )
+            elif settings.SEARCH_BACKEND == "elasticsearch":
+                _backend = ElasticsearchBackend(
+                    settings.ES_HOST,
+                    layout=settings.SEARCH_INDEX_LAYOUT,
+                    shared_index_count=settings.SHARED_INDEX_COUNT
+                )
+            else:
+                raise ValueError(f"Unknown SEARCH_BACKEND '{settings.SEARCH_BACKEND}'")
+
+    return _backend
@@ -0,0 +1,160 @@
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urljoin
+from urllib.robotparser import RobotFileParser
+from lxml import etree
+from app.services.fetcher import AsyncFetcher
+
+# Protocol limits for a single sitemap file, uncompressed
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+MAX_SITEMAP_URLS = 50000
+# Sitemap index files followed per crawl
+MAX_SITEMAP_FILES = 50
+MAX_ROBOTS_BYTES = 512 * 1024
+# <priority> of pages that don't give one
+DEFAULT_PRIORITY = 0.5
+GZIP_MAGIC = b"\x1f\x8b"
+
+@dataclass
+class SitemapEntry:
+    url: str
+    lastmod: Optional[datetime] = None
+    priority: Optional[float] = None
+
+def _generic_crawl_delay(lines: List[str]) -> Optional[float]:
+    """Crawl-delay of the * group; RobotFileParser only reads whole seconds"""
+    agents, in_rules = [], False
+    for line in lines:
+        field, _, value = line.split("#", 1)[0].partition(":")
+        field, value = field.strip().lower(), value.strip()
+        if field == "user-agent":
+            if in_rules:
+                agents, in_rules = [], False
+            agents.append(value)
+        elif field:
+            in_rules = True
+            if field == "crawl-delay" and "*" in agents:
+                try:
+                    return max(float(value), 0.0)
+                except ValueError:
+                    return None
+    return None
+
+class RobotsRules:
+    """A site's robots.txt rules for the generic (*) user agent"""
+
+    def __init__(self, text: str):
+        lines = text.splitlines()
+        self._parser = RobotFileParser()
+        self._parser.parse(lines)
+        self._crawl_delay = _generic_crawl_delay(lines)
+
+    def allowed(self, url: str) -> bool:
+        return self._parser.can_fetch("*", url)
+
+    @property
+    def crawl_delay(self) -> Optional[float]:
+        if self._crawl_delay is None:
+            rate = self._parser.request_rate("*")
+            return rate.seconds / rate.requests if rate and rate.requests else None
+        return self._crawl_delay
+
+    @property
+    def sitemaps(self) -> List[str]:
+        return self._parser.site_maps() or []
+
+async def fetch_robots(fetcher: AsyncFetcher, base_url: str) -> Optional[RobotsRules]:
+    """base_url's robots.txt, or None when it has none (everything is allowed)"""
+    url = urljoin(base_url, "/robots.txt")
+    try:
+        status, body = await fetcher.fetch_bytes(url, MAX_ROBOTS_BYTES)
+    except Exception as e:
+        print(f"⚠️ Could not fetch {url}: {e}")
+        return None
+    if status >= 400:
+        return None
+    return RobotsRules(body.decode("utf-8", errors="replace"))
+
+def _gunzip(data: bytes) -> bytes:
+    """Decompress a .gz sitemap, refusing to inflate past MAX_SITEMAP_BYTES"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(data, MAX_SITEMAP_BYTES)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"sitemap is larger than {MAX_SITEMAP_BYTES} bytes uncompressed")
+    return data
+
+def _parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """W3C datetime (a date, or date and time with offset) as naive UTC, like the database's timestamps"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _parse_priority(value: Optional[str]) -> Optional[float]:
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return None
+
+def parse_sitemap(data: bytes) -> Tuple[List[SitemapEntry], List[str]]:
+    """(page entries, child sitemap URLs) from a urlset, sitemap index or plain-text sitemap"""
+    if data.startswith(GZIP_MAGIC):
+        data = _gunzip(data)
+    if not data.lstrip().startswith(b"<"):
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        return [SitemapEntry(url=line.strip()) for line in lines if line.strip().startswith("http")][:MAX_SITEMAP_URLS], []
+
+    # Sitemaps are untrusted input: no entity expansion or network access while parsing
+    parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True)
+    root = etree.fromstring(data, parser)
+    if root is None:
+        return [], []
+    entries, children = [], []
+    for element in root:
+        if not isinstance(element.tag, str):
+            continue
+        fields = {etree.QName(child).localname: (child.text or "").strip() for child in element if isinstance(child.tag, str)}
+        loc = fields.get("loc")
+        if not loc:
+            continue
+        kind = etree.QName(element).localname
+        if kind == "sitemap":
+            children.append(loc)
+        elif kind == "url" and len(entries) < MAX_SITEMAP_URLS:
+            entries.append(SitemapEntry(url=loc, lastmod=_parse_lastmod(fields.get("lastmod")), priority=_parse_priority(fields.get("priority"))))
+    return entries, children
+
+async def fetch_sitemap_entries(fetcher: AsyncFetcher, sitemap_urls: List[str], max_entries: int, on_progress: Callable[[], None] = None) -> List[SitemapEntry]:
+    """Every page listed by sitemap_urls, following sitemap indexes, up to max_entries pages.
+
+    on_progress is called after each sitemap file, read or not, so a crawl can show it is alive.
+    """
+    queue = list(sitemap_urls)
+    seen = set()
+    entries: List[SitemapEntry] = []
+    while queue and len(seen) < MAX_SITEMAP_FILES and len(entries) < max_entries:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        try:
+            status, body = await fetcher.fetch_bytes(url, MAX_SITEMAP_BYTES)
+            if status >= 400:
+                continue
+            found, children = parse_sitemap(body)
+        except Exception as e:
+            print(f"⚠️ Could not read sitemap {url}: {e}")
+            continue
+        finally:
+            if on_progress is not None:
+                on_progress()
+        entries.extend(found[:max_entries - len(entries)])
+        queue.extend(children)
+    return entries
@@ -0,0 +1,106 @@
+from collections import Counter
+from typing import List, Tuple
+import numpy as np
+from app.core.config import settings
+
+# Punctuation becomes whitespace in one str.translate pass, which is far cheaper than a regex scan
+_SEPARATORS = str.maketrans({
+    ch: " " for ch in [chr(code) for code in range(128) if not chr(code).isalnum()] + list("\u00a0\u2013\u2014\u2018\u2019\u201c\u201d\u2026")
+})
+# Common English function words; terms of two letters or fewer are dropped anyway
+STOP_WORDS = frozenset("""
+about above across after afterwards again against all almost alone along already also although always among
+amongst amount and another any anyhow anyone anything anyway anywhere are around back became because become
+becomes becoming been before beforehand behind being below beside besides between beyond both but call can
+cannot could did does doing done down due during each either else elsewhere enough etc even ever every
+everyone everything everywhere except few find first for former formerly from front full further get give
+had has have having her here hereafter hereby herein hereupon hers herself him himself his how however
+into its itself just keep last latter latterly least less made many may meanwhile might mine more moreover
+most mostly move much must myself name namely neither never nevertheless next nobody none noone nor not
+nothing now nowhere off often once one only onto other others otherwise our ours ourselves out over own
+part per perhaps please put rather really same see seem seemed seeming seems several she should show side
+since some somehow someone something sometime sometimes somewhere still such take than that the their theirs
+them themselves then thence there thereafter thereby therefore therein thereupon these they this those though
+through throughout thru thus together too top toward towards under until upon used using very via was well
+were what whatever when whence whenever where whereafter whereas whereby wherein whereupon wherever whether
+which while whither who whoever whole whom whose why will with within without would yet you your yours
+yourself yourselves
+""".split())
+# Title terms count this many times over body terms
+TITLE_WEIGHT = 3
+
+class CorpusTagger:
+    """TF-IDF keyword tags for the pages of one crawl (or any batch of documents).
+
+    Document frequencies accumulate across every batch passed to tag(), so tags favour
+    terms that set a page apart from the rest of the site over terms every page repeats.
+    Each batch is laid out as a CSR term-count matrix and weighted in bulk with NumPy.
+
+    A batch is ranked with the IDF of the pages seen up to and including it; earlier
+    batches are not re-ranked as the crawl grows, because their chunks are already
+    indexed. Early batches of a large crawl therefore get slightly noisier tags, a
+    trade-off for tagging pages as they are scraped rather than after the crawl.
+    """
+
+    def __init__(self, max_tags: int = None):
+        self.max_tags = max_tags or settings.TAG_MAX_TAGS
+        self.vocabulary = {}
+        self.terms: List[str] = []
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.documents = 0
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            term_id = self.vocabulary[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def tag(self, documents: List[Tuple[str, str]]) -> List[List[str]]:
+        """Tags for each (title, content) pair, using the corpus seen so far for IDF"""
+        if not documents:
+            return []
+
+        indptr = [0]
+        indices = []
+        counts = []
+        for title, content in documents:
+            term_counts = Counter(content.lower().translate(_SEPARATORS).split())
+            for term in title.lower().translate(_SEPARATORS).split():
+                term_counts[term] += TITLE_WEIGHT
+            # Filtering distinct terms rather than tokens keeps the per-token work in C
+            for term, count in term_counts.items():
+                if len(term) > 2 and term[0].isalpha() and term.isalnum() and term not in STOP_WORDS:
+                    indices.append(self._term_id(term))
+                    counts.append(count)
+            indptr.append(len(indices))
+
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.float32)
+
+        # Each term appears at most once per row, so a bincount is its document frequency
+        self.documents += len(documents)
+        batch_freq = np.bincount(indices, minlength=len(self.terms))
+        self.doc_freq = np.concatenate([self.doc_freq, np.zeros(len(self.terms) - len(self.doc_freq), dtype=np.int64)])
+        self.doc_freq += batch_freq
+        idf = np.log((1 + self.documents) / (1 + self.doc_freq)) + 1.0
+
+        # Sublinear tf so one heavily repeated word doesn't drown the rest
+        weights = (1.0 + np.log(counts)) * idf[indices]
+
+        tags = []
+        for row in range(len(documents)):
+            start, end = indptr[row], indptr[row + 1]
+            row_weights = weights[start:end]
+            if len(row_weights) > self.max_tags:
+                top = np.argpartition(-row_weights, self.max_tags)[:self.max_tags]
+            else:
+                top = np.arange(len(row_weights))
+            top = top[np.argsort(-row_weights[top], kind="stable")]
+            tags.append([self.terms[indices[start + i]] for i in top])
+        return tags
+
+def tag_document(title: str, content: str) -> List[str]:
+    """Tags for a single document, where IDF has nothing to compare against"""
+    return CorpusTagger().tag([(title, content)])[0]
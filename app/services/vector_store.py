@@ -0,0 +1,604 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.dedup import fingerprint_scope, field_values, merged_values
+from app.services.embedding_service import LEGACY_EMBEDDING_DIMS
+from app.services.search_backend import SearchBackend, EMBEDDING_DIMS, SEARCH_FILTER_FIELDS
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+SCORE_BLOCK_ROWS = 65536
+COMPACT_DEAD_RATIO = 0.5
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with a light plural stemmer, roughly matching the ES english_light analyzer"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+def _matches(source: dict, filters: Dict[str, object]) -> bool:
+    for field, expected in filters.items():
+        allowed = expected if isinstance(expected, (list, tuple, set)) else [expected]
+        value = source.get(field)
+        values = value if isinstance(value, list) else [value]
+        if not any(v in allowed for v in values):
+            return False
+    return True
+
+
+class _ChatbotStore:
+    """One chatbot's chunks: an append-only vector file read through np.memmap, a JSONL
+    document log (with tombstones for deletes) and an in-memory BM25 inverted index.
+    Rows are also indexed by their SEARCH_FILTER_FIELDS values, so filtered searches only
+    score the matching rows.
+
+    In int8 mode a float16 side file holds the same vectors at full precision; only the
+    rows of first-stage candidates are ever paged in from it for rescoring.
+
+    Vector width is recorded in meta.json, so stores embedded with different models can
+    sit side by side; stores written before that file existed hold legacy-model vectors.
+    """
+
+    def __init__(self, path: str, dims: int, dtype: str, rescore_oversample: int = 3):
+        self.dtype = dtype
+        self.np_dtype = np.int8 if dtype == "int8" else np.float16
+        self.rescore_oversample = max(rescore_oversample, 1)
+        self.lock = threading.RLock()
+        self._set_paths(path)
+        os.makedirs(path, exist_ok=True)
+        self.dims = self._load_dims(dims)
+        self._reset()
+        self._load()
+
+    def _set_paths(self, path: str):
+        self.path = path
+        self.vectors_path = os.path.join(path, f"vectors.{self.dtype}")
+        self.rescore_path = os.path.join(path, "vectors.rescore.float16") if self.quantized else None
+        self.docs_path = os.path.join(path, "docs.jsonl")
+        self.meta_path = os.path.join(path, "meta.json")
+
+    def _load_dims(self, dims: int) -> int:
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)["dims"]
+        if os.path.exists(self.docs_path):
+            dims = LEGACY_EMBEDDING_DIMS
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"dims": dims}, f)
+        return dims
+
+    def relocate(self, path: str):
+        """Point the store at its directory's new location after a rename"""
+        with self.lock:
+            self._set_paths(path)
+            self._matrix = None
+            self._rescore_matrix = None
+
+    def _reset(self):
+        self.ids = []
+        self.sources = []
+        self.alive = []
+        self.doc_lengths = []
+        self.id_rows = {}
+        self.postings = defaultdict(dict)
+        self.field_rows = {field: defaultdict(set) for field in SEARCH_FILTER_FIELDS}
+        self._posting_arrays = {}
+        self._matrix = None
+        self._rescore_matrix = None
+
+    @property
+    def quantized(self) -> bool:
+        return self.np_dtype == np.int8
+
+    def _load(self):
+        if not os.path.exists(self.docs_path):
+            return
+        with open(self.docs_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("deleted"):
+                    self._mark_deleted(record["_id"])
+                elif "update" in record:
+                    self._update_source(record["_id"], record["update"])
+                else:
+                    self._add_row(record["_id"], record["_source"])
+        self._truncate_vectors()
+
+    def _truncate_vectors(self):
+        """Drop vector rows past the document log, left by a crash or failed write between the two"""
+        rows = len(self.ids)
+        files = [(self.vectors_path, np.dtype(self.np_dtype).itemsize)]
+        if self.quantized:
+            files.append((self.rescore_path, np.dtype(np.float16).itemsize))
+        for path, itemsize in files:
+            expected = rows * self.dims * itemsize
+            if os.path.exists(path) and os.path.getsize(path) > expected:
+                print(f"⚠️  Dropping {(os.path.getsize(path) - expected) // (self.dims * itemsize)} orphaned vector rows from {path}")
+                self._matrix = None
+                self._rescore_matrix = None
+                with open(path, "r+b") as f:
+                    f.truncate(expected)
+
+    def _add_row(self, doc_id: str, source: dict):
+        # Re-adding an id replaces the previous version
+        self._mark_deleted(doc_id)
+        row = len(self.ids)
+        self.ids.append(doc_id)
+        self.sources.append(source)
+        self.alive.append(True)
+        self.id_rows[doc_id] = row
+
+        term_freqs = defaultdict(float)
+        title_tokens = tokenize(source.get("title") or "")
+        content_tokens = tokenize(source.get("content") or "")
+        for token in title_tokens:
+            term_freqs[token] += TITLE_WEIGHT
+        for token in content_tokens:
+            term_freqs[token] += 1
+        for term, freq in term_freqs.items():
+            self.postings[term][row] = freq
+        self.doc_lengths.append(len(content_tokens) + TITLE_WEIGHT * len(title_tokens))
+
+        for field, rows_by_value in self.field_rows.items():
+            for value in field_values(source.get(field)):
+                rows_by_value[value].add(row)
+
+    def _update_source(self, doc_id: str, fields: dict):
+        # Updates never touch title or content, so postings stay valid; filter fields are re-indexed
+        row = self.id_rows.get(doc_id)
+        if row is None:
+            return
+        previous = self.sources[row]
+        self.sources[row] = {**previous, **fields}
+        for field in fields:
+            rows_by_value = self.field_rows.get(field)
+            if rows_by_value is None:
+                continue
+            for value in field_values(previous.get(field)):
+                rows_by_value[value].discard(row)
+            for value in field_values(fields[field]):
+                rows_by_value[value].add(row)
+
+    def _mark_deleted(self, doc_id: str):
+        row = self.id_rows.pop(doc_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.quantized:
+            return np.clip(np.round(vectors * 127), -127, 127).astype(np.int8)
+        return vectors.astype(np.float16)
+
+    def add(self, documents: List[dict]):
+        if not documents:
+            return
+        with self.lock:
+            vectors = self._normalize(np.asarray([doc["embedding"] for doc in documents], dtype=np.float32))
+            records = []
+            for doc in documents:
+                source = {key: value for key, value in doc.items() if key not in ("embedding", "_id")}
+                records.append({"_id": doc.get("_id") or uuid.uuid4().hex, "_source": source})
+
+            # Vectors first: rows beyond the document log are truncated, here after a failed
+            # write in this process and on load after a crash, so appends stay aligned
+            self._truncate_vectors()
+            with open(self.vectors_path, "ab") as f:
+                f.write(self._encode(vectors).tobytes())
+            if self.quantized:
+                with open(self.rescore_path, "ab") as f:
+                    f.write(vectors.astype(np.float16).tobytes())
+            with open(self.docs_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+
+            for record in records:
+                self._add_row(record["_id"], record["_source"])
+            self._posting_arrays = {}
+            self._matrix = None
+            self._rescore_matrix = None
+
+    def _get_matrix(self):
+        if self._matrix is None and self.ids:
+            self._matrix = np.memmap(self.vectors_path, dtype=self.np_dtype, mode="r", shape=(len(self.ids), self.dims))
+        return self._matrix
+
+    def _get_full_precision_matrix(self):
+        if not self.quantized:
+            return self._get_matrix()
+        if self._rescore_matrix is None and self.ids and os.path.exists(self.rescore_path):
+            self._rescore_matrix = np.memmap(self.rescore_path, dtype=np.float16, mode="r", shape=(len(self.ids), self.dims))
+        return self._rescore_matrix
+
+    @staticmethod
+    def _normalize_query(query_vector: List[float]) -> np.ndarray:
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else query
+
+    def filter_rows(self, filters: Dict[str, object]) -> np.ndarray:
+        """Sorted live rows matching every filter (any of a field's values)"""
+        matched = None
+        for field, expected in filters.items():
+            rows_by_value = self.field_rows.get(field)
+            if rows_by_value is None:
+                raise ValueError(f"Cannot filter on '{field}'")
+            rows = set()
+            for value in (expected if isinstance(expected, (list, tuple, set)) else [expected]):
+                rows |= rows_by_value.get(value, set())
+            matched = rows if matched is None else matched & rows
+        alive = self.alive
+        return np.fromiter(sorted(row for row in matched if alive[row]), dtype=np.int64)
+
+    def _score_all(self, matrix, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        if matrix.dtype == np.int8:
+            scores /= 127.0
+        scores[~np.asarray(self.alive, dtype=bool)] = -np.inf
+        return scores
+
+    def _get_postings(self, term: str):
+        if term not in self._posting_arrays:
+            postings = self.postings.get(term)
+            if postings:
+                rows = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+                freqs = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+                self._posting_arrays[term] = (rows, freqs)
+            else:
+                self._posting_arrays[term] = None
+        return self._posting_arrays[term]
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray) -> List[dict]:
+        return [
+            {"_id": self.ids[row], "_score": float(score), "_source": dict(self.sources[row])}
+            for row, score in zip(rows, scores)
+        ]
+
+    @staticmethod
+    def _top(scores: np.ndarray, size: int) -> np.ndarray:
+        if size >= len(scores):
+            return np.argsort(-scores)
+        top = np.argpartition(-scores, size)[:size]
+        return top[np.argsort(-scores[top])]
+
+    def knn(self, query_vector: List[float], size: int, filters: Optional[Dict[str, object]] = None) -> List[dict]:
+        with self.lock:
+            matrix = self._get_matrix()
+            if matrix is None:
+                return []
+            query = self._normalize_query(query_vector)
+            if filters:
+                # Only the matching rows are paged in and scored
+                rows = self.filter_rows(filters)
+                scores = matrix[rows].astype(np.float32) @ query
+                if matrix.dtype == np.int8:
+                    scores /= 127.0
+                available = len(rows)
+            else:
+                rows = None
+                scores = self._score_all(matrix, query)
+                available = len(self.id_rows)
+            size = min(size, available)
+            if size <= 0:
+                return []
+
+            full_precision = self._get_full_precision_matrix() if self.quantized else None
+            if full_precision is not None:
+                # First stage on int8, then rescore an oversampled window at full precision
+                candidates = self._top(scores, min(size * self.rescore_oversample, available))
+                candidates = np.sort(candidates if rows is None else rows[candidates])
+                rescored = full_precision[candidates].astype(np.float32) @ query
+                order = np.argsort(-rescored)[:size]
+                top, top_scores = candidates[order], rescored[order]
+            else:
+                top = self._top(scores, size)
+                top_scores = scores[top]
+                if rows is not None:
+                    top = rows[top]
+            # Same scale as the ES cosine similarity score
+            return self._hits(top, (1.0 + top_scores) / 2.0)
+
+    def exact_knn(self, query_vector: List[float], size: int) -> List[dict]:
+        with self.lock:
+            # int8 stores written before the rescore file existed only have quantized rows
+            matrix = self._get_full_precision_matrix()
+            if matrix is None:
+                matrix = self._get_matrix()
+            size = min(size, len(self.id_rows))
+            if matrix is None or size <= 0:
+                return []
+            scores = self._score_all(matrix, self._normalize_query(query_vector))
+            top = self._top(scores, size)
+            return self._hits(top, (1.0 + scores[top]) / 2.0)
+
+    def bm25(self, query: str, size: int, filters: Optional[Dict[str, object]] = None) -> List[dict]:
+        with self.lock:
+            terms = set(tokenize(query))
+            if not terms or not self.ids:
+                return []
+            alive = np.asarray(self.alive, dtype=bool)
+            total = int(alive.sum())
+            if total == 0:
+                return []
+            lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+            avg_length = float(lengths[alive].mean()) or 1.0
+
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            for term in terms:
+                postings = self._get_postings(term)
+                if postings is None:
+                    continue
+                rows, freqs = postings
+                doc_freq = int(alive[rows].sum())
+                if doc_freq == 0:
+                    continue
+                idf = math.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / avg_length)
+                np.add.at(scores, rows, idf * freqs * (BM25_K1 + 1) / (freqs + norm))
+
+            if filters:
+                allowed = np.zeros(len(self.ids), dtype=bool)
+                allowed[self.filter_rows(filters)] = True
+                scores[~allowed] = 0.0
+            else:
+                scores[~alive] = 0.0
+            matched = int((scores > 0).sum())
+            if matched == 0:
+                return []
+            top = self._top(scores, min(size, matched))
+            return self._hits(top, scores[top])
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.id_rows)
+
+    def merge_fields(self, values_by_id: Dict[str, Dict[str, list]]):
+        with self.lock:
+            updates = []
+            for doc_id, fields in values_by_id.items():
+                row = self.id_rows.get(doc_id)
+                if row is None:
+                    continue
+                source = self.sources[row]
+                update = {}
+                for field, values in fields.items():
+                    current = source.get(field)
+                    if field == "source_urls" and not current:
+                        current = [source.get("url")] if source.get("url") else []
+                    merged = merged_values(current, values)
+                    if merged is not None:
+                        update[field] = merged
+                if update:
+                    updates.append({"_id": doc_id, "update": update})
+            if not updates:
+                return
+            with open(self.docs_path, "a", encoding="utf-8") as f:
+                for record in updates:
+                    f.write(json.dumps(record) + "\n")
+            for record in updates:
+                self._update_source(record["_id"], record["update"])
+
+    def fingerprints(self) -> List[Tuple[str, int, str]]:
+        with self.lock:
+            return [
+                (doc_id, self.sources[row]["simhash"], fingerprint_scope(self.sources[row]))
+                for doc_id, row in self.id_rows.items()
+                if self.sources[row].get("simhash") is not None
+            ]
+
+    def ids_by_url(self, urls: List[str]) -> List[Tuple[str, str]]:
+        wanted = set(urls)
+        with self.lock:
+            return [
+                (doc_id, self.sources[row].get("url"))
+                for doc_id, row in self.id_rows.items()
+                if self.sources[row].get("url") in wanted
+            ]
+
+    def documents(self, batch_size: int) -> Iterable[List[dict]]:
+        with self.lock:
+            snapshot = [(self.ids[row], dict(self.sources[row])) for row in sorted(self.id_rows.values())]
+        for start in range(0, len(snapshot), batch_size):
+            yield [{"_id": doc_id, **source} for doc_id, source in snapshot[start:start + batch_size]]
+
+    def delete_by_filter(self, filters: Dict[str, object]) -> int:
+        with self.lock:
+            doomed = [
+                self.ids[row] for row in list(self.id_rows.values())
+                if _matches(self.sources[row], filters)
+            ]
+            return self.delete_ids(doomed)
+
+    def delete_ids(self, doc_ids: List[str]) -> int:
+        with self.lock:
+            doomed = [doc_id for doc_id in doc_ids if doc_id in self.id_rows]
+            if not doomed:
+                return 0
+            with open(self.docs_path, "a", encoding="utf-8") as f:
+                for doc_id in doomed:
+                    f.write(json.dumps({"_id": doc_id, "deleted": True}) + "\n")
+            for doc_id in doomed:
+                self._mark_deleted(doc_id)
+
+            if len(self.ids) > 1000 and 1 - len(self.id_rows) / len(self.ids) > COMPACT_DEAD_RATIO:
+                self.compact()
+            return len(doomed)
+
+    def compact(self):
+        """Rewrite the vector file and document log without deleted rows"""
+        with self.lock:
+            rows = sorted(self.id_rows.values())
+            vector_files = [(self.vectors_path, self._get_matrix())]
+            if self.quantized:
+                vector_files.append((self.rescore_path, self._get_full_precision_matrix()))
+            for path, matrix in vector_files:
+                with open(path + ".tmp", "wb") as f:
+                    if rows:
+                        f.write(np.ascontiguousarray(matrix[rows]).tobytes())
+            docs_tmp = self.docs_path + ".tmp"
+            with open(docs_tmp, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"_id": self.ids[row], "_source": self.sources[row]}) + "\n")
+            self._matrix = None
+            self._rescore_matrix = None
+            del vector_files
+            for path in (self.vectors_path, self.rescore_path):
+                if path and os.path.exists(path + ".tmp"):
+                    os.replace(path + ".tmp", path)
+            os.replace(docs_tmp, self.docs_path)
+            self._reset()
+            self._load()
+
+
+class EmbeddedVectorStore(SearchBackend):
+    """In-process search backend for single-node deployments and tests.
+
+    Vectors are stored normalized as float16 (or int8 with float16 rescoring) in per-chatbot
+    files and scored with vectorized dot products; lexical search is BM25 over an in-memory
+    inverted index.
+    """
+
+    name = "embedded"
+
+    def __init__(self, root: str, dtype: str = "float16", dims: int = EMBEDDING_DIMS, rescore_oversample: int = 3):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported vector store dtype '{dtype}'")
+        self.root = os.path.abspath(root)
+        self.dtype = dtype
+        self.dims = dims
+        self.rescore_oversample = rescore_oversample
+        self._stores = {}
+        # Re-embed targets and previous stores kept until a migration is caught up, by handle
+        self._side_stores: Dict[str, _ChatbotStore] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _store(self, chatbot_id: int) -> _ChatbotStore:
+        store = self._stores.get(chatbot_id)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(chatbot_id)
+                if store is None:
+                    store = _ChatbotStore(
+                        os.path.join(self.root, f"chatbot-{chatbot_id}"), self.dims, self.dtype,
+                        rescore_oversample=self.rescore_oversample
+                    )
+                    self._stores[chatbot_id] = store
+        return store
+
+    def _open(self, path: str, dims: int = None) -> _ChatbotStore:
+        return _ChatbotStore(path, dims or self.dims, self.dtype, rescore_oversample=self.rescore_oversample)
+
+    def _target(self, chatbot_id: int, target: Optional[str]) -> _ChatbotStore:
+        if target is None:
+            return self._store(chatbot_id)
+        with self._lock:
+            store = self._side_stores.get(target)
+            if store is None:
+                store = self._side_stores[target] = self._open(os.path.join(self.root, target))
+        return store
+
+    def ping(self) -> bool:
+        return os.access(self.root, os.W_OK)
+
+    def describe(self) -> str:
+        return f"embedded vector store at {self.root} ({self.dtype})"
+
+    def ensure_index(self, chatbot_id: int):
+        self._store(chatbot_id)
+
+    def index(self, chatbot_id: int, document: dict):
+        self._store(chatbot_id).add([document])
+
+    def bulk_index(self, chatbot_id: int, documents: List[dict], target: Optional[str] = None, deletes: Optional[List[str]] = None) -> Tuple[int, int]:
+        store = self._target(chatbot_id, target)
+        with store.lock:
+            store.add(documents)
+            if deletes:
+                store.delete_ids(deletes)
+        return len(documents), 0
+
+    def merge_fields(self, chatbot_id: int, values_by_id: Dict[str, Dict[str, list]]):
+        self._store(chatbot_id).merge_fields(values_by_id)
+
+    def fingerprints(self, chatbot_id: int) -> Iterable[Tuple[str, int, str]]:
+        return self._store(chatbot_id).fingerprints()
+
+    def ids_by_url(self, chatbot_id: int, urls: List[str]) -> Iterable[Tuple[str, str]]:
+        return self._store(chatbot_id).ids_by_url(urls)
+
+    def search(self, chatbot_id: int, query: str, query_vector: List[float], size: int, num_candidates: int, filters: Optional[Dict[str, object]] = None) -> List[List[dict]]:
+        # Exact scoring, so num_candidates has nothing to bound
+        store = self._store(chatbot_id)
+        if len(query_vector) != store.dims:
+            # Query embedded with another model than the store's; lexical results still come back
+            print(f"⚠️  Search leg failed on chatbot {chatbot_id}: query has {len(query_vector)} dims, store has {store.dims}")
+            return [store.bm25(query, size, filters)]
+        return [store.knn(query_vector, size, filters), store.bm25(query, size, filters)]
+
+    def exact_vector_search(self, chatbot_id: int, query_vector: List[float], size: int) -> List[dict]:
+        return self._store(chatbot_id).exact_knn(query_vector, size)
+
+    def count(self, chatbot_id: int) -> int:
+        return self._store(chatbot_id).count()
+
+    def delete_by_filter(self, chatbot_id: int, filters: Dict[str, object]) -> int:
+        return self._store(chatbot_id).delete_by_filter(filters)
+
+    def rebuild_index(self, chatbot_id: int):
+        self._store(chatbot_id).compact()
+
+    def scan_documents(self, chatbot_id: int, batch_size: int, target: Optional[str] = None) -> Iterable[List[dict]]:
+        return self._target(chatbot_id, target).documents(batch_size)
+
+    def delete_documents(self, chatbot_id: int, doc_ids: List[str], target: Optional[str] = None):
+        self._target(chatbot_id, target).delete_ids(doc_ids)
+
+    def begin_reembed(self, chatbot_id: int, dims: int) -> str:
+        handle = f"chatbot-{chatbot_id}.reembed-{int(time.time() * 1000)}"
+        with self._lock:
+            self._side_stores[handle] = self._open(os.path.join(self.root, handle), dims)
+        return handle
+
+    def cutover_reembed(self, chatbot_id: int, target: str) -> Optional[str]:
+        live = self._store(chatbot_id)
+        replacement = self._target(chatbot_id, target)
+        previous = f"chatbot-{chatbot_id}.previous-{int(time.time() * 1000)}"
+        live_path = live.path
+        with self._lock, live.lock, replacement.lock:
+            # Writers that already hold the old store follow it to its new directory
+            os.replace(live_path, os.path.join(self.root, previous))
+            live.relocate(os.path.join(self.root, previous))
+            os.replace(replacement.path, live_path)
+            replacement.relocate(live_path)
+            self._stores[chatbot_id] = replacement
+            self._side_stores.pop(target, None)
+            self._side_stores[previous] = live
+        return previous
+
+    def drop_reembed(self, chatbot_id: int, handle: str):
+        with self._lock:
+            self._side_stores.pop(handle, None)
+        shutil.rmtree(os.path.join(self.root, handle), ignore_errors=True)
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 import json
 from app import database
 from app.services.chat import chat_service
+from app.services.search import get_search_options, parse_search_filters
 from datetime import datetime
 
 class ConnectionManager:
@@ -133,12 +134,15 @@ async def handle_chat_websocket(websocket: WebSocket, api_key: str, db: Session)
         manager.conversation_connections[conversation.id] = websocket
         print(f"[WebSocket] Conversation {conversation.id} connected, mode: {conversation.mode}")
         
+        search_options = get_search_options(chatbot.config)
+        
         while True:
             data = await websocket.receive_text()
             message_data = json.loads(data)
             user_message = message_data.get('message', '')
             top_k = message_data.get('top_k', 5)
             short_answer = message_data.get('short_answer', False)
+            message_options = {**search_options, 'filters': parse_search_filters(message_data.get('filters'))}
             print(f"[WebSocket] Received user message: {user_message[:50]}... (top_k={top_k}, short={short_answer})")
             
             db_message = database.Message(
@@ -172,7 +176,7 @@ async def handle_chat_websocket(websocket: WebSocket, api_key: str, db: Session)
             
             full_response = ""
             try:
-                async for chunk in chat_service.stream_chat(chatbot.id, user_message, history, top_k=top_k, short_answer=short_answer):
+                async for chunk in chat_service.stream_chat(chatbot.id, user_message, history, top_k=top_k, short_answer=short_answer, search_options=message_options):
                     if chunk.startswith("Error:"):
                         await websocket.send_json({
                             'type': 'error',
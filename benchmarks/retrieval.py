@@ -0,0 +1,256 @@
+"""Offline retrieval benchmark for search_chatbot_content.
+
+Indexes the fixture corpus into the embedded search backend (a throwaway directory and
+SQLite database, so neither Elasticsearch nor Postgres is needed), asks every labelled
+question and reports recall@k, MRR, search latency percentiles and index size. Quality and
+index size are compared against the committed benchmarks/baseline.json; latency depends on
+the machine, so it is only compared against a per-machine file passed with --latency-baseline.
+The run exits non-zero when a compared metric regresses beyond its tolerance.
+
+    python -m benchmarks.retrieval [--k 5] [--latency-baseline PATH] [--update-baseline]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(BENCHMARK_DIR, "fixtures", "corpus.json")
+QUERIES_PATH = os.path.join(BENCHMARK_DIR, "fixtures", "queries.json")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+BENCHMARK_CHATBOT_ID = 1
+# Metrics that depend on the hardware rather than the code; kept out of the committed baseline
+MACHINE_METRICS = ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "ingest_docs_per_second")
+
+def load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def build_documents(corpus: List[dict], chunk_size: int) -> List[dict]:
+    from app.services.document_processor import chunk_text
+
+    documents = []
+    for page in corpus:
+        for idx, chunk in enumerate(chunk_text(page["content"], chunk_size=chunk_size)):
+            documents.append({
+                "url": page["url"],
+                "title": page["title"],
+                "content": chunk,
+                "chunk_index": idx,
+                "chatbot_id": BENCHMARK_CHATBOT_ID
+            })
+    return documents
+
+async def run_queries(queries: List[dict], k: int, runs: int) -> dict:
+    from app.services import search
+    from app.services.embedding_service import embedding_service
+
+    # Load the model before the clock starts
+    await embedding_service.embed("warm up")
+
+    reciprocal_ranks = []
+    recalls = []
+    latencies = []
+    misses = []
+    for run in range(runs):
+        # Every pass pays for the query embedding, as a first-time question would
+        embedding_service.cache.clear()
+        for item in queries:
+            started = time.perf_counter()
+            results = await search.search_chatbot_content(BENCHMARK_CHATBOT_ID, item["question"], max_results=k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if run:
+                continue
+
+            relevant = set(item["relevant_urls"])
+            urls = []
+            for result in results:
+                if result.get("url") not in urls:
+                    urls.append(result.get("url"))
+            found = relevant.intersection(urls)
+            recalls.append(len(found) / len(relevant))
+            rank = next((position for position, url in enumerate(urls, start=1) if url in relevant), None)
+            reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+            if not rank:
+                misses.append(item["question"])
+
+    return {
+        f"recall@{k}": round(sum(recalls) / len(recalls), 4),
+        "mrr": round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4),
+        "latency_p50_ms": round(percentile(latencies, 50), 2),
+        "latency_p95_ms": round(percentile(latencies, 95), 2),
+        "latency_p99_ms": round(percentile(latencies, 99), 2),
+        "misses": misses
+    }
+
+def run_benchmark(k: int = 5, runs: int = 3, chunk_size: int = 512) -> dict:
+    from app.core.config import settings
+    from app.database import init_db
+    from app.services import search
+    from app.services.embedding_service import EMBEDDING_MODEL_NAME
+    from app.services.search_backend import get_search_backend
+
+    backend = get_search_backend()
+    if backend.name != "embedded":
+        raise RuntimeError("The retrieval benchmark runs against the embedded backend only")
+
+    init_db()
+    corpus = load_json(CORPUS_PATH)
+    queries = load_json(QUERIES_PATH)
+    documents = build_documents(corpus, chunk_size)
+
+    ingest = search.bulk_index_chatbot_content(BENCHMARK_CHATBOT_ID, documents)
+    metrics = asyncio.run(run_queries(queries, k, runs))
+    metrics["index_bytes"] = directory_size(settings.VECTOR_STORE_DIR)
+    metrics["ingest_docs_per_second"] = round(ingest["docs_per_second"], 1)
+
+    return {
+        "config": {
+            "k": k,
+            "chunk_size": chunk_size,
+            "embedding_model": EMBEDDING_MODEL_NAME,
+            "vector_store_dtype": settings.VECTOR_STORE_DTYPE,
+            "pages": len(corpus),
+            "chunks": len(documents),
+            "queries": len(queries)
+        },
+        "metrics": metrics
+    }
+
+def split_metrics(result: dict) -> tuple:
+    """result as (committed baseline, per-machine latency baseline)"""
+    shared = {metric: value for metric, value in result["metrics"].items() if metric not in MACHINE_METRICS}
+    machine = {metric: value for metric, value in result["metrics"].items() if metric in MACHINE_METRICS}
+    return {"config": result["config"], "metrics": shared}, {"config": result["config"], "metrics": machine}
+
+def compare_to_baseline(result: dict, baseline: dict, quality_tolerance: float, size_tolerance: float, latency_baseline: dict = None, latency_tolerance: float = 0.5) -> List[str]:
+    """Regressions of result against baseline (and latency_baseline, when given), as human-readable lines.
+
+    Metrics missing from a baseline are not compared.
+    """
+    regressions = []
+    for reference in (baseline, latency_baseline):
+        if reference is not None and reference.get("config") != result["config"]:
+            regressions.append(f"Benchmark config changed ({reference.get('config')} → {result['config']}); rerun with --update-baseline")
+    if regressions:
+        return regressions
+
+    current, previous = result["metrics"], baseline["metrics"]
+    for metric in (f"recall@{result['config']['k']}", "mrr"):
+        if metric in previous and current[metric] < previous[metric] - quality_tolerance:
+            regressions.append(f"{metric} dropped {previous[metric]:.4f} → {current[metric]:.4f}")
+    if "index_bytes" in previous and current["index_bytes"] > previous["index_bytes"] * (1 + size_tolerance):
+        regressions.append(f"index_bytes grew {previous['index_bytes']} → {current['index_bytes']}")
+    if latency_baseline is not None:
+        previous = latency_baseline["metrics"]
+        for metric in ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms"):
+            if metric in previous and current[metric] > previous[metric] * (1 + latency_tolerance):
+                regressions.append(f"{metric} rose {previous[metric]:.2f} → {current[metric]:.2f}")
+    return regressions
+
+def write_json(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+def print_report(result: dict, *baselines: dict):
+    config = result["config"]
+    print(f"\n📊 Retrieval benchmark: {config['queries']} questions over {config['chunks']} chunks "
+          f"({config['pages']} pages, {config['embedding_model']}, {config['vector_store_dtype']})")
+    previous = {}
+    for reference in baselines:
+        previous.update((reference or {}).get("metrics", {}))
+    for metric, value in result["metrics"].items():
+        if metric == "misses":
+            continue
+        line = f"   {metric:<24} {value}"
+        if metric in previous:
+            line += f"   (baseline {previous[metric]})"
+        print(line)
+    for question in result["metrics"]["misses"]:
+        print(f"   ✗ no relevant page in top {config['k']}: {question}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency of search_chatbot_content")
+    parser.add_argument("--k", type=int, default=5, help="Results requested per question (recall@k)")
+    parser.add_argument("--runs", type=int, default=3, help="Passes over the questions for latency percentiles")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Characters per chunk when indexing the corpus")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline quality and index size to compare against")
+    parser.add_argument("--latency-baseline", default=None, help="Per-machine latency baseline; latency is only compared when given")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run's results as the new baseline(s)")
+    parser.add_argument("--quality-tolerance", type=float, default=0.02, help="Allowed absolute drop in recall@k and MRR")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5, help="Allowed relative rise in latency percentiles")
+    parser.add_argument("--size-tolerance", type=float, default=0.1, help="Allowed relative growth of the index")
+    args = parser.parse_args()
+
+    baseline = load_json(args.baseline) if os.path.exists(args.baseline) else None
+    latency_baseline = None
+    if args.latency_baseline and os.path.exists(args.latency_baseline):
+        latency_baseline = load_json(args.latency_baseline)
+    if not args.update_baseline:
+        # Without a baseline there is nothing to catch a regression against
+        for path, loaded in ((args.baseline, baseline), (args.latency_baseline, latency_baseline)):
+            if path and loaded is None:
+                print(f"❌ No baseline at {path}; run with --update-baseline to create one")
+                return 1
+
+    store_dir = tempfile.mkdtemp(prefix="nexva-benchmark-")
+    # The database lives apart from the vector store so index_bytes measures the index alone
+    db_dir = tempfile.mkdtemp(prefix="nexva-benchmark-db-")
+    # Settings are read on import, so the backend has to be chosen first
+    os.environ["SEARCH_BACKEND"] = "embedded"
+    os.environ["VECTOR_STORE_DIR"] = store_dir
+    os.environ["QUERY_EMBEDDING_CACHE_REDIS_URL"] = ""
+    # Chatbot model records and stored chunk embeddings go to a throwaway database too
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'benchmark.db')}"
+    try:
+        result = run_benchmark(k=args.k, runs=args.runs, chunk_size=args.chunk_size)
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    print_report(result, baseline, latency_baseline)
+
+    if args.update_baseline:
+        shared, machine = split_metrics(result)
+        write_json(args.baseline, shared)
+        print(f"\n✅ Baseline written to {args.baseline}")
+        if args.latency_baseline:
+            write_json(args.latency_baseline, machine)
+            print(f"✅ Latency baseline written to {args.latency_baseline}")
+        return 0
+
+    unchecked = [metric for metric in (f"recall@{args.k}", "mrr", "index_bytes") if metric not in baseline["metrics"]]
+    if unchecked:
+        print(f"\n⚠️  Not in {args.baseline}, so not compared: {', '.join(unchecked)}; record them with --update-baseline")
+    regressions = compare_to_baseline(result, baseline, args.quality_tolerance, args.size_tolerance, latency_baseline, args.latency_tolerance)
+    if regressions:
+        print("\n❌ Retrieval regressed against the baseline:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        return 1
+    print("\n✅ No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
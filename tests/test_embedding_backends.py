@@ -0,0 +1,32 @@
+import pytest
+from sentence_transformers import SentenceTransformer
+from app.core.config import settings
+from app.services import embedding_backends
+
+@pytest.fixture(scope="module")
+def model_name():
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("optimum.onnxruntime")
+    # The model comes from the Hugging Face cache or hub; without either there is nothing to compare
+    try:
+        SentenceTransformer(settings.EMBEDDING_MODEL)
+    except Exception as e:
+        pytest.skip(f"Embedding model {settings.EMBEDDING_MODEL} unavailable: {e}")
+    return settings.EMBEDDING_MODEL
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_onnx_backends_match_torch_embeddings(model_name, backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_ONNX_DIR", str(tmp_path))
+
+    result = embedding_backends.check_parity(model_name, backend, min_cosine=0.99)
+
+    assert result["backend"] == backend
+    assert result["min_cosine"] >= 0.99, result
+
+def test_variant_names_the_backend_that_loads(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "onnx-int8")
+    monkeypatch.setattr(embedding_backends, "_onnx_available", lambda: True)
+    assert embedding_backends.embedding_variant("m") == f"m:onnx-int8:{settings.EMBEDDING_ONNX_QUANTIZATION}"
+
+    monkeypatch.setattr(embedding_backends, "_onnx_available", lambda: False)
+    assert embedding_backends.embedding_variant("m") == "m:torch"
@@ -0,0 +1,65 @@
+import hashlib
+import numpy as np
+import pytest
+from app.services import dedup, search
+from app.services.vector_store import EmbeddedVectorStore
+
+DIMS = 8
+CHATBOT_ID = 1
+BOILERPLATE = "We use cookies to improve your experience. Accept all cookies to keep browsing our website and services."
+
+def _vector(text: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "big")
+    return np.random.default_rng(seed).normal(size=DIMS).astype(np.float32)
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    store = EmbeddedVectorStore(str(tmp_path), dims=DIMS)
+    monkeypatch.setattr(search, "get_search_backend", lambda: store)
+    monkeypatch.setattr(search, "_embed_chunks", lambda texts, batch_size=None, model_name=None: [_vector(text) for text in texts])
+    monkeypatch.setattr(search.model_registry, "model_for", lambda chatbot_id, backend=None, fresh=False: "test-model")
+    monkeypatch.setattr(search.answer_cache, "invalidate", lambda chatbot_id: None)
+    dedup.forget_fingerprints(CHATBOT_ID)
+    yield store
+    dedup.forget_fingerprints(CHATBOT_ID)
+
+def _ingest(documents, batch_size=100):
+    with search.BulkIngester(CHATBOT_ID, batch_size=batch_size, dedup=True) as ingester:
+        ingester.add_many(documents)
+    return ingester
+
+def _page(url, **fields):
+    return {"chatbot_id": CHATBOT_ID, "url": url, "title": "Cookies", "content": BOILERPLATE, "chunk_index": 0, **fields}
+
+def _matching_urls(backend, filters):
+    vector_hits, _ = backend.search(CHATBOT_ID, "cookies", _vector(BOILERPLATE).tolist(), size=10, num_candidates=10, filters=filters)
+    return sorted(url for hit in vector_hits for url in hit["_source"].get("source_urls") or [hit["_source"]["url"]])
+
+def test_same_text_under_two_domains_matches_each_domain_filter(backend):
+    _ingest([_page("https://a.example/", domain_id=1)])
+    _ingest([_page("https://b.example/", domain_id=2)])
+
+    assert _matching_urls(backend, {"domain_id": [1]}) == ["https://a.example/"]
+    assert _matching_urls(backend, {"domain_id": [2]}) == ["https://b.example/"]
+    assert _matching_urls(backend, {"domain_id": [1, 2]}) == ["https://a.example/", "https://b.example/"]
+
+def test_deleting_one_domain_keeps_the_other_domains_copy(backend):
+    _ingest([_page("https://a.example/", domain_id=1), _page("https://b.example/", domain_id=2)])
+
+    search.delete_chatbot_content(CHATBOT_ID, {"domain_id": 1})
+
+    assert _matching_urls(backend, {"domain_id": [2]}) == ["https://b.example/"]
+
+@pytest.mark.parametrize("batch_size", [1, 100])
+def test_merged_duplicate_matches_tags_of_every_copy(backend, batch_size):
+    # batch_size 1 merges into the stored chunk, 100 into the one still buffered
+    ingester = _ingest([
+        _page("https://a.example/pricing", domain_id=1, tags=["pricing"]),
+        _page("https://a.example/support", domain_id=1, tags=["support"])
+    ], batch_size=batch_size)
+
+    assert ingester.duplicates == 1
+    expected = ["https://a.example/pricing", "https://a.example/support"]
+    assert _matching_urls(backend, {"tags": ["pricing"]}) == expected
+    assert _matching_urls(backend, {"tags": ["support"]}) == expected
+    assert _matching_urls(backend, {"domain_id": [1], "tags": ["support"]}) == expected
@@ -13,7 +13,8 @@ export const Config = {
     borderRadius: '12px',
     buttonIcon: 'chat',
     buttonSize: '60px',
-    buttonColor: null
+    buttonColor: null,
+    searchFilters: null
   },
 
   init: function (apiKey, options) {
@@ -34,7 +35,8 @@ export const Config = {
       borderRadius: options.borderRadius || this.defaults.borderRadius,
       buttonIcon: options.buttonIcon || this.defaults.buttonIcon,
       buttonSize: options.buttonSize || this.defaults.buttonSize,
-      buttonColor: options.buttonColor || primaryColor
+      buttonColor: options.buttonColor || primaryColor,
+      searchFilters: options.searchFilters || this.defaults.searchFilters
     };
   }
 };
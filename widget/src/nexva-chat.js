@@ -116,7 +116,8 @@ export const NexvaChat = {
                 Messaging.showTyping();
                 this.voiceChatWs.send(JSON.stringify({
                   type: "text_query",
-                  text: transcript
+                  text: transcript,
+                  filters: this.config.searchFilters
                 }));
                 setTimeout(() => {
                   if (this.voiceActive) VoiceChat.start(handleTranscript, true);
@@ -191,7 +192,8 @@ export const NexvaChat = {
           Messaging.showTyping();
           this.voiceChatWs.send(JSON.stringify({
             type: "text_query",
-            text: transcript
+            text: transcript,
+            filters: this.config.searchFilters
           }));
 
           // Restart listening immediately to allow further interruptions/commands
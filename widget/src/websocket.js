@@ -5,6 +5,7 @@ import { UI } from './ui.js';
 
 export const WebSocketManager = {
   ws: null,
+  config: null,
   conversationId: null,
   onResponseComplete: null,
   audioQueue: [],
@@ -13,6 +14,7 @@ export const WebSocketManager = {
   connect: function (config, onConversationUpdate, existingConversationId = null) {
     if (this.ws && this.ws.readyState === WebSocket.OPEN) return;
 
+    this.config = config;
     const protocol = config.apiUrl.startsWith('https') ? 'wss:' : 'ws:';
     const host = config.apiUrl.replace(/^https?:\/\//, '');
     this.ws = new WebSocket(`${protocol}//${host}/ws/chat/${config.apiKey}`);
@@ -83,10 +85,14 @@ export const WebSocketManager = {
 
   sendMessage: function (message) {
     if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-      this.ws.send(JSON.stringify({
+      const payload = {
         message: message,
         session_id: Utils.generateSessionId()
-      }));
+      };
+      if (this.config && this.config.searchFilters) {
+        payload.filters = this.config.searchFilters;
+      }
+      this.ws.send(JSON.stringify(payload));
       return true;
     }
     return false;